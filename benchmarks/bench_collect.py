@@ -0,0 +1,75 @@
+"""Benchmark pytest collection of a large generated suite: shared conftest.py vs per-function path setup.
+
+The "before" tree rebuilds each module file the old way, with the sys.path block and imports
+repeated for every function; the "after" tree is what the generator writes today.
+
+Usage: python benchmarks/bench_collect.py [--modules 300] [--functions 20] [--repeat 3]
+"""
+from __future__ import annotations
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from llm_testgen.ast_extract import scan_python_functions
+from llm_testgen.generator import write_tests
+from llm_testgen.manifest import MANIFEST_NAME
+
+LEGACY_PATH_SETUP = """import sys
+import os
+import pytest
+
+# Add source directory to sys.path so we can import the module
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "{rel_path}"))
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+"""
+
+def make_tree(root: Path, modules: int, functions: int):
+    root.mkdir(parents=True)
+    for m in range(modules):
+        body = "".join(f"def f{i}(a: int, b: int = 1) -> int:\n    return a * b + {i}\n\n" for i in range(functions))
+        (root / f"mod{m}.py").write_text(body, encoding="utf-8")
+
+def legacy_tree(new: Path, old: Path, src: Path):
+    """Re-assemble every module file from the manifest's per-function outputs, old style."""
+    old.mkdir()
+    rel_path = str(Path("..") / src.name)
+    for entry in json.loads((new / MANIFEST_NAME).read_text(encoding="utf-8"))["modules"].values():
+        chunks = [LEGACY_PATH_SETUP.format(rel_path=rel_path) + "\n" + f["output"] for f in entry["functions"].values()]
+        (old / entry["file"]).write_text("\n\n".join(chunks), encoding="utf-8")
+
+def collect(tests: Path) -> float:
+    cmd = [sys.executable, "-m", "pytest", "--collect-only", "-q", "-p", "no:cacheprovider",
+           "--rootdir", str(tests), str(tests)]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise SystemExit(f"collection failed in {tests}:\n{proc.stdout[-2000:]}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", type=int, default=300)
+    parser.add_argument("--functions", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src, new, old = Path(tmp) / "src", Path(tmp) / "after", Path(tmp) / "before"
+        make_tree(src, args.modules, args.functions)
+        write_tests(scan_python_functions(str(src)), str(new), str(src))
+        legacy_tree(new, old, src)
+
+        total = args.modules * args.functions
+        for label, tests in (("before (per-function setup)", old), ("after (shared conftest.py)", new)):
+            size = sum(p.stat().st_size for p in tests.glob("test_*.py"))
+            best = min(collect(tests) for _ in range(args.repeat))
+            print(f"{label:<30} {best:7.2f}s  {total * 2} tests  {size / 1024:8.0f} KiB of test code")
+
+if __name__ == "__main__":
+    main()
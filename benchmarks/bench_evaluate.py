@@ -0,0 +1,115 @@
+"""Benchmark evaluating a large generated test tree: the old serial scan vs the evaluator today.
+
+The tree mixes pytest files (one per module, several functions each) and Robot suites. The
+evaluator is timed cold (empty cache), warm (nothing changed) and after touching 1% of files.
+
+Usage: python benchmarks/bench_evaluate.py [--files 20000] [--workers N]
+"""
+from __future__ import annotations
+import argparse
+import ast
+import re
+import tempfile
+import time
+from pathlib import Path
+
+from llm_testgen.evaluator import evaluate_dir
+from llm_testgen.guardrails import check
+
+PY_TEMPLATE = '''import pytest
+from pkg.mod{n} import f{n}, g{n}
+
+
+# REQ-ID: REQ-{a}
+def test_f{n}_basic():
+    assert f{n}(1, 2) is not None
+
+def test_f{n}_bad_inputs():
+    with pytest.raises(Exception):
+        f{n}(None, None)
+
+
+# REQ-ID: REQ-{b}
+def test_g{n}_basic():
+    assert g{n}("x") is not None
+'''
+
+ROBOT_TEMPLATE = '''*** Settings ***
+Documentation     Test suite generated for mod{n}
+Library           ../src/pkg/mod{n}.py
+
+*** Test Cases ***
+Test f{n} Basic
+    [Documentation]    Basic positive test for f{n}
+    [Tags]    REQ-{a}
+    ${{result}}=    f{n}    1    2
+    Should Not Be Equal    ${{result}}    ${{None}}
+
+Test f{n} Error
+    [Tags]    REQ-{a}    Negative
+    Run Keyword And Expect Error    *    f{n}    ${{None}}    ${{None}}
+'''
+
+def make_tree(root: Path, files: int):
+    for n in range(files):
+        sub = root / f"pkg{n // 500}"
+        sub.mkdir(parents=True, exist_ok=True)
+        a, b = 100 + n % 50, 100 + (n * 7) % 50
+        if n % 5 == 4:
+            (sub / f"test_mod{n}.robot").write_text(ROBOT_TEMPLATE.format(n=n, a=a), encoding="utf-8")
+        else:
+            (sub / f"test_mod{n}.py").write_text(PY_TEMPLATE.format(n=n, a=a, b=b), encoding="utf-8")
+
+def legacy_evaluate(tests_dir: str) -> int:
+    """The previous evaluate_dir: serial, two rglob passes, whole-file regexes, non-empty robot check."""
+    p = Path(tests_dir)
+    compiles = 0
+    req_ids = set()
+    for f in p.rglob("test_*.py"):
+        content = f.read_text(encoding="utf-8")
+        report = check(content)
+        if report.compiles:
+            compiles += 1
+            sum(isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test")
+                for node in ast.walk(report.tree))
+        for line in re.findall(r"REQ-ID:[^\n]*", content):
+            req_ids.update(re.findall(r"REQ-\d+", line))
+    for f in p.rglob("*.robot"):
+        content = f.read_text(encoding="utf-8")
+        if content.strip():
+            compiles += 1
+        req_ids.update(re.findall(r"REQ-\d+", content))
+    return compiles
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    design = "\n".join(f"## REQ-{100 + i}: requirement {i}" for i in range(60))
+    with tempfile.TemporaryDirectory() as tmp:
+        tests, cache = Path(tmp) / "tests", str(Path(tmp) / "eval_cache.sqlite")
+        make_tree(tests, args.files)
+
+        t0 = time.perf_counter()
+        legacy_evaluate(str(tests))
+        print(f"{'legacy (serial)':<28} {time.perf_counter() - t0:7.2f}s")
+
+        def run(label: str):
+            t0 = time.perf_counter()
+            metrics = evaluate_dir(str(tests), workers=args.workers, cache_path=cache,
+                                   records_path=str(Path(tmp) / "records.jsonl"), design_text=design)
+            scan = metrics["scan"]
+            print(f"{label:<28} {time.perf_counter() - t0:7.2f}s  {metrics['files_total']} files, "
+                  f"{scan['scanned']} scanned, {scan['cached']} cached, "
+                  f"REQ coverage {metrics['requirements']['covered']}/{metrics['requirements']['total']}")
+
+        run("evaluator (cold cache)")
+        run("evaluator (warm cache)")
+        for path in sorted(tests.rglob("test_*.py"))[:: 100]:
+            path.write_text(path.read_text(encoding="utf-8") + "\n# edited\n", encoding="utf-8")
+        run("evaluator (1% edited)")
+
+if __name__ == "__main__":
+    main()
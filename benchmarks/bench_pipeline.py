@@ -0,0 +1,41 @@
+"""Benchmark end-to-end generation offline by replaying a recorded cassette.
+
+Record once against a live (or local) provider:
+  llm-testgen generate --src SRC --out /tmp/live --provider local --cassette run.jsonl --no-cache
+then replay as often as needed, with no network access:
+
+Usage: python benchmarks/bench_pipeline.py --src SRC --cassette run.jsonl [--jobs 8] [--realtime]
+"""
+from __future__ import annotations
+import argparse
+import os
+import tempfile
+import time
+
+from llm_testgen.ast_extract import scan_python_functions
+from llm_testgen.generator import write_tests
+from llm_testgen.llm_provider import LLMProvider
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--src", required=True)
+    parser.add_argument("--cassette", required=True)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--realtime", action="store_true", help="Sleep for each recorded call latency")
+    args = parser.parse_args()
+    if args.realtime:
+        os.environ["LLM_REPLAY_REALTIME"] = "1"
+
+    funcs = scan_python_functions(args.src)
+    for i in range(args.repeat):
+        with tempfile.TemporaryDirectory() as out, LLMProvider(provider="replay", cassette=args.cassette) as provider:
+            t0 = time.perf_counter()
+            write_tests(funcs, out, args.src, jobs=args.jobs, provider=provider)
+            elapsed = time.perf_counter() - t0
+            misses = provider.backend.cassette.misses
+        print(f"run {i + 1}: {len(funcs)} functions in {elapsed:.3f}s "
+              f"({len(funcs) / elapsed:.0f}/s), {misses} unrecorded prompt(s)")
+
+if __name__ == "__main__":
+    main()
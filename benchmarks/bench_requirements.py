@@ -0,0 +1,56 @@
+"""Benchmark REQ-ID linking: legacy per-function line scan vs. RequirementIndex.
+
+Usage: python benchmarks/bench_requirements.py [--lines 10000] [--functions 20000]
+"""
+from __future__ import annotations
+import argparse
+import re
+import time
+
+from llm_testgen.requirements import RequirementIndex
+
+def legacy_find_req_id(func_name, design_text):
+    for line in design_text.splitlines():
+        if func_name in line and "REQ-" in line:
+            match = re.search(r"(REQ-\d+)", line)
+            if match:
+                return match.group(1)
+    return "N/A"
+
+def make_doc(n_lines: int) -> str:
+    lines = []
+    for i in range(n_lines // 3):
+        lines += [f"## REQ-{i}: handler_{i}(payload) -> dict", f"- handler_{i} validates the payload.", ""]
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=10_000)
+    parser.add_argument("--functions", type=int, default=20_000)
+    parser.add_argument("--legacy-sample", type=int, default=2_000, help="Functions timed for the legacy scan (extrapolated)")
+    args = parser.parse_args()
+
+    doc = make_doc(args.lines)
+    names = [f"handler_{i}" for i in range(args.functions)]
+
+    t0 = time.perf_counter()
+    index = RequirementIndex(doc)
+    build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    indexed = [index.primary(n) for n in names]
+    lookup = time.perf_counter() - t0
+
+    sample = names[:: max(1, len(names) // args.legacy_sample)]
+    t0 = time.perf_counter()
+    legacy = [legacy_find_req_id(n, doc) for n in sample]
+    legacy_time = (time.perf_counter() - t0) * len(names) / len(sample)
+
+    mismatches = sum(a != b for a, b in zip(legacy, indexed[:: max(1, len(names) // args.legacy_sample)]))
+    print(f"index build: {build * 1000:.1f} ms, {len(index)} requirements")
+    print(f"index lookups ({len(names)}): {lookup * 1000:.1f} ms")
+    print(f"legacy scan (extrapolated): {legacy_time:.2f} s")
+    print(f"speedup: {legacy_time / (build + lookup):.0f}x")
+    print(f"legacy prefix mismatches in sample: {mismatches}")
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,17 @@
 #!/usr/bin/env bash
 set -euo pipefail
 if [ $# -lt 1 ]; then
-  echo "Usage: $0 <tests_dir>"
+  echo "Usage: $0 <tests_dir> [design_doc] [metrics.json]"
   exit 1
 fi
 
 TESTS_DIR="$1"
-python - <<'PY'
-import json, sys, pathlib, ast
-p = pathlib.Path(sys.argv[1])
-files = list(p.rglob("test_*.py"))
-compiles = 0
-for f in files:
-    try:
-        ast.parse(f.read_text())
-        compiles += 1
-    except Exception as e:
-        pass
-print(json.dumps({"files": len(files), "compile_success": compiles}))
-PY
+DESIGN="${2:-}"
+OUT="${3:-metrics.json}"
+
+# Same evaluator as 'llm-testgen evaluate': per-file records stream to <out>.jsonl
+ARGS=(evaluate --tests "$TESTS_DIR" --out "$OUT" --records "${OUT%.json}.jsonl")
+if [ -n "$DESIGN" ]; then
+  ARGS+=(--design "$DESIGN")
+fi
+python -m llm_testgen.cli "${ARGS[@]}"
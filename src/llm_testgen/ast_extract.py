@@ -1,19 +1,78 @@
 from __future__ import annotations
 import ast
-from dataclasses import dataclass
+import contextlib
+import hashlib
+import os
+import pickle
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from .telemetry import get_telemetry
 
-@dataclass
+@dataclass(slots=True)
 class FunctionInfo:
     module: str
     qualname: str
     name: str
+    # Positional parameters (positional-only first), including self/cls
     args: List[str]
     annotations: dict
     returns: Optional[str]
     docstring: Optional[str]
     rel_path: str
+    # Hash of the AST dump (signature + body, no line numbers); drives incremental regeneration
+    source_hash: str = ""
+    # Same, with the function's name and docstring stripped; equal for structural duplicates
+    shape_hash: str = ""
+    kwonly: Tuple[str, ...] = ()
+    vararg: Optional[str] = None
+    kwarg: Optional[str] = None
+    # Parameter name -> default expression source, for parameters that have one
+    defaults: Dict[str, str] = field(default_factory=dict)
+    decorators: Tuple[str, ...] = ()
+    is_async: bool = False
+    # Source span (1-based, inclusive), decorators excluded
+    lineno: int = 0
+    end_lineno: int = 0
+    # Defined inside another function; qualname reads outer.<locals>.inner
+    nested: bool = False
+    # Cyclomatic complexity and number of statement lines in the span (docstring excluded)
+    complexity: int = 1
+    statements: int = 0
+
+    @property
+    def is_method(self) -> bool:
+        return "." in self.qualname and not self.nested
+
+    def call_args(self) -> List[str]:
+        """Positional parameters a caller passes explicitly: self/cls dropped for methods."""
+        if self.is_method and self.args and "staticmethod" not in self.decorators:
+            return self.args[1:]
+        return self.args
+
+    def signature(self) -> str:
+        """Compact one-line signature, e.g. async f(a: int, b=2, *args, c, **kw) -> str."""
+        def param(name: str) -> str:
+            text = name
+            if name in self.annotations:
+                text += f": {self.annotations[name]}"
+            if name in self.defaults:
+                text += f" = {self.defaults[name]}" if name in self.annotations else f"={self.defaults[name]}"
+            return text
+        params = [param(a) for a in self.args]
+        if self.vararg:
+            params.append("*" + param(self.vararg))
+        elif self.kwonly:
+            params.append("*")
+        params += [param(a) for a in self.kwonly]
+        if self.kwarg:
+            params.append("**" + param(self.kwarg))
+        text = f"{'async ' if self.is_async else ''}{self.name}({', '.join(params)})"
+        return f"{text} -> {self.returns}" if self.returns else text
 
 def _annotation_str(node):
     try:
@@ -21,26 +80,78 @@ def _annotation_str(node):
     except Exception:
         return None
 
+# Strings that repeat across thousands of FunctionInfos share one object
+_intern = sys.intern
+
+_BRANCHES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler, ast.Assert, ast.match_case)
+
+def _measure(node, doc: Optional[str]) -> Tuple[int, int]:
+    """(cyclomatic complexity, statement lines) of a function, nested definitions included."""
+    complexity = 1
+    lines = set()
+    for child in ast.walk(node):
+        if isinstance(child, _BRANCHES):
+            complexity += 1
+        elif isinstance(child, ast.BoolOp):
+            complexity += len(child.values) - 1
+        elif isinstance(child, ast.comprehension):
+            complexity += 1 + len(child.ifs)
+        if isinstance(child, ast.stmt) and child is not node:
+            lines.add(child.lineno)
+    if doc is not None:
+        lines.discard(node.body[0].lineno)
+    return complexity, len(lines)
+
 def _collect_functions(tree: ast.AST, module_name: str, rel_path: str) -> List[FunctionInfo]:
+    """Every (async) function and method in one pass over the tree."""
     found = []
+    module_name, rel_path = _intern(module_name), _intern(rel_path)
     class Visitor(ast.NodeVisitor):
         def __init__(self):
             self.stack = []
-        def visit_FunctionDef(self, node: ast.FunctionDef):
-            qual = ".".join(self.stack + [node.name])
-            args = [a.arg for a in node.args.args]
+            self.depth = 0  # enclosing function scopes
+        def visit_FunctionDef(self, node):
+            spec = node.args
+            positional = spec.posonlyargs + spec.args
+            params = positional + spec.kwonlyargs + [a for a in (spec.vararg, spec.kwarg) if a is not None]
             annotations = {}
-            for a in node.args.args:
+            for a in params:
                 if a.annotation is not None:
-                    annotations[a.arg] = _annotation_str(a.annotation)
+                    annotations[_intern(a.arg)] = _intern(_annotation_str(a.annotation) or "")
+            defaults = {}
+            for a, d in zip(positional[len(positional) - len(spec.defaults):], spec.defaults):
+                defaults[a.arg] = _annotation_str(d)
+            for a, d in zip(spec.kwonlyargs, spec.kw_defaults):
+                if d is not None:
+                    defaults[a.arg] = _annotation_str(d)
             returns = _annotation_str(node.returns) if node.returns is not None else None
             doc = ast.get_docstring(node)
+            body = node.body[1:] if doc is not None else node.body
+            shape = "".join(ast.dump(part) for part in [node.args, *node.decorator_list, *body] + ([node.returns] if node.returns else []))
+            shape = shape.replace(f"'{node.name}'", "'_'")  # recursive calls
+            complexity, statements = _measure(node, doc)
             found.append(FunctionInfo(
-                module=module_name, qualname=qual, name=node.name,
-                args=args, annotations=annotations, returns=returns,
-                docstring=doc, rel_path=rel_path
+                module=module_name, qualname=".".join(self.stack + [node.name]), name=_intern(node.name),
+                args=[_intern(a.arg) for a in positional], annotations=annotations,
+                returns=_intern(returns) if returns else None,
+                docstring=doc, rel_path=rel_path,
+                source_hash=hashlib.sha256(ast.dump(node).encode("utf-8")).hexdigest(),
+                shape_hash=hashlib.sha256(shape.encode("utf-8")).hexdigest(),
+                kwonly=tuple(_intern(a.arg) for a in spec.kwonlyargs),
+                vararg=_intern(spec.vararg.arg) if spec.vararg else None,
+                kwarg=_intern(spec.kwarg.arg) if spec.kwarg else None,
+                defaults=defaults,
+                decorators=tuple(_intern(_annotation_str(d) or "") for d in node.decorator_list),
+                is_async=isinstance(node, ast.AsyncFunctionDef),
+                lineno=node.lineno, end_lineno=node.end_lineno or node.lineno,
+                nested=self.depth > 0, complexity=complexity, statements=statements,
             ))
+            self.stack += [node.name, "<locals>"]
+            self.depth += 1
             self.generic_visit(node)
+            self.depth -= 1
+            del self.stack[-2:]
+        visit_AsyncFunctionDef = visit_FunctionDef
         def visit_ClassDef(self, node: ast.ClassDef):
             self.stack.append(node.name)
             self.generic_visit(node)
@@ -48,17 +159,251 @@ def _collect_functions(tree: ast.AST, module_name: str, rel_path: str) -> List[F
     Visitor().visit(tree)
     return found
 
-def scan_python_functions(src_dir: str) -> List[FunctionInfo]:
-    base = Path(src_dir)
-    results: List[FunctionInfo] = []
-    for path in base.rglob("*.py"):
-        if any(seg.startswith(".") for seg in path.parts):
-            continue
-        rel = str(path.relative_to(base))
-        module_name = rel.replace("/", ".").removesuffix(".py")
+def _glob_match(fn: FunctionInfo, pattern: str) -> bool:
+    return (fnmatchcase(f"{fn.module}:{fn.qualname}", pattern) or fnmatchcase(fn.module, pattern)
+            or fnmatchcase(fn.rel_path, pattern))
+
+@dataclass
+class FunctionFilter:
+    """Which scanned functions become test targets.
+
+    Globs match "module:qualname", the module name or the file's relative path; an
+    empty include list means everything. Excludes win over includes.
+    """
+
+    private: bool = False
+    nested: bool = False
+    dunder: bool = False
+    include: Tuple[str, ...] = ()
+    exclude: Tuple[str, ...] = ()
+
+    def __call__(self, fn: FunctionInfo) -> bool:
+        if fn.nested and not self.nested:
+            return False
+        if not (self.private and self.dunder):
+            for part in fn.qualname.split("."):
+                dunder = part.startswith("__") and part.endswith("__") and len(part) > 4
+                if dunder and not self.dunder and part == fn.name:
+                    return False
+                if part.startswith("_") and not dunder and part != "<locals>" and not self.private:
+                    return False
+        if self.include and not any(_glob_match(fn, p) for p in self.include):
+            return False
+        return not any(_glob_match(fn, p) for p in self.exclude)
+
+# Everything, e.g. for tools that want the raw scan
+ALL_FUNCTIONS = FunctionFilter(private=True, nested=True, dunder=True)
+
+def _iter_source_files(base: Path) -> Iterator[Tuple[str, str]]:
+    """Yield (absolute path, relative path) for every *.py file, pruning hidden dirs."""
+    for root, dirs, files in os.walk(base):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if name.endswith(".py") and not name.startswith("."):
+                path = os.path.join(root, name)
+                yield path, os.path.relpath(path, base).replace(os.sep, "/")
+
+def _parse_file(task: Tuple[str, str, Optional[str]]):
+    """Worker: read, hash and parse one file. Skips the parse if the hash is already known."""
+    path, rel, known_hash = task
+    try:
+        st = os.stat(path)
+        data = Path(path).read_bytes()
+    except OSError:
+        return rel, None
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == known_hash:
+        return rel, (st.st_mtime_ns, st.st_size, digest, None)
+    module_name = rel.replace("/", ".").removesuffix(".py")
+    try:
+        tree = ast.parse(data.decode("utf-8"))
+        funcs = _collect_functions(tree, module_name, rel)
+    except Exception:
+        funcs = []
+    return rel, (st.st_mtime_ns, st.st_size, digest, funcs)
+
+def scan_file(src_dir: str, rel: str) -> Optional[List[FunctionInfo]]:
+    """Unfiltered functions of one file under src_dir, or None if it cannot be read."""
+    _, result = _parse_file((os.path.join(src_dir, rel), rel, None))
+    return result[3] if result is not None else None
+
+class ParseCache:
+    """Persistent per-file parse results keyed by (path, mtime, size, content hash).
+
+    A file whose mtime and size are unchanged is never opened; one whose stat changed
+    but whose content hash matches is read but not re-parsed. Entries live in a SQLite
+    file and are read and written one file at a time, so a scan holds no more than the
+    set of paths it has seen, however many functions the tree has.
+    """
+
+    VERSION = 5
+    # Rows written per transaction; keeps the write lock short for concurrent runs
+    COMMIT_EVERY = 500
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self._db: Optional[sqlite3.Connection] = None
+        self._uncommitted = 0
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                self._db = self._open()
+            except sqlite3.DatabaseError:
+                # Not a cache in this format (e.g. an older pickle): start afresh
+                self.path.unlink(missing_ok=True)
+                self._db = self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            if db.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+                db.execute("DROP TABLE IF EXISTS entries")
+                db.execute("CREATE TABLE entries (rel TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, sha256 TEXT, data BLOB)")
+                db.execute(f"PRAGMA user_version = {self.VERSION}")
+                db.commit()
+        except sqlite3.DatabaseError:
+            db.close()
+            raise
+        return db
+
+    def stat(self, rel: str) -> Optional[Tuple[int, int, str]]:
+        """(mtime_ns, size, sha256) recorded for rel, without loading its data."""
+        if self._db is None:
+            return None
+        return self._db.execute("SELECT mtime_ns, size, sha256 FROM entries WHERE rel = ?", (rel,)).fetchone()
+
+    def get(self, rel: str):
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT data FROM entries WHERE rel = ?", (rel,)).fetchone()
         try:
-            tree = ast.parse(path.read_text(encoding="utf-8"))
+            return pickle.loads(row[0]) if row else None
         except Exception:
-            continue
-        results.extend(_collect_functions(tree, module_name, rel))
-    return results
+            return None
+
+    def put(self, rel: str, stat: Tuple[int, int, str], data=None):
+        """Record rel's stat and data; data=None only refreshes the stat (content unchanged)."""
+        if self._db is None:
+            return
+        if data is None:
+            self._db.execute("UPDATE entries SET mtime_ns = ?, size = ?, sha256 = ? WHERE rel = ?", (*stat, rel))
+        else:
+            self._db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                             (rel, *stat, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)))
+        self._uncommitted += 1
+        if self._uncommitted >= self.COMMIT_EVERY:
+            self._db.commit()
+            self._uncommitted = 0
+
+    def save(self, seen: Set[str]):
+        """Drop entries of files that were not seen (deleted since), then commit."""
+        if self._db is None:
+            return
+        stale = [(rel,) for (rel,) in self._db.execute("SELECT rel FROM entries") if rel not in seen]
+        self._db.executemany("DELETE FROM entries WHERE rel = ?", stale)
+        self._db.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        """Commit what was written so far (an interrupted scan keeps its entries) and close."""
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+# Below this many files to process, process start-up costs more than it saves
+_PARALLEL_THRESHOLD = 64
+
+class CachedScan:
+    """Per-file results of a worker over a file list, reusing cache entries of unchanged files.
+
+    worker((path, rel, known_hash)) returns (rel, (mtime_ns, size, sha256, data)), with
+    data None when the content hash equals known_hash, or (rel, None) if the file cannot
+    be read. Files are planned when the scan is built: one whose mtime and size match the
+    cache is never opened. Iterating runs the worker over the rest in a process pool and
+    streams (rel, (mtime_ns, size, sha256), data, cached) in file order, writing each
+    entry to the cache as it goes; the cache is closed when the iteration ends.
+    """
+
+    def __init__(self, files: Iterable[Tuple[str, str]], worker: Callable, cache: ParseCache,
+                 workers: Optional[int] = None):
+        self.worker = worker
+        self.cache = cache
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.seen: Set[str] = set()  # files whose cache entry is current
+        self.tasks = []
+        for path, rel in files:
+            entry = cache.stat(rel)
+            if entry is not None:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if (st.st_mtime_ns, st.st_size) == entry[:2]:
+                    self.seen.add(rel)
+                    self.tasks.append((path, rel, None, entry))
+                    continue
+            self.tasks.append((path, rel, entry[2] if entry else None, entry))
+        self.hits = len(self.seen)
+
+    def __iter__(self) -> Iterator[Tuple[str, tuple, Any, bool]]:
+        cache, seen = self.cache, self.seen
+        to_run = [(path, rel, known) for path, rel, known, entry in self.tasks if rel not in seen]
+        pool = None
+        if self.workers > 1 and len(to_run) >= _PARALLEL_THRESHOLD:
+            pool = ProcessPoolExecutor(max_workers=self.workers)
+            results = pool.map(self.worker, to_run, chunksize=max(1, min(256, len(to_run) // (self.workers * 4))))
+        else:
+            results = map(self.worker, to_run)
+        try:
+            for path, rel, known, entry in self.tasks:
+                cached = rel in seen
+                if cached:
+                    data = cache.get(rel)
+                else:
+                    _, result = next(results)
+                    if result is None:
+                        continue
+                    entry, data = result[:3], result[3]
+                    if data is None:  # content unchanged, only the stat differed
+                        data = cache.get(rel)
+                        cached = data is not None
+                    cache.put(rel, entry, result[3])
+                    seen.add(rel)
+                if data is None:  # cache entry missing or unreadable: run the worker again
+                    _, result = self.worker((path, rel, None))
+                    if result is None:
+                        continue
+                    entry, data, cached = result[:3], result[3], False
+                    cache.put(rel, entry, data)
+                yield rel, entry, data, cached
+            cache.save(seen)
+        finally:
+            cache.close()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+def iter_python_functions(src_dir: str, workers: Optional[int] = None, cache_path: Optional[str] = None,
+                          select: Optional[FunctionFilter] = None) -> Iterator[FunctionInfo]:
+    """Stream FunctionInfo for the functions under src_dir that pass select, in a deterministic (sorted) order.
+
+    Files are parsed in a process pool and results are yielded as soon as each file is
+    done, so consumers can start work before the scan finishes. The default filter drops
+    private, nested and dunder functions; the parse cache always holds the unfiltered scan.
+    Parsed functions are not retained once yielded: cache entries are written and read
+    one file at a time.
+    """
+    select = select or FunctionFilter()
+    scan = CachedScan(_iter_source_files(Path(src_dir)), _parse_file, ParseCache(cache_path), workers)
+    telemetry = get_telemetry()
+    telemetry.count("scan.files", len(scan.tasks))
+    telemetry.count("scan.cache_hits", scan.hits)
+    # Wall time until the scan is exhausted; overlaps with consumers of the stream
+    with telemetry.span("scan", files=len(scan.tasks), parsed=len(scan.tasks) - scan.hits), \
+            contextlib.closing(iter(scan)) as results:
+        for rel, entry, funcs, cached in results:
+            yield from (fn for fn in funcs if select(fn))
+
+def scan_python_functions(src_dir: str, workers: Optional[int] = None, cache_path: Optional[str] = None,
+                          select: Optional[FunctionFilter] = None) -> List[FunctionInfo]:
+    return list(iter_python_functions(src_dir, workers=workers, cache_path=cache_path, select=select))
@@ -0,0 +1,101 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+class ResponseCache:
+    """Content-addressed on-disk cache of LLM responses.
+
+    Entries live in a sharded directory (``<dir>/<key[:2]>/<key>.json``) so that
+    no single directory grows unbounded. Keys are a hash of everything that can
+    change the response: provider, model, temperature and the prompt text.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: Optional[int] = None, max_age: Optional[float] = None):
+        self.root = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age  # seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(provider: str, model: str, temperature: float, prompt: str) -> str:
+        h = hashlib.sha256()
+        for part in (provider, model, repr(float(temperature)), prompt):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            # mtime is the last-used time; entries idle longer than max_age are stale
+            if self.max_age is not None and time.time() - path.stat().st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                raise OSError("expired")
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, ValueError):
+            self._count(False)
+            return None
+        self._count(True)
+        return entry.get("response")
+
+    def put(self, key: str, response: str):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({"created": time.time(), "response": response}), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def evict(self) -> int:
+        """Drop entries idle longer than max_age, then the least recently used until under max_bytes."""
+        if not self.root.exists():
+            return 0
+        now = time.time()
+        entries = []
+        removed = 0
+        for path in self.root.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if self.max_age is not None and now - st.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                removed += 1
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        if self.max_bytes is not None:
+            total = sum(size for _, size, _ in entries)
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
@@ -1,9 +1,39 @@
 from __future__ import annotations
 import argparse
+import hashlib
+import json
+import os
 from pathlib import Path
-from .ast_extract import scan_python_functions
+from .ast_extract import FunctionFilter, iter_python_functions
+from .cache import ResponseCache
 from .generator import write_tests
+from .guardrails import StreamLimits
+from .llm_provider import LLMProvider
+from .providers import available_providers
+from .prompts import PromptConfig
+from .telemetry import Telemetry, get_telemetry, set_telemetry
+from .tokens import set_token_estimator, token_estimator
+from .priority import CoverageData, prioritize
+from .ratelimit import Budget, RateLimiter, RetryPolicy
 from .evaluator import write_report
+from .watch import Watcher, request
+from .workqueue import RUN_DIR_NAME, WorkQueue, merge, parse_shard
+
+def _add_filter_args(p):
+    p.add_argument("--include", action="append", default=[], metavar="GLOB", help="Only functions matching module:qualname, module or file path globs (repeatable)")
+    p.add_argument("--exclude", action="append", default=[], metavar="GLOB", help="Skip functions matching these globs (repeatable)")
+    p.add_argument("--private", action="store_true", help="Include _private functions and methods")
+    p.add_argument("--nested", action="store_true", help="Include functions defined inside other functions")
+    p.add_argument("--dunder", action="store_true", help="Include __dunder__ methods such as __init__")
+
+def _tree_cache_path(cache_dir: str, kind: str, tree: str) -> str:
+    """One cache file per scanned tree: entries are keyed by path relative to it."""
+    tree_key = hashlib.sha256(str(Path(tree).resolve()).encode("utf-8")).hexdigest()[:16]
+    return str(Path(cache_dir) / f"{kind}_cache_{tree_key}.sqlite")
+
+def _function_filter(args) -> FunctionFilter:
+    return FunctionFilter(private=args.private, nested=args.nested, dunder=args.dunder,
+                          include=tuple(args.include), exclude=tuple(args.exclude))
 
 def main():
     parser = argparse.ArgumentParser(prog="llm-testgen", description="Generate tests from code + design docs (LLM optional)")
@@ -11,36 +41,220 @@ def main():
 
     p_scan = sub.add_parser("scan", help="Scan for functions")
     p_scan.add_argument("--src", required=True, help="Source directory")
+    p_scan.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    p_scan.add_argument("--parse-cache", help="Optional path of a persistent parse cache (SQLite file, written as the scan streams)")
+    _add_filter_args(p_scan)
 
     p_gen = sub.add_parser("generate", help="Generate test files")
     p_gen.add_argument("--src", required=True, help="Source directory to analyze")
     p_gen.add_argument("--out", required=True, help="Output directory for tests")
     p_gen.add_argument("--design", help="Optional design/requirements markdown file")
     p_gen.add_argument("--framework", choices=["pytest", "robot"], default="pytest", help="Target test framework (default: pytest)")
+    p_gen.add_argument("--jobs", "--max-inflight", dest="jobs", type=int, default=4, help="Maximum concurrent LLM requests (default: 4)")
+    p_gen.add_argument("--workers", type=int, default=None, help="Parser processes for scanning (default: CPU count)")
+    p_gen.add_argument("--incremental", action="store_true", help="Only regenerate tests for functions whose source or linked requirement changed")
+    p_gen.add_argument("--no-dedup", action="store_true", help="Call the LLM for every function, even structurally identical ones")
+    p_gen.add_argument("--batch-tokens", type=int, default=0, help="Pack functions of a module into one LLM prompt up to this many target tokens (default: 0, off)")
+    p_gen.add_argument("--context-k", type=int, default=4, help="Design-doc chunks included per prompt (default: 4)")
+    p_gen.add_argument("--context-tokens", type=int, default=600, help="Token budget for design context per prompt (default: 600)")
+    p_gen.add_argument("--max-prompt-tokens", type=int, default=3000, help="Trim linked requirements and design context to keep each prompt under this many tokens (default: 3000, 0 for no limit)")
+    p_gen.add_argument("--tokenizer", choices=["heuristic", "tiktoken"], default="heuristic", help="Token estimator for budgets and reports (default: heuristic, ~4 chars/token)")
+    p_gen.add_argument("--stream", action="store_true", help="Stream LLM responses and abort early on guardrail violations")
+    p_gen.add_argument("--max-output-tokens", type=int, help="With --stream, abort responses longer than this (estimated tokens)")
+    p_gen.add_argument("--max-latency", type=float, help="With --stream, abort responses taking longer than this many seconds")
+    p_gen.add_argument("--provider", help=f"LLM provider (default: $LLM_PROVIDER; built in: {', '.join(available_providers())})")
+    p_gen.add_argument("--cassette", help="Record LLM responses to this JSONL file, or replay them with --provider replay")
+    p_gen.add_argument("--rpm", type=float, help="Maximum LLM requests per minute")
+    p_gen.add_argument("--tpm", type=float, help="Maximum LLM prompt tokens per minute (estimated)")
+    p_gen.add_argument("--max-retries", type=int, default=5, help="Retries for throttled/failed LLM requests (default: 5)")
+    p_gen.add_argument("--coverage", metavar="PATH", help="coverage.py data (.coverage or 'coverage json' report); send the least covered, most complex, requirement-linked functions to the LLM first")
+    p_gen.add_argument("--max-llm-calls", type=int, help="Stop calling the LLM after this many requests; remaining functions get rule-based skeletons")
+    p_gen.add_argument("--max-seconds", type=float, help="Stop calling the LLM after this many seconds")
+    p_gen.add_argument("--max-tokens", type=int, help="Stop calling the LLM after this many prompt + output tokens (estimated)")
+    p_gen.add_argument("--profile", metavar="PATH", help="Write a Chrome-trace JSON timeline and print a stage summary")
+    p_gen.add_argument("--cache-dir", default=".llm_testgen_cache", help="Directory for cached LLM responses (default: .llm_testgen_cache)")
+    p_gen.add_argument("--no-cache", action="store_true", help="Always call the LLM; do not read or write the response cache")
+    p_gen.add_argument("--cache-max-mb", type=float, default=512, help="Evict least recently used cache entries above this size (default: 512)")
+    p_gen.add_argument("--cache-max-age", type=float, default=30, help="Evict cache entries unused for this many days (default: 30)")
+    p_gen.add_argument("--resume", action="store_true", help="Continue an interrupted run, reusing every checkpointed function")
+    p_gen.add_argument("--shard", type=parse_shard, default=(0, 1), metavar="I/N", help="Only generate shard I (0-based) of N; combine shards with 'merge'")
+    p_gen.add_argument("--run-dir", help=f"Checkpoint directory for the run (default: <out>/{RUN_DIR_NAME})")
+    _add_filter_args(p_gen)
+
+    p_watch = sub.add_parser("watch", help="Keep the index warm and regenerate tests as sources change")
+    p_watch.add_argument("--src", required=True, help="Source directory to watch")
+    p_watch.add_argument("--out", required=True, help="Output directory for tests")
+    p_watch.add_argument("--design", help="Optional design/requirements markdown file (reloaded when it changes)")
+    p_watch.add_argument("--framework", choices=["pytest", "robot"], default="pytest", help="Target test framework (default: pytest)")
+    p_watch.add_argument("--jobs", type=int, default=4, help="Maximum concurrent LLM requests (default: 4)")
+    p_watch.add_argument("--workers", type=int, default=None, help="Parser processes for the initial scan (default: CPU count)")
+    p_watch.add_argument("--interval", type=float, default=0.5, help="Seconds between polls of the source tree (default: 0.5)")
+    p_watch.add_argument("--debounce", type=float, default=0.2, help="Quiet period that ends a burst of saves (default: 0.2)")
+    p_watch.add_argument("--provider", help="LLM provider (default: $LLM_PROVIDER)")
+    p_watch.add_argument("--cassette", help="Record LLM responses to this JSONL file, or replay them with --provider replay")
+    p_watch.add_argument("--cache-dir", default=".llm_testgen_cache", help="Directory for cached LLM responses (default: .llm_testgen_cache)")
+    p_watch.add_argument("--no-cache", action="store_true", help="Do not read or write the response and parse caches")
+    _add_filter_args(p_watch)
+
+    p_ctl = sub.add_parser("ctl", help="Query or trigger a running 'watch'")
+    p_ctl.add_argument("--out", required=True, help="Output directory the watcher writes to")
+    p_ctl.add_argument("command", choices=["status", "functions", "regenerate", "stop"])
+    p_ctl.add_argument("paths", nargs="*", help="For regenerate: source files relative to --src (default: all)")
+    p_ctl.add_argument("--module", help="For functions: only this module")
+    p_ctl.add_argument("--timeout", type=float, default=600, help="Seconds to wait for the reply (default: 600)")
+
+    p_merge = sub.add_parser("merge", help="Assemble test files from the checkpoints of sharded generate runs")
+    p_merge.add_argument("--out", required=True, help="Output directory for tests")
+    p_merge.add_argument("--run-dir", nargs="+", required=True, help="Run directories of the shards")
 
     p_eval = sub.add_parser("evaluate", help="Evaluate generated tests and traceability")
     p_eval.add_argument("--tests", required=True, help="Directory containing generated tests")
     p_eval.add_argument("--out", default="metrics.json", help="Path to write JSON metrics")
+    p_eval.add_argument("--run", action="store_true", help="Also execute the generated pytest files and record outcomes and timings")
+    p_eval.add_argument("--jobs", type=int, default=None, help="Parallel test worker processes for --run (default: CPU count)")
+    p_eval.add_argument("--timeout", type=float, default=60.0, help="Per-file timeout in seconds for --run, per-mutant cap for --mutation (default: 60)")
+    p_eval.add_argument("--design", help="Design doc whose REQ-IDs form the requirement coverage matrix")
+    p_eval.add_argument("--records", help="Also stream one JSON line per test file (then the summary) to this path")
+    p_eval.add_argument("--workers", type=int, default=None, help="Scanner processes (default: CPU count)")
+    p_eval.add_argument("--cache-dir", default=".llm_testgen_cache", help="Directory for the per-file evaluation cache (default: .llm_testgen_cache)")
+    p_eval.add_argument("--no-cache", action="store_true", help="Rescan every file; do not read or write the evaluation cache")
+    p_eval.add_argument("--mutation", action="store_true", help="Mutation-test the functions in --src against the generated tests that target them")
+    p_eval.add_argument("--src", help="Source directory the tests were generated from (required with --mutation)")
+    p_eval.add_argument("--max-mutants", type=int, default=None, help="At most this many mutants per function for --mutation")
+    _add_filter_args(p_eval)
 
     args = parser.parse_args()
 
     if args.cmd == "scan":
-        funcs = scan_python_functions(args.src)
+        funcs = iter_python_functions(args.src, workers=args.workers, cache_path=args.parse_cache, select=_function_filter(args))
         for f in funcs:
-            print(f"{f.module}:{f.qualname} args={f.args} returns={f.returns}")
+            print(f"{f.module}:{f.qualname} {f.signature()}")
         return
 
     if args.cmd == "generate":
+        if args.provider == "replay" and not (args.cassette or os.getenv("LLM_CASSETTE")):
+            parser.error("--provider replay needs --cassette")
         design_text = None
         if args.design and Path(args.design).exists():
             design_text = Path(args.design).read_text(encoding="utf-8")
-        funcs = scan_python_functions(args.src)
-        # Pass src_dir and framework preference
-        count = write_tests(funcs, args.out, args.src, design_text, framework=args.framework)
-        print(f"Generated {count} {args.framework} file(s) in {args.out}")
+        set_token_estimator(token_estimator(args.tokenizer))
+        cache = None
+        if not args.no_cache:
+            cache = ResponseCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024),
+                                  max_age=args.cache_max_age * 86400)
+        parse_cache = None if args.no_cache else _tree_cache_path(args.cache_dir, "parse", args.src)
+        # Stream the scan straight into generation
+        funcs = iter_python_functions(args.src, workers=args.workers, cache_path=parse_cache, select=_function_filter(args))
+        budget = Budget(max_calls=args.max_llm_calls, max_seconds=args.max_seconds, max_tokens=args.max_tokens)
+        positions = None
+        if args.coverage or budget.limited:
+            # Ranking needs the whole scan; the highest-value targets are submitted first
+            coverage = CoverageData.load(args.coverage) if args.coverage else None
+            funcs, positions = prioritize(funcs, args.src, coverage, design_text)
+        limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm, max_concurrency=args.jobs)
+        telemetry = Telemetry() if args.profile else None
+        set_telemetry(telemetry)
+        queue = WorkQueue(args.run_dir or str(Path(args.out) / RUN_DIR_NAME), shard=args.shard)
+        with LLMProvider(cache=cache, limiter=limiter, retry=RetryPolicy(max_retries=args.max_retries),
+                         provider=args.provider, cassette=args.cassette, budget=budget) as provider, \
+                get_telemetry().span("generate"):
+            # Pass src_dir and framework preference
+            count = write_tests(funcs, args.out, args.src, design_text, framework=args.framework, jobs=args.jobs, provider=provider, incremental=args.incremental, batch_tokens=args.batch_tokens,
+                                prompt_config=PromptConfig(context_k=args.context_k, context_tokens=args.context_tokens, max_prompt_tokens=args.max_prompt_tokens),
+                                stream=StreamLimits(args.max_output_tokens, args.max_latency) if args.stream else None,
+                                queue=queue, resume=args.resume, dedup=not args.no_dedup, positions=positions)
+        if queue.resumed:
+            print(f"Resumed {queue.resumed} checkpointed function(s) from {queue.root}")
+        if not queue.sharded:
+            print(f"Generated {count} {args.framework} file(s) in {args.out}")
+        if cache is not None and provider.provider:
+            cache.evict()
+            print(f"LLM cache: {cache.stats()}")
+        if provider.provider:
+            print(f"LLM rate limiting: {limiter.stats()}")
+            if budget.limited:
+                print(f"LLM budget: {budget.stats()}")
+        if telemetry is not None:
+            telemetry.write_trace(args.profile)
+            summary = telemetry.summary()
+            print(f"Profile written to {args.profile} (wall {summary['wall_s']}s)")
+            for name, span in sorted(summary["spans"].items(), key=lambda item: -item[1]["total_s"]):
+                print(f"  {name:<24} n={span['count']:<6} total={span['total_s']:.3f}s p50={span['p50_ms']}ms p95={span['p95_ms']}ms")
+            print(f"  llm: {summary['llm']}")
+            print(f"  prompts: {summary['prompts']}")
+            set_telemetry(None)
+        return
+
+    if args.cmd == "watch":
+        cache = None if args.no_cache else ResponseCache(args.cache_dir)
+        parse_cache = None if args.no_cache else _tree_cache_path(args.cache_dir, "parse", args.src)
+        with LLMProvider(cache=cache, limiter=RateLimiter(max_concurrency=args.jobs),
+                         provider=args.provider, cassette=args.cassette) as provider:
+            watcher = Watcher(args.src, args.out, args.design, framework=args.framework, provider=provider,
+                              jobs=args.jobs, select=_function_filter(args), interval=args.interval,
+                              debounce=args.debounce, workers=args.workers, parse_cache=parse_cache)
+            print(f"Watching {args.src} -> {args.out} (Ctrl-C or 'llm-testgen ctl --out {args.out} stop' to end)")
+            try:
+                watcher.serve()
+            except KeyboardInterrupt:
+                pass
+        return
+
+    if args.cmd == "ctl":
+        message = {"cmd": args.command}
+        if args.paths:
+            message["paths"] = args.paths
+        if args.module:
+            message["module"] = args.module
+        try:
+            print(json.dumps(request(args.out, message, timeout=args.timeout), indent=2))
+        except (ConnectionError, OSError) as e:
+            parser.exit(1, f"llm-testgen ctl: {e}\n")
+        return
+
+    if args.cmd == "merge":
+        count = merge(args.run_dir, args.out)
+        print(f"Merged {count} file(s) from {len(args.run_dir)} run dir(s) into {args.out}")
         return
 
     if args.cmd == "evaluate":
-        metrics = write_report(args.tests, args.out)
-        print(f"Wrote metrics to {args.out}: {metrics}")
-        return
\ No newline at end of file
+        if args.mutation and not args.src:
+            parser.error("evaluate --mutation requires --src")
+        design_text = Path(args.design).read_text(encoding="utf-8") if args.design else None
+        cache_path = None if args.no_cache else _tree_cache_path(args.cache_dir, "eval", args.tests)
+        metrics = write_report(args.tests, args.out, run=args.run, jobs=args.jobs, timeout=args.timeout,
+                               mutation_src=args.src if args.mutation else None, max_mutants=args.max_mutants,
+                               select=_function_filter(args), workers=args.workers, cache_path=cache_path,
+                               records_path=args.records, design_text=design_text)
+        run = metrics.pop("run", None)
+        mutation = metrics.pop("mutation", None)
+        requirements = metrics.pop("requirements", None)
+        scan = metrics["scan"]
+        print(f"Wrote metrics to {args.out}: {metrics['files_total']} file(s), {metrics['compile_success']} valid, "
+              f"{metrics['test_functions']} pytest test(s), {metrics['robot_test_cases']} robot test(s), "
+              f"{metrics['guardrail_violations']} guardrail violation(s), {metrics['traceability_unique_reqs']} REQ-ID(s) "
+              f"[{scan['scanned']} scanned, {scan['cached']} cached, {scan['duration']}s]")
+        for error in metrics["compile_errors"][:5]:
+            print(f"  invalid: {error['file']}: {'; '.join(error['errors'][:2])}")
+        if args.records:
+            print(f"Per-file records streamed to {args.records}")
+        if requirements:
+            print(f"Requirement coverage {requirements['covered']}/{requirements['total']} ({requirements['coverage']})"
+                  + (f", uncovered: {', '.join(requirements['uncovered'])}" if requirements["uncovered"] else "")
+                  + (f", unknown: {', '.join(requirements['unknown'])}" if requirements["unknown"] else ""))
+        if run:
+            print(f"Ran {run['tests_total']} test(s): {run['passed']} passed, {run['failed']} failed, "
+                  f"{run['error']} error(s), {run['skipped']} skipped, {run['files_timed_out']} file(s) timed out")
+            for case in run["slowest"][:5]:
+                print(f"  slow: {case['duration']:.3f}s {case['file']}::{case['test'].split('::')[-1]}")
+        if mutation:
+            print(f"Mutation score {mutation['score']} ({mutation['killed'] + mutation['timeout']}/{mutation['mutants']} killed, "
+                  f"{mutation['survived']} survived, {mutation['no_coverage']} without a covering test) in {mutation['duration']}s")
+            for module, stats in mutation["modules"].items():
+                print(f"  {module:<40} score={stats['score']} covered_score={stats['covered_score']} mutants={stats['mutants']}")
+            for mutant in mutation["surviving"][:10]:
+                print(f"  survived: {mutant['module']}:{mutant['function']} line {mutant['line']}: {mutant['mutation']}")
+        return
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .requirements import REQ_ID_RE
+from .tokens import estimate_tokens
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+_HEADING_RE = re.compile(r"^#{1,6}\s")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words; snake_case identifiers also contribute their parts."""
+    terms = []
+    for word in _WORD_RE.findall(text):
+        word = word.lower()
+        terms.append(word)
+        if "_" in word:
+            terms.extend(part for part in word.split("_") if part)
+    return terms
+
+def chunk_design(design_text: str, max_chars: int = 1200) -> List[str]:
+    """Split a markdown design doc at headings, then at paragraphs for long sections."""
+    sections: List[List[str]] = [[]]
+    for line in design_text.splitlines():
+        if _HEADING_RE.match(line) and sections[-1]:
+            sections.append([])
+        sections[-1].append(line)
+
+    chunks = []
+    for lines in sections:
+        text = "\n".join(lines).strip()
+        if not text:
+            continue
+        if len(text) <= max_chars:
+            chunks.append(text)
+            continue
+        current = ""
+        for para in re.split(r"\n\s*\n", text):
+            if current and len(current) + len(para) + 2 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{para}" if current else para
+        if current:
+            chunks.append(current)
+    return chunks
+
+class DesignContext:
+    """BM25 index over design-doc chunks, built once per design doc."""
+
+    K1 = 1.5
+    B = 0.75
+    MIN_SCORE_RATIO = 0.4
+
+    def __init__(self, design_text: Optional[str], max_chunk_chars: int = 1200):
+        self.chunks = chunk_design(design_text, max_chunk_chars) if design_text else []
+        self.chunk_reqs: List[Set[str]] = [set(REQ_ID_RE.findall(c)) for c in self.chunks]
+        self.chunk_tokens = [estimate_tokens(c) for c in self.chunks]
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for i, chunk in enumerate(self.chunks):
+            terms = tokenize(chunk)
+            lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self._postings.setdefault(term, []).append((i, tf))
+        self._lengths = lengths
+        self._avgdl = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    def scores(self, query: str) -> Dict[int, float]:
+        n = len(self.chunks)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = tf + self.K1 * (1 - self.B + self.B * self._lengths[i] / self._avgdl)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.K1 + 1) / norm
+        return scores
+
+    def select(self, query: str, k: int = 4, token_budget: int = 600, exclude_reqs: Iterable[str] = ()) -> str:
+        """Top-k relevant chunks within token_budget, returned in document order.
+
+        Chunks covering only requirements in exclude_reqs (already quoted elsewhere in
+        the prompt) are skipped.
+        """
+        exclude = set(exclude_reqs)
+        ranked = sorted(self.scores(query).items(), key=lambda item: (-item[1], item[0]))
+        # Chunks far below the best match only share common words like "int" or "return"
+        cutoff = ranked[0][1] * self.MIN_SCORE_RATIO if ranked else 0.0
+        chosen = []
+        used = 0
+        for i, score in ranked:
+            if len(chosen) >= k or score < cutoff:
+                break
+            if self.chunk_reqs[i] and self.chunk_reqs[i] <= exclude:
+                continue
+            if used + self.chunk_tokens[i] > token_budget:
+                continue
+            chosen.append(i)
+            used += self.chunk_tokens[i]
+        return "\n\n".join(self.chunks[i] for i in sorted(chosen))
+
+@lru_cache(maxsize=8)
+def design_context(design_text: Optional[str]) -> DesignContext:
+    return DesignContext(design_text)
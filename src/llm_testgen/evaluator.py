@@ -1,54 +1,247 @@
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import ast
+import contextlib
+import hashlib
+import os
 import re
 import json
-from typing import Dict, Any
-
-def evaluate_dir(tests_dir: str) -> Dict[str, Any]:
-    p = Path(tests_dir)
-    # Gather both python and robot files
-    py_files = list(p.rglob("test_*.py"))
-    robot_files = list(p.rglob("*.robot"))
-    all_files = py_files + robot_files
-    
-    compiles = 0
-    req_ids_found = set()
-    
-    # Check Python Syntax
-    for f in py_files:
-        content = f.read_text(encoding="utf-8")
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from .ast_extract import CachedScan, ParseCache
+from .guardrails import check
+from .requirements import REQ_ID_RE, requirement_index
+from .robot_parser import parse_robot
+
+# Traceability comments in generated pytest files: "# REQ-ID: REQ-101, REQ-102"
+_REQ_LINE_RE = re.compile(r"REQ-ID:[^\n]*")
+
+class EvalCache(ParseCache):
+    """Per-file evaluation records keyed by (path, mtime, size, content hash), like the parse cache."""
+
+    VERSION = 2
+
+def _iter_test_files(base: Path) -> Iterator[Tuple[str, str]]:
+    """Yield (absolute path, relative path) of every test_*.py and *.robot file, sorted, pruning hidden dirs."""
+    for root, dirs, files in os.walk(base):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != "__pycache__")
+        for name in sorted(files):
+            if (name.startswith("test_") and name.endswith(".py")) or name.endswith(".robot"):
+                path = os.path.join(root, name)
+                yield path, os.path.relpath(path, base).replace(os.sep, "/")
+
+def _python_record(content: str) -> Dict[str, Any]:
+    report = check(content)
+    record: Dict[str, Any] = {"kind": "python", "compiles": report.compiles, "violations": len(report.violations)}
+    tests = 0
+    if report.compiles:
+        # What pytest collects: module-level test functions and methods of Test classes
+        for node in report.tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test"):
+                tests += 1
+            elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+                tests += sum(isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name.startswith("test")
+                             for item in node.body)
+    else:
+        record["errors"] = [report.syntax_error]
+    record["tests"] = tests
+    req_ids = set()
+    if "REQ-ID:" in content:
+        for line in _REQ_LINE_RE.findall(content):
+            req_ids.update(REQ_ID_RE.findall(line))
+    record["req_ids"] = sorted(req_ids)
+    return record
+
+def _robot_record(content: str) -> Dict[str, Any]:
+    suite = parse_robot(content)
+    req_ids = {tag for tags in suite.tags_by_test().values() for tag in tags if REQ_ID_RE.fullmatch(tag)}
+    record: Dict[str, Any] = {"kind": "robot", "compiles": suite.valid, "violations": 0, "tests": len(suite.tests),
+                              "sections": suite.sections, "req_ids": sorted(req_ids)}
+    if suite.errors:
+        record["errors"] = suite.errors[:10]
+    return record
+
+def _evaluate_file(task: Tuple[str, str, Optional[str]]):
+    """Worker: read, hash and scan one test file. Skips the scan if the hash is already known."""
+    path, rel, known_hash = task
+    try:
+        st = os.stat(path)
+        data = Path(path).read_bytes()
+    except OSError:
+        return rel, None
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == known_hash:
+        return rel, (st.st_mtime_ns, st.st_size, digest, None)
+    content = data.decode("utf-8", errors="replace")
+    record = _robot_record(content) if rel.endswith(".robot") else _python_record(content)
+    return rel, (st.st_mtime_ns, st.st_size, digest, record)
+
+def iter_evaluate(tests_dir: str, workers: Optional[int] = None, cache_path: Optional[str] = None,
+                  stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """Stream one record per generated test file, in sorted path order.
+
+    Files are scanned in a process pool; a file whose mtime and size match the cache is
+    not opened, and one whose content hash matches is not rescanned. stats, if given,
+    is kept up to date with the counts of scanned and cached files.
+    """
+    scan = CachedScan(_iter_test_files(Path(tests_dir)), _evaluate_file, EvalCache(cache_path), workers)
+    stats = stats if stats is not None else {}
+    stats.update(files=len(scan.tasks), scanned=0, cached=0)
+    with contextlib.closing(iter(scan)) as results:
+        for rel, entry, record, cached in results:
+            stats["cached" if cached else "scanned"] += 1
+            yield {"file": rel, **record, "sha256": entry[2], "cached": cached}
+
+def requirement_matrix(req_files: Dict[str, List[str]], design_text: Optional[str]) -> Dict[str, Any]:
+    """REQ-ID x test file coverage for every requirement in the design doc, in document order."""
+    index = requirement_index(design_text)
+    matrix = {req_id: sorted(req_files.get(req_id, ())) for req_id in index.requirements}
+    covered = sum(1 for files in matrix.values() if files)
+    return {
+        "total": len(matrix),
+        "covered": covered,
+        "coverage": round(covered / len(matrix), 3) if matrix else None,
+        "uncovered": [req_id for req_id, files in matrix.items() if not files],
+        # Traced in tests but absent from the design doc: typos or stale IDs
+        "unknown": sorted(set(req_files) - set(matrix)),
+        "matrix": matrix,
+    }
+
+def evaluate_dir(tests_dir: str, workers: Optional[int] = None, cache_path: Optional[str] = None,
+                 records_path: Optional[str] = None, design_text: Optional[str] = None,
+                 max_errors: int = 20) -> Dict[str, Any]:
+    """Summary metrics for a generated test tree.
+
+    With records_path, each file's record is written there as one JSON line while the
+    scan runs, followed by a final summary line. With design_text, the summary includes
+    the REQ-ID x test file coverage matrix.
+    """
+    start = time.perf_counter()
+    stats: Dict[str, int] = {}
+    counts = {"python": 0, "robot": 0}
+    totals = {"compile_success": 0, "test_functions": 0, "robot_test_cases": 0, "guardrail_violations": 0}
+    req_files: Dict[str, List[str]] = {}
+    errors = []
+    sink = open(records_path, "w", encoding="utf-8") if records_path else None
+    try:
+        for record in iter_evaluate(tests_dir, workers=workers, cache_path=cache_path, stats=stats):
+            if sink is not None:
+                sink.write(json.dumps({"type": "file", **record}) + "\n")
+            counts[record["kind"]] += 1
+            totals["compile_success"] += record["compiles"]
+            totals["test_functions" if record["kind"] == "python" else "robot_test_cases"] += record["tests"]
+            totals["guardrail_violations"] += record["violations"]
+            for req_id in record["req_ids"]:
+                req_files.setdefault(req_id, []).append(record["file"])
+            if not record["compiles"] and len(errors) < max_errors:
+                errors.append({"file": record["file"], "errors": record.get("errors", [])})
+        metrics: Dict[str, Any] = {
+            "files_total": counts["python"] + counts["robot"],
+            "files_python": counts["python"],
+            "files_robot": counts["robot"],
+            **totals,
+            "traceability_unique_reqs": len(req_files),
+            "req_ids": sorted(req_files),
+            "compile_errors": errors,
+            "scan": {"scanned": stats["scanned"], "cached": stats["cached"],
+                     "duration": round(time.perf_counter() - start, 3)},
+        }
+        if design_text is not None:
+            metrics["requirements"] = requirement_matrix(req_files, design_text)
+        if sink is not None:
+            sink.write(json.dumps({"type": "summary", **metrics}) + "\n")
+    finally:
+        if sink is not None:
+            sink.close()
+    return metrics
+
+def _parse_junit(xml_path: Path) -> List[Dict[str, Any]]:
+    cases = []
+    for case in ET.parse(xml_path).getroot().iter("testcase"):
+        outcome = "passed"
+        for child in case:
+            if child.tag in ("failure", "error", "skipped"):
+                outcome = {"failure": "failed", "error": "error", "skipped": "skipped"}[child.tag]
+                break
+        cases.append({
+            "test": f"{case.get('classname', '')}::{case.get('name', '')}",
+            "outcome": outcome,
+            "duration": float(case.get("time") or 0.0),
+        })
+    return cases
+
+def _run_test_file(path: Path, timeout: float, root: Optional[Path] = None) -> Dict[str, Any]:
+    """Run one generated pytest file in its own interpreter, in a scratch working directory.
+
+    conftest.py files between root (the generated tree) and the file are still loaded.
+    """
+    with tempfile.TemporaryDirectory(prefix="llm-testgen-run-") as scratch:
+        junit = Path(scratch) / "junit.xml"
+        cmd = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+               "--rootdir", scratch, f"--confcutdir={(root or path.parent).resolve()}",
+               f"--junitxml={junit}", str(path.resolve())]
+        # Generated code must not leak state into the tree or the parent environment
+        env = {k: v for k, v in os.environ.items() if not k.startswith(("LLM_", "OPENAI_", "GEMINI_"))}
+        env["PYTHONDONTWRITEBYTECODE"] = "1"
+        start = time.perf_counter()
         try:
-            ast.parse(content)
-            compiles += 1
-        except Exception:
-            pass
-        
-        # Scan for REQ-ID comments
-        ids = re.findall(r"REQ-ID:\s*(REQ-\d+)", content)
-        req_ids_found.update(ids)
-
-    # Check Robot "Syntax" (Basic check) and Traceability
-    for f in robot_files:
-        content = f.read_text(encoding="utf-8")
-        # We assume robot files "compile" if they are non-empty for this tool
-        if len(content.strip()) > 0:
-            compiles += 1
-            
-        # Scan for Robot Tags [Tags] REQ-123
-        ids = re.findall(r"REQ-\d+", content)
-        req_ids_found.update(ids)
+            proc = subprocess.run(cmd, cwd=scratch, env=env, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {"status": "timeout", "duration": round(time.perf_counter() - start, 3), "tests": []}
+        duration = round(time.perf_counter() - start, 3)
+        if not junit.exists():
+            return {"status": "error", "duration": duration, "tests": [], "output": proc.stdout[-2000:] + proc.stderr[-2000:]}
+        tests = _parse_junit(junit)
+    # pytest exit codes: 0 all passed, 1 some failed, 5 nothing collected
+    status = {0: "passed", 1: "failed", 5: "empty"}.get(proc.returncode, "error")
+    return {"status": status, "duration": duration, "tests": tests}
+
+def run_tests(tests_dir: str, jobs: Optional[int] = None, timeout: float = 60.0, slowest: int = 10) -> Dict[str, Any]:
+    """Execute generated pytest files in parallel worker subprocesses and collect outcomes."""
+    files = sorted(Path(tests_dir).rglob("test_*.py"))
+    jobs = jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        results = dict(zip(files, pool.map(lambda f: _run_test_file(f, timeout, Path(tests_dir)), files)))
+
+    counts = {"passed": 0, "failed": 0, "error": 0, "skipped": 0}
+    all_tests = []
+    per_file = {}
+    for f, result in results.items():
+        rel = str(f.relative_to(tests_dir))
+        per_file[rel] = {k: v for k, v in result.items() if k != "tests"}
+        per_file[rel]["tests"] = len(result["tests"])
+        for case in result["tests"]:
+            counts[case["outcome"]] += 1
+            all_tests.append(dict(case, file=rel))
+    all_tests.sort(key=lambda c: -c["duration"])
 
     return {
-        "files_total": len(all_files),
-        "files_python": len(py_files),
-        "files_robot": len(robot_files),
-        "compile_success": compiles,
-        "traceability_unique_reqs": len(req_ids_found),
-        "req_ids": list(req_ids_found)
+        "tests_total": len(all_tests),
+        **counts,
+        "files_timed_out": sum(r["status"] == "timeout" for r in results.values()),
+        "files_errored": sum(r["status"] == "error" for r in results.values()),
+        "duration_total": round(sum(c["duration"] for c in all_tests), 3),
+        "slowest": all_tests[:slowest],
+        "files": per_file,
+        "tests": all_tests,
     }
 
-def write_report(tests_dir: str, out_path: str):
-    metrics = evaluate_dir(tests_dir)
+def write_report(tests_dir: str, out_path: str, run: bool = False, jobs: Optional[int] = None, timeout: float = 60.0,
+                 mutation_src: Optional[str] = None, max_mutants: Optional[int] = None, select=None,
+                 workers: Optional[int] = None, cache_path: Optional[str] = None, records_path: Optional[str] = None,
+                 design_text: Optional[str] = None):
+    metrics = evaluate_dir(tests_dir, workers=workers, cache_path=cache_path, records_path=records_path,
+                           design_text=design_text)
+    if run:
+        metrics["run"] = run_tests(tests_dir, jobs=jobs, timeout=timeout)
+    if mutation_src:
+        from .mutation import mutation_report
+        metrics["mutation"] = mutation_report(tests_dir, mutation_src, jobs=jobs, timeout=timeout,
+                                              max_mutants=max_mutants, select=select)
     Path(out_path).write_text(json.dumps(metrics, indent=2), encoding="utf-8")
     return metrics
\ No newline at end of file
@@ -1,56 +1,53 @@
 from __future__ import annotations
+import ast
 import os
 import re
 import sys
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from .ast_extract import FunctionInfo
-from .prompts import build_prompt
+from .prompts import BATCH_SECTION_MARKER, PromptConfig, build_batch_prompt, build_prompt, describe_target
 from .llm_provider import LLMProvider
-from .guardrails import compiles, safe_content, sanitize
-
-PATH_SETUP_PY = """
-import sys
-import os
-import pytest
-
-# Add source directory to sys.path so we can import the module
-src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "{rel_path}"))
-if src_path not in sys.path:
-    sys.path.insert(0, src_path)
-""".strip()
+from .guardrails import StreamGuard, StreamLimits, _dotted, check, sanitize
+from .manifest import MANIFEST_NAME, Manifest, Skeleton, fingerprint, function_entry
+from .requirements import requirement_index
+from .synth import TypeIndex
+from .telemetry import get_telemetry
+from .tokens import estimate_tokens
+from .workqueue import RUN_DIR_NAME, WorkQueue
+from .writer import CONFTEST_NAME, OutputWriter, conftest_source, join_tests, test_file_path
 
+# Imports are merged per file and sys.path is set up once by the tree's conftest.py
 SKELETON_PYTEST_FUNC = """
-{path_setup}
-
+import pytest
 from {module} import {func}
-
+{imports}
 # REQ-ID: {req_id}
 def test_{func}_basic():
     # TODO: Replace placeholders with real assertions
-    result = {func}({call_args})
+    result = {call}
     assert result is not None
 
 def test_{func}_bad_inputs():
     with pytest.raises(Exception):
-        {func}(*[None for _ in range({argc})])
+        {bad_call}
 """.lstrip()
 
 SKELETON_PYTEST_METHOD = """
-{path_setup}
-
+import pytest
 from {module} import {cls}
-
+{imports}
 # REQ-ID: {req_id}
 def test_{cls}_{func}_basic():
-    obj = {cls}()
-    result = obj.{func}({call_args})
+    obj = {ctor}
+    result = {call}
     assert result is not None
 
 def test_{cls}_{func}_bad_inputs():
-    obj = {cls}()
+    obj = {ctor}
     with pytest.raises(Exception):
-        getattr(obj, "{func}")(*[None for _ in range({argc})])
+        {bad_call}
 """.lstrip()
 
 SKELETON_ROBOT = """
@@ -73,43 +70,23 @@ Test {func} Error
 """.lstrip()
 
 def _find_req_id(func_name: str, design_text: Optional[str]) -> str:
-    """Simple heuristic to find a REQ-ID linked to a function name in design docs."""
-    if not design_text:
-        return "N/A"
-    # Looking for patterns like "REQ-123: func_name" or "REQ-123 ... func_name"
-    # This is a basic match; usually you'd parse the markdown structure strictly.
-    for line in design_text.splitlines():
-        if func_name in line and "REQ-" in line:
-            match = re.search(r"(REQ-\d+)", line)
-            if match:
-                return match.group(1)
-    return "N/A"
-
-def _generate_arg_values(arg_names: List[str], annotations: dict) -> List[str]:
-    """Generate a list of default values."""
-    values = []
-    for arg in arg_names:
-        hint = annotations.get(arg, "").lower()
-        if "int" in hint: val = "1"
-        elif "float" in hint or "decimal" in hint: val = "0.5"
-        elif "str" in hint: val = "'x'"
-        elif "bool" in hint: val = "True"
-        elif "list" in hint or "iterable" in hint: val = "[]"
-        elif "dict" in hint or "mapping" in hint: val = "{}"
-        else: val = "0"
-        values.append(val)
-    return values
-
-def rule_based_skeleton(fn: FunctionInfo, rel_path: str, design_text: Optional[str], framework: str) -> str:
-    req_id = _find_req_id(fn.name, design_text)
-    
-    # Arg preparation
-    explicit_args = fn.args
-    is_method = "." in fn.qualname and explicit_args and explicit_args[0] == "self"
-    if is_method:
-        explicit_args = explicit_args[1:]
+    """First REQ-ID linked to a function name in the design doc, or N/A."""
+    return requirement_index(design_text).primary(func_name)
+
+# Annotation-only synthesis when no source tree is known
+_BUILTIN_TYPES = TypeIndex()
+
+def rule_based_skeleton(fn: FunctionInfo, rel_path: str, design_text: Optional[str], framework: str, types: Optional[TypeIndex] = None) -> str:
+    req_ids = requirement_index(design_text).lookup(fn.name) or ["N/A"]
+    types = types or _BUILTIN_TYPES
     
-    val_list = _generate_arg_values(explicit_args, fn.annotations)
+    # Arg preparation: parameters with defaults are left to their defaults
+    explicit_args = [arg for arg in fn.call_args() if arg not in fn.defaults]
+    keyword_args = [arg for arg in fn.kwonly if arg not in fn.defaults]
+
+    values = [types.value(fn.module, fn.annotations.get(arg), arg) for arg in explicit_args]
+    keywords = [types.value(fn.module, fn.annotations.get(arg), arg) for arg in keyword_args]
+    imports = set().union(*(v.imports for v in values + keywords))
     argc = len(explicit_args)
 
     if framework == "robot":
@@ -120,7 +97,7 @@ def rule_based_skeleton(fn: FunctionInfo, rel_path: str, design_text: Optional[s
         
         # Calculate library path (relative path to .py file)
         # Note: Robot Library import usually requires strict paths or PYTHONPATH
-        library_path = str(Path(rel_path) / f"{fn.module.split('.')[-1]}.py")
+        library_path = str(Path(rel_path) / fn.rel_path)
         
         # Call signature
         if "." in fn.qualname:
@@ -131,80 +108,447 @@ def rule_based_skeleton(fn: FunctionInfo, rel_path: str, design_text: Optional[s
         else:
             func_call = fn.name
 
-        robot_args = "    ".join(val_list)
+        # Plain literals become Robot variables; anything needing imports is passed as None
+        robot_args = "    ".join([_robot_value(v) for v in values] + [f"{arg}={_robot_value(v)}" for arg, v in zip(keyword_args, keywords)])
         # Bad args: Create a list of 'None' separated by 4 spaces
         robot_bad_args = "    ".join(["${None}"] * argc)
         
-        return SKELETON_ROBOT.format(
+        return Skeleton(SKELETON_ROBOT.format(
             module=fn.module,
             library_path=library_path,
             func=fn.name,
             func_call=func_call,
             robot_args=robot_args,
             robot_bad_args=robot_bad_args,
-            req_id=req_id
-        )
+            req_id="    ".join(req_ids)
+        ))
 
     else:
         # Pytest Logic
-        path_block = PATH_SETUP_PY.format(rel_path=rel_path)
-        call_args = ", ".join(val_list)
-        
-        if "." in fn.qualname:
+        call_args = ", ".join([v.expr for v in values] + [f"{arg}={v.expr}" for arg, v in zip(keyword_args, keywords)])
+        req_id = ", ".join(req_ids)
+        target = f"obj.{fn.name}" if fn.is_method else fn.name
+        call, bad_call = f"{target}({call_args})", f"{target}(*[None for _ in range({argc})])"
+        if fn.is_async:
+            call, bad_call = f"asyncio.run({call})", f"asyncio.run({bad_call})"
+            imports.add("import asyncio")
+
+        if fn.is_method:
             cls = fn.qualname.split(".", 1)[0]
-            return SKELETON_PYTEST_METHOD.format(
-                path_setup=path_block,
-                module=fn.module, cls=cls, func=fn.name,
-                call_args=call_args, argc=argc, req_id=req_id
-            )
-        return SKELETON_PYTEST_FUNC.format(
-            path_setup=path_block,
+            ctor = types.instance(fn.module, cls)
+            if ctor is not None:
+                imports |= ctor.imports
+            imports.discard(f"from {fn.module} import {cls}")
+            return Skeleton(SKELETON_PYTEST_METHOD.format(
+                module=fn.module, cls=cls, func=fn.name, ctor=ctor.expr if ctor else f"{cls}()",
+                call=call, bad_call=bad_call, req_id=req_id, imports=_import_block(imports)
+            ))
+        imports.discard(f"from {fn.module} import {fn.name}")
+        return Skeleton(SKELETON_PYTEST_FUNC.format(
             module=fn.module, func=fn.name,
-            call_args=call_args, argc=argc, req_id=req_id
-        )
-
-def generate_for_function(fn: FunctionInfo, design_text: Optional[str], provider: LLMProvider, rel_path: str, framework: str) -> str:
-    if provider.provider:
-        prompt = build_prompt(fn, design_text, framework)
-        code = provider.generate(prompt)
-        # Basic validation
-        if code:
-            if framework == "pytest":
-                if compiles(code) and safe_content(code):
-                    return sanitize(code)
+            call=call, bad_call=bad_call, req_id=req_id, imports=_import_block(imports)
+        ))
+
+def _robot_value(value) -> str:
+    """Robot argument for a synthesized value: ${1}/${True}/${None} or inline Python ${{...}}."""
+    if value.imports:
+        return "${None}"
+    if re.fullmatch(r"-?\d+(\.\d+)?|True|False|None", value.expr):
+        return f"${{{value.expr}}}"
+    return f"${{{{{value.expr}}}}}"
+
+def _import_block(imports) -> str:
+    return "".join(f"{line}\n" for line in sorted(imports))
+
+def _validate(code: Optional[str], framework: str) -> Optional[str]:
+    """Return sanitized code if it passes the guardrails, else None."""
+    # Basic validation; Robot files only get the textual safety scan (no exec usage)
+    if code:
+        if check(code, python=framework == "pytest").ok:
+            return sanitize(code)
+        get_telemetry().count("guardrail.rejected")
+    return None
+
+def _generate_streaming(provider: LLMProvider, prompt: str, limits: StreamLimits) -> Optional[str]:
+    """Consume a streamed response, cancelling it as soon as the guard trips.
+
+    A stream that fails part-way yields None (rule-based fallback), not the partial text.
+    """
+    guard = StreamGuard(limits)
+    parts = []
+    chunks = provider.stream(prompt)
+    try:
+        for chunk in chunks:
+            if not guard.feed(chunk):
+                print(f"Aborted LLM stream: {guard.violation}")
+                get_telemetry().count("guardrail.stream_aborted")
+                return None
+            parts.append(chunk)
+    except Exception:
+        get_telemetry().count("llm.stream_failed")
+        return None
+    finally:
+        chunks.close()
+    return "".join(parts)
+
+def generate_for_function(fn: FunctionInfo, design_text: Optional[str], provider: LLMProvider, rel_path: str, framework: str, prompt_config: Optional[PromptConfig] = None, stream: Optional[StreamLimits] = None, types: Optional[TypeIndex] = None) -> str:
+    telemetry = get_telemetry()
+    telemetry.count("functions")
+    with telemetry.span("generate_for_function", function=f"{fn.module}:{fn.qualname}"):
+        if provider.provider:
+            with telemetry.span("prompt.build"):
+                prompt = build_prompt(fn, design_text, framework, prompt_config)
+            if stream is not None and hasattr(provider, "stream"):
+                response = _generate_streaming(provider, prompt, stream)
             else:
-                # Basic safety check for Robot (no exec usage)
-                if safe_content(code):
-                    return sanitize(code)
-    
-    return rule_based_skeleton(fn, rel_path, design_text, framework)
+                response = provider.generate(prompt)
+            code = _validate(response, framework)
+            if code:
+                return code
+        
+        telemetry.count("fallback")
+        return rule_based_skeleton(fn, rel_path, design_text, framework, types)
+
+_SECTION_RE = re.compile(rf"^{re.escape(BATCH_SECTION_MARKER)}\s+(\S+)[ \t]*$", re.MULTILINE)
+
+def split_batch_response(text: Optional[str]) -> Dict[str, str]:
+    """Split a batched response into {qualname: code} using the section marker lines."""
+    if not text:
+        return {}
+    sections = {}
+    matches = list(_SECTION_RE.finditer(text))
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections[m.group(1)] = text[m.end():end].strip()
+    return sections
+
+def generate_for_batch(fns: List[FunctionInfo], design_text: Optional[str], provider: LLMProvider, rel_path: str, framework: str, prompt_config: Optional[PromptConfig] = None, types: Optional[TypeIndex] = None) -> List[str]:
+    """Generate tests for several functions of one module with a single LLM call.
+
+    Sections that are missing or fail the guardrails are retried one function at a time.
+    """
+    if len(fns) == 1 or not provider.provider:
+        return [generate_for_function(fn, design_text, provider, rel_path, framework, prompt_config, types=types) for fn in fns]
+    telemetry = get_telemetry()
+    with telemetry.span("generate_for_batch", module=fns[0].module, size=len(fns)):
+        with telemetry.span("prompt.build"):
+            prompt = build_batch_prompt(fns, design_text, framework, prompt_config)
+        sections = split_batch_response(provider.generate(prompt))
+        results = []
+        for fn in fns:
+            code = _validate(sections.get(fn.qualname), framework)
+            if code:
+                telemetry.count("functions")
+            else:
+                telemetry.count("batch.section_retries")
+            results.append(code or generate_for_function(fn, design_text, provider, rel_path, framework, prompt_config, types=types))
+    return results
+
+def _rewrite(code: str, source: FunctionInfo, target: FunctionInfo) -> str:
+    """Adapt tests generated for source to the structurally identical target (module, name, paths)."""
+    kind = type(code)  # a copied skeleton is still a skeleton
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return kind(_rewrite_text(code, source, target))  # Robot suites (or unparsable output)
+    return kind(_apply_edits(code, _rename_edits(code, tree, source, target)))
+
+def _rewrite_text(code: str, source: FunctionInfo, target: FunctionInfo) -> str:
+    """Plain-text renaming for non-Python output: library path, module, keyword names."""
+    code = re.sub(rf"(?<![\w.]){re.escape(source.rel_path)}", lambda m: target.rel_path, code)  # Robot library path
+    mod = re.escape(source.module)
+    # Module references: 'from m import', 'import m', 'm.attr' (a placeholder keeps the name pass off it)
+    code = re.sub(rf"(?<![\w.]){mod}(?=\.[A-Za-z_]|\s+import\b)|(?<=import ){mod}(?![\w.])", "\0", code)
+    # The function name, also inside derived identifiers such as test_<name>_basic
+    code = re.sub(rf"(?<![A-Za-z0-9]){re.escape(source.name)}(?![A-Za-z0-9])", target.name, code)
+    return code.replace("\0", target.module)
+
+def _rename_edits(code: str, tree: ast.AST, source: FunctionInfo, target: FunctionInfo) -> List[tuple]:
+    """(line, start, end, text) replacements from the AST of generated Python tests.
+
+    Renamed: the function as a bare name or import alias, the module in imports and
+    dotted references (m.name included), and test_<name> definitions. Other attributes
+    (d.get) and string literals are left alone, except calls on instances of the class
+    for methods.
+    """
+    lines = code.splitlines()
+    name, module = source.name, source.module
+    word = re.compile(rf"(?<![A-Za-z0-9]){re.escape(name)}(?![A-Za-z0-9])")
+    edits = []
+
+    def col(lineno: int, offset: int) -> int:
+        # AST offsets count UTF-8 bytes
+        return len(lines[lineno - 1].encode("utf-8")[:offset].decode("utf-8", errors="ignore"))
+
+    def span(node, text: str):
+        edits.append((node.lineno, col(node.lineno, node.col_offset), col(node.end_lineno, node.end_col_offset), text))
+
+    def tail(node, old: str, new: str):
+        # The last len(old) characters of node (an attribute or an 'x as y' alias)
+        end = col(node.end_lineno, node.end_col_offset)
+        edits.append((node.end_lineno, end - len(old), end, new))
+
+    cls = source.qualname.split(".")[0] if source.is_method else None
+    instances = set()
+    if cls is not None:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call) and _dotted(node.value.func) == cls:
+                instances.update(t.id for t in node.targets if isinstance(t, ast.Name))
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Name, ast.Attribute)) and _dotted(node) == module and module != name:
+            span(node, target.module)
+        elif isinstance(node, ast.Name) and node.id == name:
+            span(node, target.name)
+        elif isinstance(node, ast.Attribute) and node.attr == name and (_dotted(node.value) == module or cls is not None and (
+                (isinstance(node.value, ast.Name) and node.value.id in instances)
+                or (isinstance(node.value, ast.Call) and _dotted(node.value.func) == cls))):
+            tail(node, name, target.name)
+        elif isinstance(node, ast.ImportFrom) and node.module == module and not node.level:
+            line = lines[node.lineno - 1]
+            match = re.compile(rf"from\s+({re.escape(module)})\b").match(line, col(node.lineno, node.col_offset))
+            if match:
+                edits.append((node.lineno, match.start(1), match.end(1), target.module))
+        elif isinstance(node, ast.alias):
+            if node.name == module:
+                start = col(node.lineno, node.col_offset)
+                edits.append((node.lineno, start, start + len(module), target.module))
+            elif node.name == name:
+                start = col(node.lineno, node.col_offset)
+                edits.append((node.lineno, start, start + len(name), target.name))
+            if node.asname == name:
+                tail(node, name, target.name)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) \
+                and node.name.startswith(("test", "Test")) and word.search(node.name):
+            match = re.compile(rf"(?:async\s+)?(?:def|class)\s+({re.escape(node.name)})\b").match(
+                lines[node.lineno - 1], col(node.lineno, node.col_offset))
+            if match:
+                edits.append((node.lineno, match.start(1), match.end(1), word.sub(target.name, node.name)))
+    # A dotted module reference covers the names inside it
+    edits.sort(key=lambda edit: (edit[0], edit[1], -edit[2]))
+    kept = []
+    for edit in edits:
+        if kept and kept[-1][0] == edit[0] and edit[1] < kept[-1][2]:
+            continue
+        kept.append(edit)
+    return kept
+
+def _apply_edits(code: str, edits: List[tuple]) -> str:
+    lines = code.splitlines(keepends=True)
+    for lineno, start, end, text in reversed(edits):
+        line = lines[lineno - 1]
+        lines[lineno - 1] = line[:start] + text + line[end:]
+    return "".join(lines)
+
+class _Derived:
+    """Future-like result of a deduplicated function: the representative's tests, rewritten."""
+
+    def __init__(self, source, rewrite):
+        self.source = source
+        self.future = source.future if isinstance(source, (_BatchSlot, _Derived)) else source
+        self.rewrite = rewrite
+
+    def result(self) -> str:
+        return self.rewrite(self.source.result())
+
+class _BatchSlot:
+    """Future-like view of one function's result inside a batched request."""
 
-def write_tests(funcs: List[FunctionInfo], out_dir: str, src_dir: str, design_text: Optional[str] = None, framework: str = "pytest") -> int:
+    def __init__(self, future, index: int):
+        self.future = future
+        self.index = index
+
+    def result(self) -> str:
+        return self.future.result()[self.index]
+
+def write_tests(funcs: Iterable[FunctionInfo], out_dir: str, src_dir: str, design_text: Optional[str] = None, framework: str = "pytest", jobs: int = 1, provider: Optional[LLMProvider] = None, incremental: bool = False, batch_tokens: int = 0, prompt_config: Optional[PromptConfig] = None, stream: Optional[StreamLimits] = None, queue: Optional[WorkQueue] = None, resume: bool = False, dedup: bool = True, positions: Optional[Dict[tuple, int]] = None, scope: Optional[Iterable[str]] = None) -> int:
+    """Generate and write one test file per module; returns the number of files.
+
+    funcs are submitted in the order given. When that is not scan order (see
+    priority.prioritize), positions maps (module, qualname) to the function's index
+    in its module, and files are still assembled in source order. With a scope, funcs
+    only cover those modules (watch mode): the files and manifest entries of every
+    other module are left as they are.
+    """
     out = Path(out_dir)
     out.mkdir(parents=True, exist_ok=True)
-    provider = LLMProvider()
+    provider = provider or LLMProvider()
+    # Every finished function is checkpointed so an interrupted run can be resumed
+    queue = queue or WorkQueue(str(out / RUN_DIR_NAME))
+    queue.start(resume, framework=framework, src_dir=str(Path(src_dir).resolve()))
     
-    # Calculate relative path from OUT to SRC
-    try:
-        rel_path = os.path.relpath(Path(src_dir).resolve(), Path(out_dir).resolve())
-    except Exception:
-        rel_path = str(Path(src_dir).resolve())
+    src_root = Path(src_dir).resolve()
+    rel_paths: Dict[str, str] = {}
+
+    def rel_path_for(test_file: str) -> str:
+        """Relative path from a test file's directory to SRC (test files mirror the package layout)."""
+        folder = str(Path(test_file).parent)
+        if folder not in rel_paths:
+            try:
+                rel_paths[folder] = os.path.relpath(src_root, (out / folder).resolve())
+            except Exception:
+                rel_paths[folder] = str(src_root)
+        return rel_paths[folder]
 
-    by_module = {}
-    for fn in funcs:
-        by_module.setdefault(fn.module, []).append(fn)
-        
     count = 0
     ext = "robot" if framework == "robot" else "py"
+
+    # The manifest is always refreshed so a later --incremental run can reuse this one
+    previous = Manifest.load(out_dir) if incremental else None
+    manifest = Manifest(out / MANIFEST_NAME)
+    if scope is not None:
+        scope = set(scope)
+        kept = previous if previous is not None else Manifest.load(out_dir)
+        manifest.modules.update((m, entry) for m, entry in kept.modules.items() if m not in scope)
+    writer = OutputWriter(out_dir)
+    # Fallback skeletons resolve project classes (dataclasses, enums, constructors) from the sources
+    types = TypeIndex(src_dir)
+    context = (framework, provider.provider or "", getattr(provider, "model", ""), prompt_config or PromptConfig())
+    # Skeletons from an earlier run (no LLM, refused or failed calls) are regenerated when an LLM is available
+    reuse_fallback = not provider.provider
+    req_index = requirement_index(design_text)
+    regenerated = reused = deduplicated = 0
+    # Without an LLM every function gets its own (free) skeleton
+    dedup = dedup and bool(provider.provider)
     
-    for module, fns in by_module.items():
-        test_parts = []
-        for fn in fns:
-            test_parts.append(generate_for_function(fn, design_text, provider, rel_path, framework))
-        
-        test_src = "\n\n".join(test_parts)
-        test_file = out / f"test_{module.replace('.', '_')}.{ext}"
-        test_file.write_text(test_src, encoding="utf-8")
-        count += 1
+    # LLM calls are I/O bound, so a thread pool bounds the number of requests in flight.
+    # Each file's content is assembled in function order, so output stays deterministic.
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        # funcs may be a lazy scan; requests are submitted while it is still being consumed
+        pending = {}
+        seen_in_module: Dict[str, int] = {}
+        index_of: Dict[tuple, int] = {}
+        # Normalized AST shape (+ class and linked requirements) -> first function generated for it
+        representatives: Dict[tuple, Optional[tuple]] = {}
+        batch: List[tuple] = []
+        batch_size = 0
+
+        def flush():
+            nonlocal batch, batch_size
+            if batch:
+                rel_path = rel_path_for(test_file_path(batch[0][0].module, ext))
+                future = pool.submit(generate_for_batch, [fn for fn, *_ in batch], design_text, provider, rel_path, framework, prompt_config, types)
+                for i, (fn, fp, task, key) in enumerate(batch):
+                    slot = _BatchSlot(future, i)
+                    future.add_done_callback(lambda f, task=task, slot=slot: queue.record(task, slot.result()))
+                    pending[fn.module].append((fn, fp, slot))
+                    representatives.setdefault(key, (fn, slot))
+            batch, batch_size = [], 0
+
+        for fn in funcs:
+            module = fn.module
+            index = seen_in_module[module] = seen_in_module.get(module, -1) + 1
+            if positions is not None:
+                index = positions[(module, fn.qualname)]
+            # Short names are not rewritten safely (think 'f' vs f-strings), so they are never shared
+            key = (fn.shape_hash, fn.qualname.rpartition(".")[0], req_index.text_for(fn.name)) if len(fn.name) >= 3 else (module, fn.qualname)
+            if not queue.owns(module, fn.qualname):
+                continue
+            test_file = test_file_path(module, ext)
+            rel_path = rel_path_for(test_file)
+            fp = fingerprint(fn, req_index.text_for(fn.name), rel_path, *context)
+            task = queue.enqueue(module, fn.qualname, index, fp, test_file)
+            cached = previous.lookup(module, fn.qualname, fp, reuse_fallback) if previous else None
+            if cached is not None:
+                queue.record(task, cached)
+            elif resume:
+                cached = queue.completed(task, reuse_fallback)
+            pending.setdefault(module, [])
+            index_of[(module, fn.qualname)] = index
+            if cached is not None:
+                reused += 1
+                pending[module].append((fn, fp, cached))
+                representatives.setdefault(key, (fn, cached))
+                continue
+            if dedup and fn.shape_hash and representatives.get(key) is not None:
+                # A structurally identical function is already generated; rename its tests instead
+                source_fn, source = representatives[key]
+                rewrite = lambda code, source_fn=source_fn, fn=fn: _rewrite(code, source_fn, fn)
+                if isinstance(source, str):
+                    result = rewrite(source)
+                    queue.record(task, result)
+                else:
+                    result = _Derived(source, rewrite)
+                    result.future.add_done_callback(lambda f, task=task, result=result: queue.record(task, result.result()))
+                pending[module].append((fn, fp, result))
+                deduplicated += 1
+                get_telemetry().count("dedup.saved")
+                continue
+            regenerated += 1
+            if batch_tokens <= 0:
+                future = pool.submit(generate_for_function, fn, design_text, provider, rel_path, framework, prompt_config, stream, types)
+                future.add_done_callback(lambda f, task=task: queue.record(task, f.result()))
+                pending[module].append((fn, fp, future))
+                representatives.setdefault(key, (fn, future))
+                continue
+            # Pack functions of the same module into one prompt until the target budget is reached
+            size = estimate_tokens(describe_target(fn))
+            if batch and (batch[0][0].module != module or batch_size + size > batch_tokens):
+                flush()
+            batch.append((fn, fp, task, key))
+            batch_size += size
+        flush()
+        queue.close()
+
+        if queue.sharded:
+            # A shard holds only part of each module; 'llm-testgen merge' assembles the files
+            for parts in pending.values():
+                for _, _, result in parts:
+                    if not isinstance(result, str):
+                        result.result()
+            print(f"Shard {queue.shard[0]}/{queue.shard[1]}: {queue.enqueued} task(s) checkpointed "
+                  f"({regenerated} generated, {reused} reused) in {queue.root}")
+            return 0
+
+        def emit(module: str):
+            nonlocal count
+            with get_telemetry().span("write_file", module=module):
+                _emit(module)
+            count += 1
+
+        def _emit(module: str):
+            test_file = test_file_path(module, ext)
+            entry = manifest.modules[module] = {"file": test_file, "functions": {}}
+            outputs = []
+            # Source order, whatever order the functions were submitted or finished in
+            for fn, fp, result in sorted(pending[module], key=lambda part: index_of[(module, part[0].qualname)]):
+                code = result if isinstance(result, str) else result.result()
+                entry["functions"][fn.qualname] = function_entry(fp, code)
+                outputs.append(code)
+            # Untouched files keep their mtime from the previous run
+            writer.write(test_file, join_tests(outputs, framework))
+
+        # Write each module's file as soon as all of its functions are done
+        owners: Dict[Future, set] = {}
+        remaining = dict.fromkeys(pending, 0)
+        for module, parts in pending.items():
+            for _, _, result in parts:
+                future = result.future if isinstance(result, (_BatchSlot, _Derived)) else result
+                if isinstance(future, Future) and module not in owners.setdefault(future, set()):
+                    owners[future].add(module)
+                    remaining[module] += 1
+        for module, n in remaining.items():
+            if n == 0:
+                emit(module)
+        for future in as_completed(owners):
+            for module in owners[future]:
+                remaining[module] -= 1
+                if remaining[module] == 0:
+                    emit(module)
+
+    if framework == "pytest":
+        writer.write(CONFTEST_NAME, conftest_source(out_dir, src_dir))
+    if previous is not None:
+        # Drop tests for modules that no longer exist in the source tree (or moved to a new path)
+        current = {entry["file"] for entry in manifest.modules.values()}
+        for module, entry in previous.modules.items():
+            if entry["file"] not in current:
+                writer.remove(entry["file"])
+        print(f"Incremental: {regenerated} function(s) regenerated, {reused} reused")
+    if deduplicated:
+        print(f"Dedup: {deduplicated} function(s) reused the tests of a structurally identical function "
+              f"({deduplicated} LLM call(s) saved)")
+    stats = writer.stats()
+    print(f"Output: {stats['written']} file(s) written, {stats['unchanged']} unchanged, {stats['removed']} removed")
+    manifest.save()
     
     return count
\ No newline at end of file
@@ -1,10 +1,111 @@
 from __future__ import annotations
-import ast, re
+import ast, re, time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from .tokens import estimate_tokens
 
 BANNED_PATTERNS = [
     r"requests\.", r"httpx\.", r"urllib\.", r"os\.system", r"subprocess\.",
     r"open\(", r"Path\(", r"shutil\.", r"socket\."
 ]
+# All patterns in one alternation: a single scan of the source instead of one per pattern
+_BANNED_RE = re.compile("|".join(f"(?:{p})" for p in BANNED_PATTERNS))
+
+# Modules whose use (under any alias) is banned, and banned bare calls
+BANNED_MODULES = {"requests", "httpx", "urllib", "subprocess", "shutil", "socket"}
+BANNED_CALLS = {"open", "Path", "__import__", "os.system"}
+# Cheap prefilter: the AST is only walked when one of these names appears at all
+_SUSPECT_RE = re.compile(r"\b(?:%s|open|Path|os|__import__)\b" % "|".join(sorted(BANNED_MODULES)))
+
+@dataclass
+class Violation:
+    rule: str
+    detail: str
+    line: Optional[int] = None
+
+@dataclass
+class GuardrailReport:
+    """Result of one guardrail pass; ``tree`` is reused by callers instead of re-parsing."""
+    tree: Optional[ast.AST] = None
+    syntax_error: Optional[str] = None
+    violations: List[Violation] = field(default_factory=list)
+
+    @property
+    def compiles(self) -> bool:
+        return self.syntax_error is None
+
+    @property
+    def safe(self) -> bool:
+        return not self.violations
+
+    @property
+    def ok(self) -> bool:
+        return self.compiles and self.safe
+
+class _AliasVisitor(ast.NodeVisitor):
+    """Flags banned modules reached through imports or aliases (``import subprocess as sp``)."""
+
+    def __init__(self):
+        self.aliases: Dict[str, str] = {}  # local name -> banned dotted target
+        self.violations: List[Violation] = []
+
+    def _flag(self, detail: str, node: ast.AST):
+        self.violations.append(Violation("banned-import", detail, getattr(node, "lineno", None)))
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            root = alias.name.split(".")[0]
+            if root in BANNED_MODULES:
+                self._flag(f"import {alias.name}", node)
+            if root in BANNED_MODULES or alias.name == "os":
+                self.aliases[alias.asname or root] = alias.name if alias.asname else root
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        root = (node.module or "").split(".")[0]
+        for alias in node.names:
+            target = f"{node.module}.{alias.name}"
+            if root in BANNED_MODULES:
+                self._flag(f"from {node.module} import {alias.name}", node)
+            elif target in BANNED_CALLS or (node.module == "pathlib" and alias.name == "Path"):
+                self.aliases[alias.asname or alias.name] = "Path" if alias.name == "Path" else target
+
+    def visit_Call(self, node: ast.Call):
+        name = _dotted(node.func)
+        if name:
+            head, _, rest = name.partition(".")
+            resolved = self.aliases.get(head, head) + (f".{rest}" if rest else "")
+            if resolved in BANNED_CALLS or resolved.split(".")[0] in BANNED_MODULES:
+                self.violations.append(Violation("banned-call", f"{name}()", node.lineno))
+        self.generic_visit(node)
+
+def _dotted(node: ast.AST) -> Optional[str]:
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return ".".join(reversed(parts))
+    return None
+
+def check(source: str, python: bool = True) -> GuardrailReport:
+    """Single guardrail pass: one parse, one combined regex scan and (if needed) one AST walk."""
+    report = GuardrailReport()
+    for match in _BANNED_RE.finditer(source):
+        line = source.count("\n", 0, match.start()) + 1
+        report.violations.append(Violation("banned-pattern", match.group(0), line))
+    if not python:
+        return report
+    try:
+        report.tree = ast.parse(source)
+    except Exception as e:
+        report.syntax_error = str(e)
+        return report
+    if _SUSPECT_RE.search(source):
+        visitor = _AliasVisitor()
+        visitor.visit(report.tree)
+        report.violations.extend(visitor.violations)
+    return report
 
 def compiles(py_source: str) -> bool:
     try:
@@ -14,11 +115,54 @@ def compiles(py_source: str) -> bool:
         return False
 
 def safe_content(py_source: str) -> bool:
-    for pat in BANNED_PATTERNS:
-        if re.search(pat, py_source):
-            return False
-    return True
+    return _BANNED_RE.search(py_source) is None
 
 def sanitize(py_source: str) -> str:
     # Basic strip of markers or weird fences
     return py_source.replace("```", "").strip()
+
+# Longest text a banned pattern can match; chunk boundaries are rescanned with this overlap
+_OVERLAP = 32
+# Streamed text is token-counted in pieces of about this many characters
+_COUNT_CHARS = 1024
+
+@dataclass
+class StreamLimits:
+    max_tokens: Optional[int] = None
+    max_seconds: Optional[float] = None
+
+class StreamGuard:
+    """Incremental guardrail scanner over a streamed response.
+
+    feed() returns False as soon as a banned pattern appears or a token/latency budget
+    is exceeded; the reason is kept in ``violation``.
+    """
+
+    def __init__(self, limits: Optional[StreamLimits] = None):
+        self.limits = limits or StreamLimits()
+        self.violation: Optional[str] = None
+        self._tail = ""
+        self._tokens = 0  # estimated tokens of the text already counted
+        self._pending = ""  # text received since then
+        self._start = time.monotonic()
+
+    def feed(self, chunk: str) -> bool:
+        window = self._tail + chunk
+        match = _BANNED_RE.search(window)
+        if match:
+            self.violation = f"banned pattern {match.group(0)!r}"
+            return False
+        self._tail = window[-_OVERLAP:]
+        if self.limits.max_tokens is not None:
+            # Re-estimating only the recent text keeps each check cheap, whatever the estimator
+            self._pending += chunk
+            tokens = self._tokens + estimate_tokens(self._pending)
+            if len(self._pending) >= _COUNT_CHARS:
+                self._tokens, self._pending = tokens, ""
+            if tokens > self.limits.max_tokens:
+                self.violation = f"exceeded {self.limits.max_tokens} output tokens"
+                return False
+        if self.limits.max_seconds is not None and time.monotonic() - self._start > self.limits.max_seconds:
+            self.violation = f"exceeded {self.limits.max_seconds}s latency budget"
+            return False
+        return True
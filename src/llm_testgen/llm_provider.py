@@ -1,136 +1,229 @@
 from __future__ import annotations
+import hashlib
+import json
 import os
-from typing import Optional
+import time
+from typing import Iterator, Optional
+from .cache import ResponseCache
+from .providers import ALIASES, Backend, Cassette, RecordingBackend, available_providers, get_provider_factory
+from .ratelimit import Budget, RateLimiter, RetryPolicy, is_retryable, retry_after
+from .telemetry import get_telemetry
+from .tokens import estimate_tokens
+
+# Remembers auto-discovered models across runs, stored next to the response cache
+MODEL_MEMO_NAME = "models.json"
 
 class LLMProvider:
-    """Pluggable LLM provider. Supports OpenAI and Google Gemini (New SDK)."""
+    """Facade over a registered provider backend (see providers.py) with caching,
+    rate limiting and retries.
+
+    LLM_PROVIDER selects the backend (google/gemini, openai, openai-compatible/local,
+    replay, or any plugin); an empty value disables the LLM. With a cassette every
+    live response is recorded to it, and provider "replay" serves from it offline.
+    A budget caps live requests (cache hits are free); refused prompts return None.
+    Backends keep their clients/connections open; use as a context manager or call close().
+    """
 
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None, limiter: Optional[RateLimiter] = None, retry: Optional[RetryPolicy] = None,
+                 provider: Optional[str] = None, cassette: Optional[str] = None, budget: Optional[Budget] = None):
         # Normalize provider name
-        raw_provider = os.getenv("LLM_PROVIDER", "").lower().strip()
-        if raw_provider in ["google", "gemini"]:
-            self.provider = "google"
-        else:
-            self.provider = raw_provider
-            
-        self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("OPENAI_API_KEY")
-        # Default model to try first
-        self.model = os.getenv("LLM_MODEL", "gemini-1.5-flash") 
+        raw_provider = (provider if provider is not None else os.getenv("LLM_PROVIDER", "")).lower().strip()
+        self.provider = ALIASES.get(raw_provider, raw_provider)
+        self.temperature = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+        self.cache = cache
+        self.limiter = limiter or RateLimiter()
+        self.retry = retry or RetryPolicy()
+        self.budget = budget
+        self.backend: Optional[Backend] = None
+        if self.provider:
+            factory = get_provider_factory(self.provider)
+            if factory is None:
+                print(f"Warning: Unknown provider '{self.provider}' (available: {', '.join(available_providers())}). Using fallback.")
+            else:
+                cassette = cassette or os.getenv("LLM_CASSETTE")
+                model = os.getenv("LLM_MODEL") or None
+                if self.provider == "replay":
+                    self.backend = factory(model=model, temperature=self.temperature, cassette=Cassette(cassette) if cassette else None)
+                else:
+                    self.backend = factory(model=model, temperature=self.temperature)
+                    if cassette:
+                        self.backend = RecordingBackend(self.backend, Cassette(cassette))
+                self.backend.on_model_change = self._remember_model
+        self.api_key = self.backend.api_key if self.backend else None
+        self._configured_model = self.model
+        remembered = self._model_memo().get(self._memo_key())
+        if remembered and self.backend:
+            self.backend.model = remembered
+
+    @property
+    def model(self) -> str:
+        return self.backend.model if self.backend else ""
+
+    def __enter__(self) -> "LLMProvider":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Release the backend's pooled client and HTTP connections."""
+        if self.backend is not None:
+            self.backend.close()
+
+    def _memo_key(self) -> str:
+        key_hash = hashlib.sha256((self.api_key or "").encode("utf-8")).hexdigest()[:12]
+        return f"{self.provider}:{self._configured_model}:{key_hash}"
+
+    def _model_memo(self) -> dict:
+        if self.cache is None or not self.provider:
+            return {}
+        try:
+            return json.loads((self.cache.root / MODEL_MEMO_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _remember_model(self, model: str):
+        if self.cache is None:
+            return
+        memo = self._model_memo()
+        memo[self._memo_key()] = model
+        self.cache.root.mkdir(parents=True, exist_ok=True)
+        (self.cache.root / MODEL_MEMO_NAME).write_text(json.dumps(memo, indent=2), encoding="utf-8")
 
     def generate(self, prompt: str) -> Optional[str]:
         if not self.provider:
             return None
 
-        if self.provider == "google":
-            return self._generate_google(prompt)
-        
-        if self.provider == "openai":
-            return self._generate_openai(prompt)
-        
-        print(f"Warning: Unknown provider '{self.provider}'. Using fallback.")
-        return None
-
-    def _generate_google(self, prompt: str) -> Optional[str]:
-        if not self.api_key:
-            print("Error: GEMINI_API_KEY not set.")
-            return None
-            
-        try:
-            from google import genai
-            # Initialize client (letting SDK choose best default version)
-            client = genai.Client(api_key=self.api_key)
-            
-            # 1. Try the configured model first
-            try:
-                response = client.models.generate_content(
-                    model=self.model,
-                    contents=prompt
-                )
-                if response.text:
-                    return response.text
-            except Exception as e:
-                # Only warn if it's a 404 (Not Found), otherwise it might be a real error
-                if "404" in str(e) or "not found" in str(e).lower():
-                    print(f"Model '{self.model}' not found. Attempting auto-discovery...")
-                else:
-                    print(f"Google Gemini Error: {e}")
-                    return None
-
-            # 2. Auto-Discovery (If first attempt failed)
-            try:
-                print("Scanning for available models...")
-                # List all models available to your API key
-                all_models = list(client.models.list())
-                
-                valid_models = []
-                for m in all_models:
-                    # Safely get the name, handling both object and dict styles
-                    name = getattr(m, 'name', None) or m.get('name')
-                    if not name: continue
-                    
-                    # Clean name (remove 'models/' prefix)
-                    clean_name = name.split("/")[-1]
-                    
-                    # We only want 'gemini' models, ignore 'embedding' or 'aqa' models
-                    if "gemini" in clean_name.lower() and "vision" not in clean_name.lower():
-                        valid_models.append(clean_name)
-
-                if not valid_models:
-                    print("Error: No valid Gemini models found for this API key.")
-                    return None
-                
-                print(f"Found available models: {valid_models}")
-
-                # 3. Smart Selection: Prefer Flash -> Pro -> 1.0
-                best_model = valid_models[0] # Default to first found
-                
-                # Priority logic
-                for m in valid_models:
-                    if "1.5-flash" in m: 
-                        best_model = m
-                        break
-                else:
-                    for m in valid_models:
-                        if "1.5-pro" in m:
-                            best_model = m
-                            break
-
-                print(f"-> Retrying with active model: {best_model}")
-                self.model = best_model # Update for future calls
-
-                # 4. Retry with the discovered model
-                response = client.models.generate_content(
-                    model=best_model,
-                    contents=prompt
-                )
-                if response.text:
-                    return response.text
-
-            except Exception as discovery_error:
-                print(f"Auto-discovery failed: {discovery_error}")
-            
-            return None
-            
-        except ImportError:
-            print("CRITICAL ERROR: 'google-genai' library missing. Run: pip install google-genai")
-            return None
-        except Exception as e:
-            print(f"Google SDK Error: {e}")
+        key = self._cache_key(prompt)
+        if key is not None:
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+        if not self._within_budget(prompt):
             return None
 
-    def _generate_openai(self, prompt: str) -> Optional[str]:
-        if not self.api_key:
-            print("Error: OPENAI_API_KEY not set.")
+        telemetry = get_telemetry()
+        start = time.perf_counter()
+        with telemetry.span("llm.request", provider=self.provider):
+            text = self._dispatch_with_retry(prompt)
+        telemetry.observe("llm.latency", time.perf_counter() - start)
+        telemetry.observe("llm.prompt_tokens", estimate_tokens(prompt))
+        if text:
+            output_tokens = estimate_tokens(text)
+            telemetry.observe("llm.output_tokens", output_tokens)
+            if self.budget is not None:
+                self.budget.charge(output_tokens)
+        if text and key is not None:
+            self.cache.put(key, text)
+        return text
+
+    def _within_budget(self, prompt: str) -> bool:
+        return self.budget is None or self.budget.acquire(estimate_tokens(prompt))
+
+    def _cache_key(self, prompt: str) -> Optional[str]:
+        if self.cache is None:
             return None
-        try:
-            from openai import OpenAI
-            client = OpenAI(api_key=self.api_key)
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"OpenAI API Error: {e}")
+        return self.cache.key(self.provider, self.model, self.temperature, prompt)
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        cached = self.cache.get(key)
+        get_telemetry().count("cache.hit" if cached is not None else "cache.miss")
+        return cached
+
+    def _dispatch_with_retry(self, prompt: str) -> Optional[str]:
+        """Rate-limited dispatch; 429/5xx/timeouts are retried with backoff instead of falling back."""
+        # Estimated input size for the tokens/min bucket
+        est_tokens = estimate_tokens(prompt)
+        attempt = 0
+        while True:
+            with self.limiter.slot(est_tokens) as slot:
+                try:
+                    return self._dispatch(prompt)
+                except Exception as e:
+                    if not is_retryable(e) or attempt >= self.retry.max_retries:
+                        print(f"LLM request failed after {attempt} retries: {e}")
+                        return None
+                    slot.throttled = True
+                    error = e
+                    wait = self.retry.delay(attempt, retry_after(e))
+            print(f"LLM throttled or unavailable ({error}); retrying in {wait:.1f}s")
+            get_telemetry().count("llm.retries")
+            self.limiter.backoff(wait)
+            attempt += 1
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Yield the response in chunks as they arrive.
+
+        Closing the iterator early (e.g. after a guardrail violation) cancels the
+        underlying request. A failure after the first chunk is re-raised, so a truncated
+        response is never mistaken for a complete one; only complete responses are cached.
+        """
+        if not self.provider:
+            return
+
+        key = self._cache_key(prompt)
+        if key is not None:
+            cached = self._cache_get(key)
+            if cached is not None:
+                yield cached
+                return
+        if not self._within_budget(prompt):
+            return
+
+        telemetry = get_telemetry()
+        start = time.perf_counter()
+        parts = []
+        with telemetry.span("llm.stream", provider=self.provider):
+            for chunk in self._stream_with_retry(prompt):
+                if not parts:
+                    telemetry.observe("llm.first_chunk_latency", time.perf_counter() - start)
+                parts.append(chunk)
+                yield chunk
+        telemetry.observe("llm.latency", time.perf_counter() - start)
+        telemetry.observe("llm.prompt_tokens", estimate_tokens(prompt))
+        output_tokens = estimate_tokens("".join(parts))
+        telemetry.observe("llm.output_tokens", output_tokens)
+        if self.budget is not None:
+            self.budget.charge(output_tokens)
+        if parts and key is not None:
+            self.cache.put(key, "".join(parts))
+
+    def _stream_with_retry(self, prompt: str) -> Iterator[str]:
+        """Like _dispatch_with_retry, but errors are only retried before the first chunk.
+
+        Once chunks have been yielded, an error is re-raised: the caller has a partial response.
+        """
+        est_tokens = estimate_tokens(prompt)
+        attempt = 0
+        while True:
+            started = False
+            with self.limiter.slot(est_tokens) as slot:
+                try:
+                    for chunk in self._open_stream(prompt):
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    if started:
+                        print(f"LLM stream failed mid-response: {e}")
+                        raise
+                    if not is_retryable(e) or attempt >= self.retry.max_retries:
+                        print(f"LLM stream failed: {e}")
+                        return
+                    slot.throttled = True
+                    error = e
+                    wait = self.retry.delay(attempt, retry_after(e))
+            print(f"LLM throttled or unavailable ({error}); retrying in {wait:.1f}s")
+            get_telemetry().count("llm.retries")
+            self.limiter.backoff(wait)
+            attempt += 1
+
+    def _open_stream(self, prompt: str) -> Iterator[str]:
+        if self.backend is None:
+            return iter(())
+        return self.backend.stream(prompt)
+
+    def _dispatch(self, prompt: str) -> Optional[str]:
+        if self.backend is None:
             return None
+        return self.backend.complete(prompt)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Optional
+from .ast_extract import FunctionInfo
+
+MANIFEST_NAME = ".llm_testgen_manifest.json"
+MANIFEST_VERSION = 2
+
+class Skeleton(str):
+    """Test code from the rule-based fallback instead of the LLM.
+
+    Stored with a fallback flag, so a later run with an LLM generates the function's
+    tests rather than reusing the skeleton.
+    """
+
+def function_entry(fp: str, output: str) -> dict:
+    return {"fingerprint": fp, "output": output, "fallback": isinstance(output, Skeleton)}
+
+def fingerprint(fn: FunctionInfo, req_text: str, *context: str) -> str:
+    """Fingerprint of everything that feeds a function's generated test.
+
+    Covers the function's AST (signature + body), its linked requirement text and
+    any extra generation context (framework, provider, model, prompt config, ...).
+    """
+    h = hashlib.sha256()
+    for part in (fn.qualname, fn.source_hash, req_text, *context):
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class Manifest:
+    """Per-function fingerprints and generated outputs stored alongside the tests."""
+
+    def __init__(self, path: Path, modules: Optional[Dict[str, dict]] = None):
+        self.path = path
+        # module -> {"file": str, "functions": {qualname: {"fingerprint": str, "output": str, "fallback": bool}}}
+        self.modules: Dict[str, dict] = modules or {}
+
+    @classmethod
+    def load(cls, out_dir: str) -> "Manifest":
+        path = Path(out_dir) / MANIFEST_NAME
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("version") == MANIFEST_VERSION:
+                return cls(path, data.get("modules", {}))
+        except (OSError, ValueError):
+            pass
+        return cls(path)
+
+    def lookup(self, module: str, qualname: str, fp: str, fallback: bool = True) -> Optional[str]:
+        """Stored output if the fingerprint matches; fallback=False skips rule-based skeletons."""
+        entry = self.modules.get(module, {}).get("functions", {}).get(qualname)
+        if not entry or entry.get("fingerprint") != fp:
+            return None
+        if entry.get("fallback"):
+            return Skeleton(entry.get("output")) if fallback else None
+        return entry.get("output")
+
+    def save(self):
+        payload = {"version": MANIFEST_VERSION, "modules": self.modules}
+        self.path.write_text(json.dumps(payload, indent=1, sort_keys=True), encoding="utf-8")
@@ -0,0 +1,337 @@
+from __future__ import annotations
+import ast
+import contextlib
+import importlib
+import io
+import marshal
+import os
+import signal
+import sys
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .ast_extract import FunctionFilter, FunctionInfo, scan_python_functions
+
+# Operator swaps: arithmetic, bitwise, comparison and boolean
+_BINOP_SWAPS = {
+    ast.Add: ast.Sub, ast.Sub: ast.Add, ast.Mult: ast.Div, ast.Div: ast.Mult, ast.FloorDiv: ast.Mult,
+    ast.Mod: ast.FloorDiv, ast.Pow: ast.Mult, ast.BitAnd: ast.BitOr, ast.BitOr: ast.BitAnd,
+    ast.BitXor: ast.BitAnd, ast.LShift: ast.RShift, ast.RShift: ast.LShift,
+}
+_CMP_SWAPS = {
+    ast.Lt: ast.GtE, ast.LtE: ast.Gt, ast.Gt: ast.LtE, ast.GtE: ast.Lt, ast.Eq: ast.NotEq, ast.NotEq: ast.Eq,
+    ast.Is: ast.IsNot, ast.IsNot: ast.Is, ast.In: ast.NotIn, ast.NotIn: ast.In,
+}
+_BOOL_SWAPS = {ast.And: ast.Or, ast.Or: ast.And}
+_SYMBOLS = {
+    ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.FloorDiv: "//", ast.Mod: "%", ast.Pow: "**",
+    ast.BitAnd: "&", ast.BitOr: "|", ast.BitXor: "^", ast.LShift: "<<", ast.RShift: ">>",
+    ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">=", ast.Eq: "==", ast.NotEq: "!=",
+    ast.Is: "is", ast.IsNot: "is not", ast.In: "in", ast.NotIn: "not in", ast.And: "and", ast.Or: "or",
+}
+
+class _Site:
+    """One mutation: container[key] (an attribute or list slot) swapped from original to mutated."""
+
+    __slots__ = ("container", "key", "original", "mutated", "line", "description")
+
+    def __init__(self, container, key, mutated, line: int, description: str):
+        self.container = container
+        self.key = key
+        self.original = self._get()
+        self.mutated = mutated
+        self.line = line
+        self.description = description
+
+    def _get(self):
+        return self.container[self.key] if isinstance(self.container, list) else getattr(self.container, self.key)
+
+    def _set(self, value):
+        if isinstance(self.container, list):
+            self.container[self.key] = value
+        else:
+            setattr(self.container, self.key, value)
+
+    @contextlib.contextmanager
+    def applied(self):
+        self._set(self.mutated)
+        try:
+            yield
+        finally:
+            self._set(self.original)
+
+def _constant_tweak(node: ast.Constant) -> Optional[Tuple[Any, str]]:
+    value = node.value
+    if isinstance(value, bool):
+        return not value, f"{value} -> {not value}"
+    if isinstance(value, (int, float)):
+        return value + 1, f"{value!r} -> {value + 1!r}"
+    if isinstance(value, str):
+        return ("" if value else "XX"), f"{value[:20]!r} -> {'' if value else 'XX'!r}"
+    return None
+
+def mutation_sites(fn_node: ast.AST) -> List[_Site]:
+    """Mutations of a function body in a deterministic order (docstring and signature untouched)."""
+    sites = []
+    body = fn_node.body
+    if body and isinstance(body[0], ast.Expr) and isinstance(getattr(body[0], "value", None), ast.Constant) \
+            and isinstance(body[0].value.value, str):
+        body = body[1:]
+    for stmt in body:
+        for node in ast.walk(stmt):
+            if isinstance(node, (ast.BinOp, ast.AugAssign)) and type(node.op) in _BINOP_SWAPS:
+                swap = _BINOP_SWAPS[type(node.op)]
+                sites.append(_Site(node, "op", swap(), node.lineno, f"{_SYMBOLS[type(node.op)]} -> {_SYMBOLS[swap]}"))
+            elif isinstance(node, ast.Compare):
+                for i, op in enumerate(node.ops):
+                    swap = _CMP_SWAPS[type(op)]
+                    sites.append(_Site(node.ops, i, swap(), node.lineno, f"{_SYMBOLS[type(op)]} -> {_SYMBOLS[swap]}"))
+            elif isinstance(node, ast.BoolOp):
+                swap = _BOOL_SWAPS[type(node.op)]
+                sites.append(_Site(node, "op", swap(), node.lineno, f"{_SYMBOLS[type(node.op)]} -> {_SYMBOLS[swap]}"))
+            elif isinstance(node, ast.Return) and node.value is not None \
+                    and not (isinstance(node.value, ast.Constant) and node.value.value is None):
+                sites.append(_Site(node, "value", ast.copy_location(ast.Constant(None), node.value), node.lineno,
+                                   "return value -> None"))
+            elif isinstance(node, ast.Constant):
+                tweak = _constant_tweak(node)
+                if tweak is not None:
+                    sites.append(_Site(node, "value", tweak[0], node.lineno, f"constant {tweak[1]}"))
+    return sites
+
+# -- which generated tests target which function -------------------------------
+
+class _TestCase:
+    __slots__ = ("file", "name", "cls", "names", "modules")
+
+    def __init__(self, file: str, name: str, cls: Optional[str], names: set, modules: set):
+        self.file = file
+        self.name = name
+        self.cls = cls
+        self.names = names
+        self.modules = modules
+
+def _index_tests(tests_dir: str) -> List[_TestCase]:
+    """Argument-less test functions/methods with the names they reference and modules their file imports."""
+    cases = []
+    for path in sorted(Path(tests_dir).rglob("test_*.py")):
+        try:
+            tree = ast.parse(path.read_text(encoding="utf-8"))
+        except (OSError, SyntaxError, UnicodeDecodeError):
+            continue
+        modules = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules.add(node.module)
+            elif isinstance(node, ast.Import):
+                modules.update(alias.name for alias in node.names)
+        def refs(node) -> set:
+            return {n.id if isinstance(n, ast.Name) else n.attr for n in ast.walk(node) if isinstance(n, (ast.Name, ast.Attribute))}
+        def plain(fn, method: bool) -> bool:
+            args = fn.args
+            n = len(args.posonlyargs) + len(args.args) - (1 if method else 0)
+            return fn.name.startswith("test") and n == len(args.defaults) and not args.kwonlyargs
+        for node in tree.body:
+            if isinstance(node, ast.FunctionDef) and plain(node, False):
+                cases.append(_TestCase(str(path), node.name, None, refs(node), modules))
+            elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+                for item in node.body:
+                    if isinstance(item, ast.FunctionDef) and plain(item, True):
+                        cases.append(_TestCase(str(path), item.name, node.name, refs(item) | refs(node), modules))
+    return cases
+
+def _import_name(module: str) -> str:
+    return module[: -len(".__init__")] if module.endswith(".__init__") else module
+
+def _covering(fn: FunctionInfo, cases: List[_TestCase]) -> List[Tuple[str, str, Optional[str]]]:
+    module = _import_name(fn.module)
+    owner = fn.qualname.split(".")[0] if fn.is_method else fn.name
+    return [(c.file, c.name, c.cls) for c in cases
+            if fn.name in c.names and owner in c.names
+            and any(m == module or m.startswith(module + ".") or module.startswith(m + ".") for m in c.modules)]
+
+# -- worker --------------------------------------------------------------------
+
+class _Timeout(BaseException):
+    """Raised by the alarm inside a mutant; BaseException so tests' 'except Exception' can't swallow it."""
+
+_TEST_CODE: Dict[str, Any] = {}
+
+def _run_tests(tests: List[Tuple[str, str, Optional[str]]], timeout: Optional[float]) -> Tuple[Optional[int], bool]:
+    """Run tests in order until the first failure; (index of the failing test or None, timed out)."""
+    namespaces: Dict[str, dict] = {}
+    use_alarm = timeout is not None and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            for i, (file, name, cls) in enumerate(tests):
+                try:
+                    ns = namespaces.get(file)
+                    if ns is None:
+                        # Re-executed per mutant so 'from m import f' binds the mutated module
+                        code = _TEST_CODE.get(file)
+                        if code is None:
+                            code = _TEST_CODE[file] = compile(Path(file).read_text(encoding="utf-8"), file, "exec")
+                        ns = namespaces[file] = {"__name__": "llm_testgen_mutation_target", "__file__": file}
+                        exec(code, ns)
+                    if cls is None:
+                        ns[name]()
+                    else:
+                        getattr(ns[cls](), name)()
+                except _Timeout:
+                    return i, True
+                except Exception:
+                    return i, False
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return None, False
+
+def _alarm(signum, frame):
+    raise _Timeout()
+
+def _mutate_function(task: dict) -> dict:
+    """Worker: baseline the covering tests on the real module, then run them against each mutant."""
+    if task["src"] not in sys.path:
+        sys.path.insert(0, task["src"])
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _alarm)
+    name = task["module"]
+    try:
+        original = importlib.import_module(name)
+    except Exception as e:
+        return {"error": f"cannot import {name}: {e}", "results": ["no_coverage"] * len(task["mutants"])}
+    start = time.perf_counter()
+    passing = []
+    for test in task["tests"]:
+        failed, _ = _run_tests([test], task["timeout"])
+        if failed is None:
+            passing.append(test)
+    # Mutants that loop forever are cut off well after a normal run would finish
+    budget = min(task["timeout"], max(1.0, 10 * (time.perf_counter() - start)))
+    # 'import pkg.mod' and 'from pkg import mod' find the module as an attribute of its package
+    package_name, _, attr = name.rpartition(".")
+    package = sys.modules.get(package_name) if package_name else None
+    results = []
+    for code in task["mutants"]:
+        if not passing:
+            results.append("no_coverage")
+            continue
+        mutant = types.ModuleType(name)
+        mutant.__file__ = original.__file__
+        mutant.__package__ = original.__package__
+        if hasattr(original, "__path__"):
+            mutant.__path__ = original.__path__
+        sys.modules[name] = mutant
+        if package is not None:
+            setattr(package, attr, mutant)
+        try:
+            try:
+                exec(marshal.loads(code), mutant.__dict__)
+            except Exception:
+                results.append("killed")  # the module no longer imports
+                continue
+            failed, timed_out = _run_tests(passing, budget)
+            results.append("timeout" if timed_out else "survived" if failed is None else "killed")
+        finally:
+            sys.modules[name] = original
+            if package is not None:
+                setattr(package, attr, original)
+    return {"tests": len(task["tests"]), "passing": len(passing), "results": results}
+
+# -- driver --------------------------------------------------------------------
+
+def _function_nodes(tree: ast.Module) -> Iterator[ast.AST]:
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            yield node
+
+def _tasks(src_dir: str, funcs: List[FunctionInfo], cases: List[_TestCase], timeout: float,
+           max_mutants: Optional[int]) -> Iterator[Tuple[FunctionInfo, List[_Site], Optional[dict]]]:
+    """Per function: its mutation sites and the worker task (None if no test covers it).
+
+    Each source file is parsed once; every mutant is made by swapping one node of that
+    tree in place, compiling, and swapping it back.
+    """
+    by_file: Dict[str, List[FunctionInfo]] = {}
+    for fn in funcs:
+        by_file.setdefault(fn.rel_path, []).append(fn)
+    src = str(Path(src_dir).resolve())
+    for rel, file_funcs in by_file.items():
+        path = os.path.join(src, rel)
+        try:
+            tree = ast.parse(Path(path).read_text(encoding="utf-8"), filename=path)
+        except (OSError, SyntaxError, UnicodeDecodeError):
+            continue
+        nodes = {(node.lineno, node.name): node for node in _function_nodes(tree)}
+        for fn in file_funcs:
+            node = nodes.get((fn.lineno, fn.name))
+            if node is None:
+                continue
+            sites = mutation_sites(node)[:max_mutants]
+            tests = _covering(fn, cases)
+            if not tests or not sites:
+                # No covering test: the mutants are reported without being compiled or run
+                yield fn, sites, None
+                continue
+            mutants = []
+            for site in sites:
+                with site.applied():
+                    mutants.append(marshal.dumps(compile(tree, path, "exec")))
+            yield fn, sites, {"src": src, "module": _import_name(fn.module), "tests": tests,
+                              "mutants": mutants, "timeout": timeout}
+
+def mutation_report(tests_dir: str, src_dir: str, jobs: Optional[int] = None, timeout: float = 60.0,
+                    max_mutants: Optional[int] = None, select: Optional[FunctionFilter] = None,
+                    survivors: int = 20) -> Dict[str, Any]:
+    """Mutation score of the generated tests in tests_dir against the functions in src_dir.
+
+    Only tests that reference a function (and import its module) run against its
+    mutants, in a process pool, stopping at the first failing test. Tests that already
+    fail on the unmutated code are ignored. "score" counts uncovered mutants as
+    surviving; "covered_score" only considers mutants some test ran against.
+    """
+    funcs = scan_python_functions(src_dir, select=select)
+    cases = _index_tests(tests_dir)
+    jobs = jobs or os.cpu_count() or 1
+    modules: Dict[str, Dict[str, Any]] = {}
+    surviving = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, jobs)) as pool:
+        pending = []
+        for fn, sites, task in _tasks(src_dir, funcs, cases, timeout, max_mutants):
+            future = pool.submit(_mutate_function, task) if task is not None else None
+            pending.append((fn, sites, future))
+        for fn, sites, future in pending:
+            results = future.result()["results"] if future is not None else ["no_coverage"] * len(sites)
+            stats = modules.setdefault(fn.module, dict.fromkeys(("mutants", "killed", "timeout", "survived", "no_coverage"), 0))
+            stats["mutants"] += len(results)
+            for site, outcome in zip(sites, results):
+                stats[outcome] += 1
+                if outcome == "survived":
+                    surviving.append({"module": fn.module, "function": fn.qualname, "line": site.line,
+                                      "mutation": site.description})
+    for stats in modules.values():
+        stats.update(_scores(stats))
+    total = dict.fromkeys(("mutants", "killed", "timeout", "survived", "no_coverage"), 0)
+    for stats in modules.values():
+        for key in total:
+            total[key] += stats[key]
+    return {
+        **total,
+        **_scores(total),
+        "duration": round(time.perf_counter() - started, 3),
+        "modules": dict(sorted(modules.items())),
+        "surviving": surviving[:survivors],
+    }
+
+def _scores(stats: Dict[str, int]) -> Dict[str, Optional[float]]:
+    detected = stats["killed"] + stats["timeout"]
+    covered = detected + stats["survived"]
+    return {
+        "score": round(detected / stats["mutants"], 3) if stats["mutants"] else None,
+        "covered_score": round(detected / covered, 3) if covered else None,
+    }
@@ -0,0 +1,121 @@
+from __future__ import annotations
+import json
+import math
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .ast_extract import FunctionInfo
+from .requirements import requirement_index
+
+class CoverageData:
+    """Executed lines per source file from a coverage.py data file.
+
+    Reads the JSON report ('coverage json') or the SQLite data file ('.coverage',
+    line or branch mode) directly, so coverage.py itself is not needed.
+    """
+
+    def __init__(self, executed: Dict[str, Set[int]]):
+        self.executed = executed
+        # Basename -> measured paths, to match files recorded under another root
+        self._by_name: Dict[str, List[str]] = {}
+        for path in executed:
+            self._by_name.setdefault(path.rsplit("/", 1)[-1], []).append(path)
+        self._resolved: Dict[str, Optional[str]] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "CoverageData":
+        with open(path, "rb") as fh:
+            sqlite = fh.read(16).startswith(b"SQLite format 3")
+        executed = _read_sqlite(path) if sqlite else _read_json(path)
+        base = Path(path).resolve().parent
+        return cls({_normalize(file, base): lines for file, lines in executed.items()})
+
+    def lines_for(self, src_dir: str, rel_path: str) -> Optional[Set[int]]:
+        """Executed lines of src_dir/rel_path, or None if the file was never measured."""
+        if rel_path not in self._resolved:
+            absolute = (Path(src_dir) / rel_path).resolve().as_posix()
+            match = absolute if absolute in self.executed else None
+            if match is None:
+                # Longest measured path ending in rel_path, e.g. data recorded in a CI checkout
+                candidates = [p for p in self._by_name.get(rel_path.rsplit("/", 1)[-1], [])
+                              if p == rel_path or p.endswith("/" + rel_path)]
+                match = max(candidates, key=len) if candidates else None
+            self._resolved[rel_path] = match
+        match = self._resolved[rel_path]
+        return self.executed[match] if match is not None else None
+
+def _normalize(file: str, base: Path) -> str:
+    path = Path(file)
+    return (path if path.is_absolute() else base / path).resolve().as_posix()
+
+def _read_json(path: str) -> Dict[str, Set[int]]:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {file: set(info.get("executed_lines", [])) for file, info in data.get("files", {}).items()}
+
+def _read_sqlite(path: str) -> Dict[str, Set[int]]:
+    executed: Dict[str, Set[int]] = {}
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        files = dict(con.execute("SELECT id, path FROM file"))
+        for table in ("line_bits", "arc"):
+            try:
+                rows = con.execute(f"SELECT * FROM {table}").fetchall()
+            except sqlite3.OperationalError:  # older schema without this table
+                continue
+            names = [d[0] for d in con.execute(f"SELECT * FROM {table} LIMIT 0").description]
+            for row in rows:
+                row = dict(zip(names, row))
+                lines = executed.setdefault(files[row["file_id"]], set())
+                if table == "line_bits":
+                    lines.update(_numbits_lines(row["numbits"]))
+                else:
+                    lines.update(n for n in (row["fromno"], row["tono"]) if n > 0)
+    finally:
+        con.close()
+    return executed
+
+def _numbits_lines(numbits: bytes) -> Iterable[int]:
+    """Line numbers in coverage.py's numbits encoding (bit j of byte i is line 8*i + j)."""
+    for i, byte in enumerate(numbits):
+        for j in range(8):
+            if byte & (1 << j):
+                yield i * 8 + j
+
+@dataclass
+class PriorityWeights:
+    """Target value = uncovered lines x complexity factor x requirement factor."""
+
+    complexity: float = 0.5  # extra weight per log2 of cyclomatic complexity
+    requirement: float = 1.0  # extra weight for functions linked to a REQ-ID
+
+def uncovered_lines(fn: FunctionInfo, coverage: Optional[CoverageData], src_dir: str) -> int:
+    """Statement lines of fn not executed; without data for its file, all of them."""
+    executed = coverage.lines_for(src_dir, fn.rel_path) if coverage is not None else None
+    if executed is None:
+        return fn.statements
+    hit = sum(1 for line in range(fn.lineno + 1, fn.end_lineno + 1) if line in executed)
+    return max(0, fn.statements - hit)
+
+def prioritize(funcs: Iterable[FunctionInfo], src_dir: str, coverage: Optional[CoverageData] = None,
+               design_text: Optional[str] = None, weights: Optional[PriorityWeights] = None
+               ) -> Tuple[List[FunctionInfo], Dict[Tuple[str, str], int]]:
+    """Order functions by expected coverage gained per LLM call, highest first.
+
+    Returns the ordered functions and each one's position within its module in scan
+    order, so test files can still be assembled in source order.
+    """
+    weights = weights or PriorityWeights()
+    req_index = requirement_index(design_text)
+    positions: Dict[Tuple[str, str], int] = {}
+    counts: Dict[str, int] = {}
+    scored = []
+    for i, fn in enumerate(funcs):
+        positions[(fn.module, fn.qualname)] = counts[fn.module] = counts.get(fn.module, -1) + 1
+        value = uncovered_lines(fn, coverage, src_dir)
+        value *= 1 + weights.complexity * math.log2(max(1, fn.complexity))
+        if req_index.lookup(fn.name):
+            value *= 1 + weights.requirement
+        scored.append((-value, i, fn))
+    scored.sort(key=lambda item: item[:2])
+    return [fn for _, _, fn in scored], positions
@@ -1,46 +1,148 @@
 from __future__ import annotations
-from dataclasses import asdict
-from typing import Optional
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
 from .ast_extract import FunctionInfo
+from .context import design_context
+from .requirements import requirement_index
+from .telemetry import get_telemetry
+from .tokens import estimate_tokens, truncate_to_tokens
 
-def build_prompt(fn: FunctionInfo, design_text: Optional[str], framework: str = "pytest") -> str:
-    meta = asdict(fn)
-    design_snip = design_text[:2000] if design_text else ""
-    
+# Marker that opens each per-function section of a batched response
+BATCH_SECTION_MARKER = "### TEST"
+
+@dataclass
+class PromptConfig:
+    """Knobs for prompt construction."""
+    context_k: int = 4  # design-doc chunks per prompt
+    context_tokens: int = 600  # token budget for those chunks
+    max_prompt_tokens: int = 3000  # whole-prompt budget, 0 for unlimited
+    docstring_tokens: int = 200  # longer docstrings are truncated
+
+def _syntax_guide(framework: str) -> str:
     if framework == "robot":
-        syntax_guide = """
+        return """
 - Output Format: Robot Framework 
 - Use '*** Settings ***' for library imports.
 - Use '*** Test Cases ***' for tests.
 - Use Tags to link Requirements IDs (e.g. [Tags] REQ-123).
 """
-    else:
-        syntax_guide = """
+    return """
 - Output Format: Python (pytest)
 - Use # REQ-ID: <id> comments to link Requirements.
 - Use only 'pytest' and Python stdlib.
 """
 
-    return f"""You are an expert software test engineer.
-Generate a concise, runnable test file for the target function.
+def static_preamble(framework: str, batch: bool = False) -> str:
+    """Role and instructions, identical for every prompt of a run.
 
-Target:
-- module: {meta['module']}
-- function: {meta['name']}
-- args: {meta['args']}
-- types: {meta['annotations']}
-- returns: {meta['returns']}
-- docstring: {meta['docstring']}
+    Prompts start with this text and the per-target part follows, so providers with
+    prompt-prefix caching (OpenAI, vLLM, ...) only process it once.
+    """
+    return _PREAMBLES[(framework == "robot", batch)]
 
-Design context (Requirements):
-{design_snip}
+def _preamble(framework: str, batch: bool) -> str:
+    if batch:
+        task = "Generate concise, runnable tests for each target function described after the instructions."
+        extra = "6. Each target's tests must be self-contained (own imports) and start with its marker line, exactly as listed under Markers.\n"
+        output = "Return ONLY the marker lines and test code. Do not wrap in markdown."
+    else:
+        task = "Generate a concise, runnable test file for the target function described after the instructions."
+        extra = ""
+        output = "Return ONLY the test code content. Do not wrap in markdown."
+    return f"""You are an expert software test engineer.
+{task}
 
 Instructions:
-1. {syntax_guide}
-2. Look for a Requirement ID (e.g., REQ-101) in the design context that relates to this function.
+1. {_syntax_guide(framework)}
+2. Look for a Requirement ID (e.g., REQ-101) in the linked requirements or design context that relates to each function.
 3. If found, explicitly include it (via comment or Tag). If not found, mark as REQ-N/A.
 4. Do NOT do any network or file I/O.
 5. Prefer small, deterministic inputs.
+{extra}
+{output}"""
+
+_PREAMBLES = {(robot, batch): _preamble("robot" if robot else "pytest", batch) for robot in (False, True) for batch in (False, True)}
+
+def describe_target(fn: FunctionInfo, docstring_tokens: int = 0) -> str:
+    """Target signature; empty fields are omitted and the docstring is whitespace-collapsed."""
+    lines = [f"- module: {fn.module}", f"- function: {fn.name}", f"- signature: {fn.signature()}"]
+    if fn.decorators:
+        lines.append(f"- decorators: {', '.join('@' + d for d in fn.decorators)}")
+    if fn.docstring:
+        doc = " ".join(fn.docstring.split())
+        if docstring_tokens > 0:
+            doc = truncate_to_tokens(doc, docstring_tokens)
+        lines.append(f"- docstring: {doc}")
+    return "\n".join(lines)
+
+def _linked_requirements(fns: List[FunctionInfo], design_text: Optional[str]) -> Tuple[List[str], List[str]]:
+    """REQ-IDs linked to fns and their texts; IDs sharing one section are quoted once."""
+    index = requirement_index(design_text)
+    ids = {}
+    for fn in fns:
+        for req_id in index.lookup(fn.name):
+            ids.setdefault(req_id, index.requirements[req_id].text)
+    return list(ids), list(dict.fromkeys(ids.values()))
+
+def _design_snippet(fns: List[FunctionInfo], design_text: Optional[str], config: PromptConfig, linked: List[str], token_budget: int) -> str:
+    """Design-doc chunks most relevant to the targets (BM25 over name, docstring and signature)."""
+    if not design_text or token_budget <= 0:
+        return ""
+    query = "\n".join(
+        " ".join([fn.qualname, fn.docstring or "", *fn.args, *fn.kwonly, *map(str, fn.annotations.values()), fn.returns or ""])
+        for fn in fns
+    )
+    return design_context(design_text).select(query, config.context_k, token_budget, exclude_reqs=linked)
+
+def _assemble(preamble: str, head: str, fns: List[FunctionInfo], design_text: Optional[str], config: PromptConfig) -> str:
+    """preamble + head + linked requirements + design context, within config.max_prompt_tokens.
+
+    Over budget, the linked requirement text is truncated first and the design
+    context gets whatever room is left.
+    """
+    linked, texts = _linked_requirements(fns, design_text)
+    linked_text = "\n\n".join(texts)
+    context_budget = config.context_tokens
+    trimmed = False
+    if config.max_prompt_tokens > 0:
+        room = config.max_prompt_tokens - estimate_tokens(preamble) - estimate_tokens(head) - _FRAMING_TOKENS
+        if linked_text and estimate_tokens(linked_text) > room:
+            linked_text = truncate_to_tokens(linked_text, room)
+            trimmed = True
+        room -= estimate_tokens(linked_text) if linked_text else 0
+        if room < context_budget:
+            context_budget = room
+            trimmed = True
+    design_snip = _design_snippet(fns, design_text, config, linked, context_budget)
+
+    sections = [preamble, head]
+    if linked_text:
+        sections.append(f"Linked requirements:\n{linked_text}")
+    if design_snip:
+        sections.append(f"Design context (Requirements):\n{design_snip}")
+    prompt = "\n\n".join(sections) + "\n"
+    tokens = estimate_tokens(prompt)
+    telemetry = get_telemetry()
+    telemetry.observe("prompt.tokens", tokens)
+    telemetry.observe("prompt.preamble_tokens", estimate_tokens(preamble))
+    if trimmed:
+        telemetry.count("prompt.trimmed")
+    if config.max_prompt_tokens > 0 and tokens > config.max_prompt_tokens:
+        telemetry.count("prompt.over_budget")
+    return prompt
+
+# Headings and blank lines around the variable parts
+_FRAMING_TOKENS = 16
+
+def build_prompt(fn: FunctionInfo, design_text: Optional[str], framework: str = "pytest", config: Optional[PromptConfig] = None) -> str:
+    config = config or PromptConfig()
+    head = f"Target:\n{describe_target(fn, config.docstring_tokens)}"
+    return _assemble(static_preamble(framework), head, [fn], design_text, config)
 
-Return ONLY the test code content. Do not wrap in markdown.
-"""
\ No newline at end of file
+def build_batch_prompt(fns: List[FunctionInfo], design_text: Optional[str], framework: str = "pytest", config: Optional[PromptConfig] = None) -> str:
+    """One prompt for several functions of the same module; the design context is sent once."""
+    config = config or PromptConfig()
+    targets = "\n\n".join(f"Target {i}:\n{describe_target(fn, config.docstring_tokens)}" for i, fn in enumerate(fns, 1))
+    markers = "\n".join(f"{BATCH_SECTION_MARKER} {fn.qualname}" for fn in fns)
+    head = f"{targets}\n\nMarkers:\n{markers}"
+    return _assemble(static_preamble(framework, batch=True), head, fns, design_text, config)
@@ -0,0 +1,543 @@
+from __future__ import annotations
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+from importlib.metadata import entry_points
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+from .ratelimit import is_retryable
+
+# Third-party packages register extra providers under this entry-point group:
+#   [project.entry-points."llm_testgen.providers"]
+#   mybackend = "mypkg.backend:MyBackend"
+ENTRY_POINT_GROUP = "llm_testgen.providers"
+ALIASES = {"gemini": "google", "local": "openai-compatible"}
+
+class Backend:
+    """One LLM API. Subclasses implement complete(); stream() defaults to a single chunk.
+
+    Backends raise retryable errors (429/5xx/timeouts, see ratelimit.is_retryable) so the
+    caller can back off, and return None for anything else.
+    """
+
+    name = ""
+    default_model = ""
+
+    def __init__(self, model: Optional[str] = None, temperature: float = 0.2):
+        self.model = model or self.default_model
+        self.temperature = temperature
+        self.api_key: Optional[str] = None
+        # Called with a newly discovered model name so it can be remembered across runs
+        self.on_model_change: Optional[Callable[[str], None]] = None
+
+    def complete(self, prompt: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        text = self.complete(prompt)
+        if text:
+            yield text
+
+    def close(self):
+        pass
+
+class _SDKBackend(Backend):
+    """Backend whose SDK client is built once and reused, sharing its HTTP connection pool."""
+
+    def __init__(self, model: Optional[str] = None, temperature: float = 0.2):
+        super().__init__(model, temperature)
+        self._client: Any = None
+        self._client_lock = threading.Lock()
+
+    def _build_client(self) -> Any:
+        raise NotImplementedError
+
+    def _get_client(self) -> Any:
+        """Build the SDK client on first use; raises ImportError if the SDK is missing."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._build_client()
+        return self._client
+
+    def close(self):
+        """Release the pooled SDK client and its HTTP connections."""
+        with self._client_lock:
+            client, self._client = self._client, None
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+class GoogleBackend(_SDKBackend):
+    """Google Gemini (google-genai SDK), with auto-discovery when the model is not found."""
+
+    name = "google"
+    default_model = "gemini-1.5-flash"
+
+    def __init__(self, model: Optional[str] = None, temperature: float = 0.2):
+        super().__init__(model, temperature)
+        self.api_key = os.getenv("GEMINI_API_KEY")
+
+    def _build_client(self) -> Any:
+        from google import genai
+        # Initialize client (letting SDK choose best default version)
+        return genai.Client(api_key=self.api_key)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        if not self.api_key:
+            print("Error: GEMINI_API_KEY not set.")
+            return
+        response = self._get_client().models.generate_content_stream(
+            model=self.model,
+            contents=prompt,
+            config={"temperature": self.temperature}
+        )
+        try:
+            for chunk in response:
+                text = getattr(chunk, "text", None)
+                if text:
+                    yield text
+        finally:
+            _close(response)
+
+    def complete(self, prompt: str) -> Optional[str]:
+        if not self.api_key:
+            print("Error: GEMINI_API_KEY not set.")
+            return None
+
+        try:
+            client = self._get_client()
+
+            # 1. Try the configured model first
+            try:
+                response = client.models.generate_content(
+                    model=self.model,
+                    contents=prompt,
+                    config={"temperature": self.temperature}
+                )
+                if response.text:
+                    return response.text
+            except Exception as e:
+                if is_retryable(e):
+                    raise
+                # Only warn if it's a 404 (Not Found), otherwise it might be a real error
+                if "404" in str(e) or "not found" in str(e).lower():
+                    print(f"Model '{self.model}' not found. Attempting auto-discovery...")
+                else:
+                    print(f"Google Gemini Error: {e}")
+                    return None
+
+            # 2. Auto-Discovery (If first attempt failed)
+            try:
+                print("Scanning for available models...")
+                # List all models available to your API key
+                all_models = list(client.models.list())
+
+                valid_models = []
+                for m in all_models:
+                    # Safely get the name, handling both object and dict styles
+                    name = getattr(m, 'name', None) or m.get('name')
+                    if not name: continue
+
+                    # Clean name (remove 'models/' prefix)
+                    clean_name = name.split("/")[-1]
+
+                    # We only want 'gemini' models, ignore 'embedding' or 'aqa' models
+                    if "gemini" in clean_name.lower() and "vision" not in clean_name.lower():
+                        valid_models.append(clean_name)
+
+                if not valid_models:
+                    print("Error: No valid Gemini models found for this API key.")
+                    return None
+
+                print(f"Found available models: {valid_models}")
+
+                # 3. Smart Selection: Prefer Flash -> Pro -> 1.0
+                best_model = valid_models[0] # Default to first found
+
+                # Priority logic
+                for m in valid_models:
+                    if "1.5-flash" in m:
+                        best_model = m
+                        break
+                else:
+                    for m in valid_models:
+                        if "1.5-pro" in m:
+                            best_model = m
+                            break
+
+                print(f"-> Retrying with active model: {best_model}")
+                self.model = best_model # Update for future calls
+                if self.on_model_change is not None:
+                    self.on_model_change(best_model) # ... and future runs
+
+                # 4. Retry with the discovered model
+                response = client.models.generate_content(
+                    model=best_model,
+                    contents=prompt,
+                    config={"temperature": self.temperature}
+                )
+                if response.text:
+                    return response.text
+
+            except Exception as discovery_error:
+                if is_retryable(discovery_error):
+                    raise
+                print(f"Auto-discovery failed: {discovery_error}")
+
+            return None
+
+        except ImportError:
+            print("CRITICAL ERROR: 'google-genai' library missing. Run: pip install google-genai")
+            return None
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            print(f"Google SDK Error: {e}")
+            return None
+
+class OpenAIBackend(_SDKBackend):
+    """OpenAI (official SDK). The model comes from LLM_MODEL, defaulting to gpt-4o."""
+
+    name = "openai"
+    default_model = "gpt-4o"
+
+    def __init__(self, model: Optional[str] = None, temperature: float = 0.2):
+        super().__init__(model, temperature)
+        self.api_key = os.getenv("OPENAI_API_KEY")
+
+    def _build_client(self) -> Any:
+        from openai import OpenAI
+        return OpenAI(api_key=self.api_key)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        if not self.api_key:
+            print("Error: OPENAI_API_KEY not set.")
+            return
+        response = self._get_client().chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+            stream=True,
+        )
+        try:
+            for chunk in response:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    yield text
+        finally:
+            # Closing the HTTP response is what actually cancels generation server-side
+            _close(response)
+
+    def complete(self, prompt: str) -> Optional[str]:
+        if not self.api_key:
+            print("Error: OPENAI_API_KEY not set.")
+            return None
+        try:
+            client = self._get_client()
+            response = client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=self.temperature,
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            print(f"OpenAI API Error: {e}")
+            return None
+
+class HTTPStatusError(Exception):
+    """Non-2xx reply from an HTTP backend; status_code/headers feed the retry policy."""
+
+    def __init__(self, status_code: int, headers: Any = None, body: str = ""):
+        super().__init__(f"HTTP {status_code}: {body[:200]}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class OpenAICompatibleBackend(Backend):
+    """Any server speaking the OpenAI chat-completions API (vLLM, llama.cpp, Ollama, LM Studio...).
+
+    Uses only the standard library. Connections are HTTP/1.1 keep-alive and pooled, so
+    concurrent requests reuse sockets instead of reconnecting per call.
+
+    Environment: LLM_BASE_URL (default http://127.0.0.1:8000/v1), LLM_MODEL,
+    LLM_API_KEY (optional bearer token), LLM_TIMEOUT (seconds, default 120).
+    """
+
+    name = "openai-compatible"
+    default_model = "local-model"
+
+    def __init__(self, model: Optional[str] = None, temperature: float = 0.2, base_url: Optional[str] = None):
+        super().__init__(model, temperature)
+        self.api_key = os.getenv("LLM_API_KEY")
+        self.base_url = (base_url or os.getenv("LLM_BASE_URL", "http://127.0.0.1:8000/v1")).rstrip("/")
+        self.timeout = float(os.getenv("LLM_TIMEOUT", "120"))
+        url = urlsplit(self.base_url)
+        self._https = url.scheme == "https"
+        self._host = url.hostname or "127.0.0.1"
+        self._port = url.port
+        self._path = f"{url.path}/chat/completions"
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self.connections_opened += 1
+        cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        return cls(self._host, self._port, timeout=self.timeout)
+
+    def _release(self, conn: http.client.HTTPConnection, response: http.client.HTTPResponse):
+        if response.will_close:
+            conn.close()
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    def _post(self, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        for attempt in range(2):
+            conn = self._connect()
+            try:
+                conn.request("POST", self._path, body, headers)
+                response = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # A pooled connection the server already closed; retry once on a fresh one
+                conn.close()
+                if attempt:
+                    raise
+            except Exception:
+                conn.close()
+                raise
+        if response.status >= 400:
+            try:
+                text = response.read().decode("utf-8", "replace")
+            except Exception:
+                conn.close()
+                raise
+            self._release(conn, response)
+            raise HTTPStatusError(response.status, response.headers, text)
+        return conn, response
+
+    def _payload(self, prompt: str, stream: bool = False) -> dict:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def complete(self, prompt: str) -> Optional[str]:
+        try:
+            conn, response = self._post(self._payload(prompt))
+            try:
+                data = json.loads(response.read())
+            except Exception:
+                conn.close()  # a half-read response leaves the connection unusable
+                raise
+            self._release(conn, response)
+            return data["choices"][0]["message"]["content"]
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            print(f"OpenAI-compatible API Error ({self.base_url}): {e}")
+            return None
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        conn, response = self._post(self._payload(prompt, stream=True))
+        done = False
+        try:
+            # Server-sent events: 'data: {json}' lines, terminated by 'data: [DONE]'
+            for raw in response:
+                line = raw.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                text = (choices[0].get("delta") or {}).get("content")
+                if text:
+                    yield text
+            response.read()
+            done = True
+        finally:
+            if done:
+                self._release(conn, response)
+            else:
+                # Dropping the connection is what cancels generation server-side
+                conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+class Cassette:
+    """Recorded prompt -> response pairs in a JSONL file, for offline deterministic replays.
+
+    Each line holds the prompt hash, the response and how long the live call took.
+    A prompt recorded several times replays its responses in recording order, the last
+    one repeating.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: Dict[str, List[dict]] = {}
+        self.misses = 0
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries.setdefault(entry["key"], []).append(entry)
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def play(self, prompt: str) -> Optional[dict]:
+        key = self.key(prompt)
+        with self._lock:
+            recorded = self.entries.get(key)
+            if not recorded:
+                self.misses += 1
+                return None
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            return recorded[min(i, len(recorded) - 1)]
+
+    def record(self, prompt: str, response: str, latency: float, model: str):
+        entry = {"key": self.key(prompt), "model": model, "latency": round(latency, 4), "response": response}
+        with self._lock:
+            self.entries.setdefault(entry["key"], []).append(entry)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps(entry) + "\n")
+
+class RecordingBackend(Backend):
+    """Wraps a live backend and appends every complete response to a cassette."""
+
+    def __init__(self, inner: Backend, cassette: Cassette):
+        self.inner = inner
+        super().__init__(inner.model, inner.temperature)
+        self.cassette = cassette
+        self.name = inner.name
+        self.api_key = inner.api_key
+
+    @property
+    def model(self) -> str:
+        return self.inner.model
+
+    @model.setter
+    def model(self, value: str):
+        self.inner.model = value
+
+    def complete(self, prompt: str) -> Optional[str]:
+        start = time.perf_counter()
+        text = self.inner.complete(prompt)
+        if text:
+            self.cassette.record(prompt, text, time.perf_counter() - start, self.model)
+        return text
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        start = time.perf_counter()
+        parts = []
+        for chunk in self.inner.stream(prompt):
+            parts.append(chunk)
+            yield chunk
+        # Only reached when the stream was consumed to the end, so aborted responses are not kept
+        if parts:
+            self.cassette.record(prompt, "".join(parts), time.perf_counter() - start, self.model)
+
+    def close(self):
+        self.inner.close()
+
+class ReplayBackend(Backend):
+    """Serves responses from a cassette (LLM_CASSETTE); never touches the network.
+
+    Unrecorded prompts return None, i.e. the rule-based fallback. With
+    LLM_REPLAY_REALTIME=1 each reply sleeps for the recorded latency, which makes
+    offline throughput benchmarks behave like the live run.
+    """
+
+    name = "replay"
+    default_model = "replay"
+
+    def __init__(self, model: Optional[str] = None, temperature: float = 0.2, cassette: Optional[Cassette] = None):
+        super().__init__(model, temperature)
+        if cassette is None:
+            path = os.getenv("LLM_CASSETTE")
+            if not path:
+                raise ValueError("the replay provider needs a cassette (--cassette or LLM_CASSETTE)")
+            cassette = Cassette(path)
+        self.cassette = cassette
+        self.realtime = os.getenv("LLM_REPLAY_REALTIME", "") not in ("", "0")
+
+    def complete(self, prompt: str) -> Optional[str]:
+        entry = self.cassette.play(prompt)
+        if entry is None:
+            return None
+        if self.realtime:
+            time.sleep(entry.get("latency", 0.0))
+        return entry["response"]
+
+_REGISTRY: Dict[str, Callable[..., Backend]] = {
+    "google": GoogleBackend,
+    "openai": OpenAIBackend,
+    "openai-compatible": OpenAICompatibleBackend,
+    "replay": ReplayBackend,
+}
+_entry_points_loaded = False
+
+def register_provider(name: str, factory: Callable[..., Backend]):
+    """Make factory(model=..., temperature=...) available as LLM_PROVIDER=name."""
+    _REGISTRY[name.lower()] = factory
+
+def _load_entry_points():
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        if ep.name.lower() in _REGISTRY:
+            continue
+        try:
+            register_provider(ep.name, ep.load())
+        except Exception as e:
+            print(f"Warning: could not load LLM provider plugin '{ep.name}': {e}")
+
+def available_providers() -> List[str]:
+    _load_entry_points()
+    return sorted(_REGISTRY)
+
+def get_provider_factory(name: str) -> Optional[Callable[..., Backend]]:
+    """Factory registered for name (built-in, register_provider() or entry point), or None."""
+    name = ALIASES.get(name, name)
+    if name not in _REGISTRY:
+        _load_entry_points()
+    return _REGISTRY.get(name)
+
+def _close(response: Any):
+    close = getattr(response, "close", None)
+    if callable(close):
+        close()
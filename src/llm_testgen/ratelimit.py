@@ -0,0 +1,227 @@
+from __future__ import annotations
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from .telemetry import get_telemetry
+
+# HTTP statuses worth retrying: throttling, timeouts and transient server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+def error_status(exc: BaseException) -> Optional[int]:
+    """Best-effort HTTP status of an SDK/HTTP exception (OpenAI, google-genai, urllib)."""
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    if isinstance(value, int):
+        return value
+    text = str(exc)
+    if "429" in text or "RESOURCE_EXHAUSTED" in text:
+        return 429
+    if "503" in text or "UNAVAILABLE" in text:
+        return 503
+    return None
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header or attribute, if any."""
+    value = getattr(exc, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None) or getattr(exc, "headers", None)
+        if headers is not None:
+            try:
+                value = headers.get("retry-after") or headers.get("Retry-After")
+            except Exception:
+                value = None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(exc: BaseException) -> bool:
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    name = type(exc).__name__
+    return isinstance(exc, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Take amount tokens, sleeping until available. Returns seconds waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                need = (amount - self.tokens) / self.rate
+            time.sleep(need)
+            waited += need
+
+class AdaptiveConcurrency:
+    """AIMD in-flight limit: halves on throttling, grows by ~1 per window of successes."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self.inflight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        """Wait for a free slot. Returns seconds spent waiting because the limit was cut."""
+        start = time.monotonic()
+        throttled = False
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                throttled = throttled or self.limit < self.max_limit
+                self._cond.wait()
+            self.inflight += 1
+        return time.monotonic() - start if throttled else 0.0
+
+    def release(self, throttled: bool = False):
+        with self._cond:
+            self.inflight -= 1
+            if throttled:
+                self.limit = max(float(self.min_limit), self.limit / 2)
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+class RetryPolicy:
+    """Jittered exponential backoff ("full jitter") that honours Retry-After."""
+
+    def __init__(self, max_retries: int = 5, base: float = 1.0, cap: float = 60.0):
+        self.max_retries = max_retries
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            # The server knows best; add a little jitter so workers don't stampede together
+            return min(self.cap, retry_after) + random.uniform(0, self.base / 10)
+        return random.uniform(0, min(self.cap, self.base * (2 ** attempt)))
+
+class _Slot:
+    """Handed to the caller of RateLimiter.slot(); set throttled=True to cut concurrency."""
+    throttled = False
+
+class RateLimiter:
+    """Requests/min and tokens/min buckets plus an adaptive concurrency limit.
+
+    Records how much wall time callers spent throttled (bucket waits, reduced
+    concurrency and backoff sleeps).
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, max_concurrency: int = 4):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.throttle_seconds = 0.0
+        self.throttled = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _record(self, waited: float = 0.0, throttled: int = 0, retries: int = 0):
+        if waited:
+            get_telemetry().observe("throttle_seconds", waited)
+        with self._lock:
+            self.throttle_seconds += waited
+            self.throttled += throttled
+            self.retries += retries
+
+    @contextmanager
+    def slot(self, tokens: float = 0.0) -> Iterator["_Slot"]:
+        waited = 0.0
+        if self.requests:
+            waited += self.requests.acquire(1)
+        if self.tokens and tokens:
+            waited += self.tokens.acquire(tokens)
+        waited += self.concurrency.acquire()
+        self._record(waited)
+        outcome = _Slot()
+        try:
+            yield outcome
+        finally:
+            self.concurrency.release(throttled=outcome.throttled)
+
+    def backoff(self, seconds: float):
+        self._record(seconds, throttled=1, retries=1)
+        time.sleep(seconds)
+
+    def stats(self) -> dict:
+        return {
+            "throttle_seconds": round(self.throttle_seconds, 3),
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "concurrency_limit": int(self.concurrency.limit),
+        }
+
+class Budget:
+    """Caps on a run's total LLM spend: calls, wall-clock seconds and tokens (prompt + output, estimated).
+
+    A request that would go over a cap is refused and its caller falls back to a
+    rule-based skeleton. Requests already in flight finish, so the token cap can be
+    overshot by their output. The clock starts with the first request, so time spent
+    scanning and ranking before generation is not charged.
+    """
+
+    def __init__(self, max_calls: Optional[int] = None, max_seconds: Optional[float] = None, max_tokens: Optional[int] = None):
+        self.max_calls = max_calls
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.started: Optional[float] = None
+        self.calls = 0
+        self.tokens = 0
+        self.refused = 0
+        self._lock = threading.Lock()
+
+    @property
+    def limited(self) -> bool:
+        return any(cap is not None for cap in (self.max_calls, self.max_seconds, self.max_tokens))
+
+    def acquire(self, prompt_tokens: int) -> bool:
+        """Reserve one call and its prompt tokens; False once any cap is reached."""
+        with self._lock:
+            if self.started is None:
+                self.started = time.monotonic()
+            if ((self.max_calls is not None and self.calls >= self.max_calls)
+                    or (self.max_seconds is not None and time.monotonic() - self.started >= self.max_seconds)
+                    or (self.max_tokens is not None and self.tokens + prompt_tokens > self.max_tokens)):
+                self.refused += 1
+                refused = True
+            else:
+                self.calls += 1
+                self.tokens += prompt_tokens
+                refused = False
+        if refused:
+            get_telemetry().count("budget.refused")
+        return not refused
+
+    def charge(self, output_tokens: int):
+        with self._lock:
+            self.tokens += output_tokens
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "tokens": self.tokens,
+            "seconds": round(time.monotonic() - self.started, 3) if self.started is not None else 0.0,
+            "refused": self.refused,
+        }
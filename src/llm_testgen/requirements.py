@@ -0,0 +1,74 @@
+from __future__ import annotations
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+REQ_ID_RE = re.compile(r"\bREQ-\d+\b")
+IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+@dataclass
+class Requirement:
+    req_id: str
+    title: str
+    lines: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n".join([self.title] + self.lines).strip()
+
+class RequirementIndex:
+    """Design doc parsed once into REQ-ID -> requirement and identifier -> REQ-IDs.
+
+    A line mentioning one or more REQ-IDs opens a requirement section (continuing until
+    the next such line or markdown heading) and links every identifier on that line to
+    those IDs. Identifiers are matched as whole words, so ``add`` does not match ``add_user``.
+    """
+
+    def __init__(self, design_text: Optional[str]):
+        self.requirements: Dict[str, Requirement] = {}
+        self._by_ident: Dict[str, List[str]] = {}
+        if design_text:
+            self._parse(design_text)
+
+    def _parse(self, design_text: str):
+        current: List[Requirement] = []
+        for line in design_text.splitlines():
+            ids = REQ_ID_RE.findall(line)
+            if not ids:
+                if line.lstrip().startswith("#"):
+                    current = []
+                for req in current:
+                    req.lines.append(line)
+                continue
+            current = []
+            for req_id in ids:
+                req = self.requirements.get(req_id)
+                if req is None:
+                    req = self.requirements[req_id] = Requirement(req_id, line.strip())
+                current.append(req)
+            for ident in set(IDENT_RE.findall(REQ_ID_RE.sub(" ", line))):
+                linked = self._by_ident.setdefault(ident, [])
+                for req_id in ids:
+                    if req_id not in linked:
+                        linked.append(req_id)
+
+    def lookup(self, name: str) -> List[str]:
+        """REQ-IDs linked to a function (or dotted qualname), in document order."""
+        return list(self._by_ident.get(name.rsplit(".", 1)[-1], ()))
+
+    def primary(self, name: str) -> str:
+        ids = self.lookup(name)
+        return ids[0] if ids else "N/A"
+
+    def text_for(self, name: str) -> str:
+        """Full text of every requirement linked to name."""
+        return "\n\n".join(self.requirements[req_id].text for req_id in self.lookup(name))
+
+    def __len__(self) -> int:
+        return len(self.requirements)
+
+@lru_cache(maxsize=8)
+def requirement_index(design_text: Optional[str]) -> RequirementIndex:
+    """Shared index per design doc; str hashes are cached, so repeat lookups are O(1)."""
+    return RequirementIndex(design_text)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Plain-text format: a line starting with '*' is a section header; cells are separated
+# by two or more spaces or a tab (or ' | ' in the pipe-separated variant)
+_HEADER_RE = re.compile(r"^\*+\s*([^*]+?)\s*\**\s*$")
+_CELL_SEP_RE = re.compile(r" {2,}|\t| \| ")
+_SECTIONS = {
+    "setting": "settings", "settings": "settings",
+    "variable": "variables", "variables": "variables",
+    "test case": "test cases", "test cases": "test cases",
+    "task": "test cases", "tasks": "test cases",
+    "keyword": "keywords", "keywords": "keywords",
+    "comment": "comments", "comments": "comments",
+}
+_TEST_SETTINGS = {"documentation", "tags", "setup", "teardown", "template", "timeout"}
+_SUITE_TAG_SETTINGS = {"force tags", "test tags", "default tags"}
+
+@dataclass
+class RobotTest:
+    name: str
+    line: int
+    tags: List[str] = field(default_factory=list)
+    steps: int = 0
+
+@dataclass
+class RobotSuite:
+    """A .robot file's structure: sections, test cases with their [Tags], suite-level tags."""
+    sections: List[str] = field(default_factory=list)
+    tests: List[RobotTest] = field(default_factory=list)
+    suite_tags: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors and bool(self.tests)
+
+    def tags_by_test(self) -> Dict[str, List[str]]:
+        """Effective tags of every test: suite-level tags plus its own."""
+        return {t.name: self.suite_tags + t.tags for t in self.tests}
+
+def _cells(line: str) -> List[str]:
+    if line.startswith("| "):
+        line = line[2:].rstrip(" |")
+    cells = _CELL_SEP_RE.split(line.rstrip())
+    return [c.strip() for c in cells]
+
+def _end_test(suite: RobotSuite, test: Optional[RobotTest]):
+    if test is not None and not test.steps:
+        suite.errors.append(f"line {test.line}: test {test.name!r} has no steps")
+
+def parse_robot(text: str) -> RobotSuite:
+    """Parse Robot Framework plain-text test data without robotframework installed.
+
+    Recognises what generated suites use: section headers, test case names and their
+    steps, [Tags] (with '...' continuations), and Force/Test/Default Tags. Anything the
+    real parser would reject or silently drop (data before the first section, unknown
+    sections or test settings, steps outside a test, empty tests) is reported in errors.
+    """
+    suite = RobotSuite()
+    section: Optional[str] = None
+    test: Optional[RobotTest] = None
+    continuing: Optional[List[str]] = None  # the tag list a '...' line extends
+    for lineno, raw in enumerate(text.splitlines(), 1):
+        if not raw.strip() or raw.lstrip().startswith("#"):
+            continue
+        if raw.startswith("*"):
+            match = _HEADER_RE.match(raw)
+            name = _SECTIONS.get(match.group(1).strip().lower()) if match else None
+            if name is None:
+                suite.errors.append(f"line {lineno}: unknown section {raw.strip()!r}")
+            _end_test(suite, test)
+            section, test, continuing = name, None, None
+            if name is not None and name not in suite.sections:
+                suite.sections.append(name)
+            continue
+        if section is None:
+            if not suite.sections and not suite.errors:
+                suite.errors.append(f"line {lineno}: data before the first section")
+            continue
+        if section == "comments":
+            continue
+        cells = _cells(raw)
+        indented = not cells[0] if raw.startswith("| ") else raw[0] in " \t"
+        if indented:
+            cells = [c for c in cells if c] or [""]
+        if cells[0] == "...":
+            if continuing is not None:
+                continuing.extend(c for c in cells[1:] if c)
+            elif section == "test cases" and test is None:
+                suite.errors.append(f"line {lineno}: continuation outside a test")
+            continue
+        continuing = None
+        if section == "settings":
+            if cells[0].lower() in _SUITE_TAG_SETTINGS:
+                suite.suite_tags.extend(c for c in cells[1:] if c)
+                continuing = suite.suite_tags
+            continue
+        if section != "test cases":
+            continue
+        if not indented:
+            _end_test(suite, test)
+            test = RobotTest(cells[0], lineno)
+            suite.tests.append(test)
+            rest = [c for c in cells[1:] if c]
+            if not rest:
+                continue
+            cells = rest  # first step on the name line
+        if test is None:
+            suite.errors.append(f"line {lineno}: step outside a test")
+            continue
+        setting = cells[0]
+        if setting.startswith("[") and setting.endswith("]"):
+            key = setting[1:-1].strip().lower()
+            if key not in _TEST_SETTINGS:
+                suite.errors.append(f"line {lineno}: unknown test setting {setting!r}")
+            elif key == "tags":
+                test.tags.extend(c for c in cells[1:] if c)
+                continuing = test.tags
+            continue
+        test.steps += 1
+    _end_test(suite, test)
+    if "test cases" not in suite.sections:
+        suite.errors.append("no Test Cases section")
+    return suite
@@ -0,0 +1,322 @@
+from __future__ import annotations
+import ast
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+@dataclass(frozen=True)
+class Value:
+    """A Python expression for a test input plus the imports it needs."""
+    expr: str
+    imports: FrozenSet[str] = frozenset()
+
+NONE = Value("None")
+
+@dataclass
+class ClassInfo:
+    module: str  # importable module name
+    source: str  # module whose namespace resolves the class's annotations
+    name: str
+    kind: str  # "enum", "record" (dataclass/NamedTuple/BaseModel), "typeddict" or "class"
+    node: ast.ClassDef
+    # Required constructor parameters (no default) as (name, annotation) pairs
+    params: List[Tuple[str, Optional[ast.expr]]] = field(default_factory=list)
+    member: Optional[str] = None  # first enum member
+    abstract: bool = False
+
+# Builtin and stdlib types that need no resolution
+_SCALARS: Dict[str, Value] = {
+    "int": Value("1"), "float": Value("0.5"), "complex": Value("1j"), "str": Value("'x'"),
+    "bool": Value("True"), "bytes": Value("b'x'"), "bytearray": Value("bytearray(b'x')"),
+    "None": NONE, "NoneType": NONE, "object": Value("object()"), "Any": Value("1"),
+    "list": Value("[]"), "List": Value("[]"), "dict": Value("{}"), "Dict": Value("{}"),
+    "set": Value("set()"), "Set": Value("set()"), "frozenset": Value("frozenset()"),
+    "tuple": Value("()"), "Tuple": Value("()"),
+    "Decimal": Value("Decimal('1.5')", frozenset({"from decimal import Decimal"})),
+    "Fraction": Value("Fraction(1, 2)", frozenset({"from fractions import Fraction"})),
+    "datetime": Value("datetime.datetime(2024, 1, 1)", frozenset({"import datetime"})),
+    "date": Value("datetime.date(2024, 1, 1)", frozenset({"import datetime"})),
+    "time": Value("datetime.time(12, 0)", frozenset({"import datetime"})),
+    "timedelta": Value("datetime.timedelta(seconds=1)", frozenset({"import datetime"})),
+    "Path": Value("pathlib.Path('x')", frozenset({"import pathlib"})),
+    "PurePath": Value("pathlib.PurePath('x')", frozenset({"import pathlib"})),
+    "UUID": Value("uuid.UUID(int=1)", frozenset({"import uuid"})),
+}
+_WRAPPERS = {"Optional", "Annotated", "Final", "ClassVar", "Required", "NotRequired", "ReadOnly"}
+_SEQUENCES = {"list", "List", "Sequence", "MutableSequence", "Iterable", "Collection", "Reversible", "Container"}
+_SETS = {"set", "Set", "AbstractSet", "MutableSet"}
+_MAPPINGS = {"dict", "Dict", "Mapping", "MutableMapping", "DefaultDict", "OrderedDict"}
+_ITERATORS = {"Iterator", "Generator", "AsyncIterator", "AsyncIterable", "AsyncGenerator"}
+_ENUM_BASES = {"Enum", "IntEnum", "StrEnum", "Flag", "IntFlag"}
+_RECORD_BASES = {"NamedTuple", "BaseModel"}
+_ABSTRACT_BASES = {"ABC", "Protocol"}
+_MAX_DEPTH = 3
+
+def _tail(node: ast.expr) -> str:
+    """Last component of a Name or dotted Attribute (typing.Optional -> Optional)."""
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return ""
+
+def _package(module: str) -> str:
+    """Importable module name (pkg.__init__ -> pkg)."""
+    return module.removesuffix(".__init__")
+
+class _Module:
+    """Classes and imported names of one source module."""
+
+    def __init__(self, name: str, tree: ast.Module):
+        self.name = name
+        self.classes: Dict[str, ast.ClassDef] = {}
+        self.imports: Dict[str, Tuple[str, Optional[str]]] = {}  # alias -> (module, name or None)
+        package = name.split(".")[:-1]
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                self.classes[node.name] = node
+            elif isinstance(node, ast.ImportFrom):
+                base = package[: len(package) - node.level + 1] if node.level else []
+                source = ".".join(base + ([node.module] if node.module else []))
+                for alias in node.names:
+                    self.imports[alias.asname or alias.name] = (source, alias.name)
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        self.imports[alias.asname] = (alias.name, None)
+                    else:
+                        self.imports[alias.name.split(".")[0]] = (alias.name.split(".")[0], None)
+
+class TypeIndex:
+    """Synthesizes test inputs from annotations, resolving project classes through the AST.
+
+    Source modules under src_dir are parsed lazily, once, when an annotation names a
+    class defined or imported there. Enums yield their first member, dataclasses,
+    NamedTuples and plain classes a constructor call with synthesized required
+    arguments. Results are memoized per (module, annotation).
+    """
+
+    def __init__(self, src_dir: Optional[str] = None):
+        self.root = Path(src_dir) if src_dir else None
+        self._modules: Dict[str, Optional[_Module]] = {}
+        self._classes: Dict[Tuple[str, str], Optional[ClassInfo]] = {}
+        self._memo: Dict[Tuple[str, Optional[str], str], Value] = {}
+        self._lock = threading.RLock()
+
+    def value(self, module: str, annotation: Optional[str], arg_name: str = "") -> Value:
+        """Input for a parameter annotated with annotation (source text) in module."""
+        key = (module, annotation, "" if annotation else arg_name)
+        with self._lock:
+            cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+        if annotation:
+            try:
+                result = self._synth(ast.parse(annotation, mode="eval").body, module, 0)
+            except SyntaxError:
+                result = NONE
+        else:
+            result = _from_name(arg_name)
+        with self._lock:
+            self._memo[key] = result
+        return result
+
+    def instance(self, module: str, class_name: str) -> Optional[Value]:
+        """Constructor call for a class of module, or None if it cannot be instantiated."""
+        info = self.resolve(module, class_name)
+        if info is None or info.kind == "enum" or info.abstract:
+            return None
+        return self._construct(info, 0)
+
+    def _module(self, name: str) -> Optional[_Module]:
+        with self._lock:
+            if name in self._modules:
+                return self._modules[name]
+            parsed = None
+            if self.root is not None:
+                base = self.root.joinpath(*name.split("."))
+                for path in (base.with_suffix(".py"), base / "__init__.py"):
+                    if path.is_file():
+                        try:
+                            parsed = _Module(name, ast.parse(path.read_text(encoding="utf-8")))
+                        except (OSError, SyntaxError, UnicodeDecodeError, ValueError):
+                            pass
+                        break
+            self._modules[name] = parsed
+            return parsed
+
+    def resolve(self, module: str, name: str, hops: int = 0) -> Optional[ClassInfo]:
+        """ClassInfo for name as seen from module, following (re-)exports."""
+        key = (module, name)
+        with self._lock:
+            if key in self._classes:
+                return self._classes[key]
+        info = None
+        mod = self._module(module)
+        if mod is not None and hops < 5:
+            head, _, rest = name.partition(".")
+            if not rest and head in mod.classes:
+                info = self._class_info(mod, mod.classes[head])
+            elif head in mod.imports:
+                source, imported = mod.imports[head]
+                if imported is None:  # import pkg.mod as alias; alias.Class
+                    target = rest.rpartition(".")
+                    info = self.resolve(".".join(filter(None, [source, target[0]])), target[2], hops + 1) if rest else None
+                else:
+                    info = self.resolve(source, ".".join(filter(None, [imported, rest])), hops + 1)
+                    if info is None and rest:  # from pkg import mod; mod.Class
+                        info = self.resolve(f"{source}.{imported}", rest, hops + 1)
+        with self._lock:
+            self._classes[key] = info
+        return info
+
+    def _class_info(self, mod: _Module, node: ast.ClassDef) -> ClassInfo:
+        bases = {_tail(b) for b in node.bases}
+        decorators = {_tail(d.func if isinstance(d, ast.Call) else d) for d in node.decorator_list}
+        info = ClassInfo(module=_package(mod.name), source=mod.name, name=node.name, kind="class", node=node)
+        info.abstract = bool(bases & _ABSTRACT_BASES) or any(
+            isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))
+            and any(_tail(d) == "abstractmethod" for d in item.decorator_list)
+            for item in node.body
+        )
+        if bases & _ENUM_BASES:
+            info.kind = "enum"
+            for item in node.body:
+                if isinstance(item, ast.Assign) and isinstance(item.targets[0], ast.Name) and not item.targets[0].id.startswith("_"):
+                    info.member = item.targets[0].id
+                    break
+            return info
+        if "dataclass" in decorators or "define" in decorators or bases & _RECORD_BASES or "TypedDict" in bases:
+            info.kind = "typeddict" if "TypedDict" in bases else "record"
+            for base in node.bases:
+                parent = self.resolve(mod.name, ast.unparse(base))
+                if parent is not None and parent.kind in ("record", "typeddict"):
+                    info.params.extend(parent.params)
+            for item in node.body:
+                if isinstance(item, ast.AnnAssign) and isinstance(item.target, ast.Name):
+                    if _tail(getattr(item.annotation, "value", item.annotation)) == "ClassVar":
+                        continue
+                    if item.value is None or _field_without_default(item.value):
+                        info.params.append((item.target.id, item.annotation))
+            return info
+        init = next((item for item in node.body if isinstance(item, ast.FunctionDef) and item.name == "__init__"), None)
+        if init is None:
+            # Inherit the constructor of the first base defined in the project
+            for base in node.bases:
+                parent = self.resolve(mod.name, ast.unparse(base))
+                if parent is not None and parent.kind == "class":
+                    info.params = list(parent.params)
+                    info.abstract = info.abstract or parent.abstract
+                    break
+            return info
+        args = init.args
+        positional = args.posonlyargs + args.args
+        required = len(positional) - len(args.defaults)
+        info.params = [(a.arg, a.annotation) for a in positional[1:required]]
+        info.params += [(a.arg, a.annotation) for a, d in zip(args.kwonlyargs, args.kw_defaults) if d is None]
+        return info
+
+    def _construct(self, info: ClassInfo, depth: int) -> Value:
+        imports = {f"from {info.module} import {info.name}"}
+        parts = []
+        for name, annotation in info.params:
+            value = self._synth(annotation, info.source, depth + 1) if annotation is not None else _from_name(name)
+            imports |= value.imports
+            parts.append((name, value.expr))
+        if info.kind == "typeddict":
+            return Value("{" + ", ".join(f"{name!r}: {expr}" for name, expr in parts) + "}", frozenset(imports))
+        return Value(f"{info.name}({', '.join(f'{name}={expr}' for name, expr in parts)})", frozenset(imports))
+
+    def _synth(self, node: ast.expr, module: str, depth: int) -> Value:
+        if depth > _MAX_DEPTH:
+            return NONE
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, str):  # forward reference
+                try:
+                    return self._synth(ast.parse(node.value, mode="eval").body, module, depth)
+                except SyntaxError:
+                    return NONE
+            return NONE
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+            return self._union([node.left, node.right], module, depth)
+        if isinstance(node, ast.Subscript):
+            return self._generic(_tail(node.value), node.slice, module, depth)
+        name = _tail(node)
+        if not name:
+            return NONE
+        if name in _SCALARS:
+            return _SCALARS[name]
+        if name in _SEQUENCES:
+            return Value("[]")
+        if name in _MAPPINGS:
+            return Value("{}")
+        if name == "Callable":
+            return Value("lambda *args, **kwargs: None")
+        info = self.resolve(module, ast.unparse(node))
+        if info is None or info.abstract:
+            return NONE
+        if info.kind == "enum":
+            if info.member is None:
+                return NONE
+            return Value(f"{info.name}.{info.member}", frozenset({f"from {info.module} import {info.name}"}))
+        return self._construct(info, depth)
+
+    def _union(self, options: List[ast.expr], module: str, depth: int) -> Value:
+        for option in options:
+            value = self._synth(option, module, depth)
+            if value != NONE:
+                return value
+        return NONE
+
+    def _generic(self, name: str, params: ast.expr, module: str, depth: int) -> Value:
+        args = params.elts if isinstance(params, ast.Tuple) else [params]
+        if name in _WRAPPERS or name in ("Type", "type"):
+            if name in ("Type", "type"):
+                inner = _tail(args[0])
+                info = self.resolve(module, ast.unparse(args[0])) if inner not in _SCALARS else None
+                if info is not None:
+                    return Value(info.name, frozenset({f"from {info.module} import {info.name}"}))
+                return Value(inner) if inner in _SCALARS and inner not in ("None", "Any") else NONE
+            return self._synth(args[0], module, depth)
+        if name == "Union":
+            return self._union(args, module, depth)
+        if name == "Literal":
+            first = args[0]
+            return Value(repr(first.value)) if isinstance(first, ast.Constant) else NONE
+        if name == "Callable":
+            result = self._synth(args[-1], module, depth + 1) if len(args) == 2 else NONE
+            return Value(f"lambda *args, **kwargs: {result.expr}", result.imports)
+        items = [self._synth(a, module, depth + 1) for a in args if not (isinstance(a, ast.Constant) and a.value is Ellipsis)]
+        imports = frozenset().union(*(i.imports for i in items)) if items else frozenset()
+        if name in _SEQUENCES:
+            return Value(f"[{items[0].expr}]", imports)
+        if name in _SETS:
+            return Value(f"{{{items[0].expr}}}", imports)
+        if name in ("frozenset", "FrozenSet"):
+            return Value(f"frozenset({{{items[0].expr}}})", imports)
+        if name in ("tuple", "Tuple"):
+            return Value("(" + ", ".join(i.expr for i in items) + ("," if len(items) == 1 else "") + ")", imports)
+        if name in _MAPPINGS and len(items) == 2:
+            return Value(f"{{{items[0].expr}: {items[1].expr}}}", imports)
+        if name in _ITERATORS:
+            return Value(f"iter([{items[0].expr}])", imports)
+        # Unknown generic (e.g. a project class parameterized by a TypeVar)
+        return self._synth(ast.Name(id=name), module, depth)
+
+def _field_without_default(value: ast.expr) -> bool:
+    """dataclasses.field(...) / attrs.field(...) without default or default_factory."""
+    return (isinstance(value, ast.Call) and _tail(value.func) in ("field", "Field", "attrib", "ib")
+            and not any(kw.arg in ("default", "default_factory", "factory") for kw in value.keywords)
+            and not value.args)
+
+def _from_name(name: str) -> Value:
+    """Best guess for an unannotated parameter from its name."""
+    lowered = name.lower()
+    if lowered.startswith(("is_", "has_", "use_", "enable", "allow")) or lowered in ("flag", "verbose", "strict"):
+        return Value("True")
+    if lowered in ("name", "text", "s", "string", "msg", "message", "path", "key", "prefix", "suffix", "url", "label", "title"):
+        return Value("'x'")
+    if lowered.endswith(("_list", "items", "values")):
+        return Value("[]")
+    return Value("1")
@@ -0,0 +1,136 @@
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+class NullTelemetry:
+    """Default sink: instrumentation points cost a function call and nothing else."""
+
+    enabled = False
+
+    def span(self, name: str, **args):
+        return nullcontext()
+
+    def count(self, name: str, n: float = 1):
+        pass
+
+    def observe(self, name: str, value: float):
+        pass
+
+class Telemetry(NullTelemetry):
+    """In-process spans, counters and samples for a run.
+
+    Spans are kept as Chrome trace events (open the JSON in chrome://tracing or
+    Perfetto). Hooks are called with every finished span event.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {}
+        self.samples: Dict[str, List[float]] = {}
+        self.hooks: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {
+                "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                "ts": round((start - self._t0) * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+            }
+            if args:
+                event["args"] = args
+            with self._lock:
+                self.events.append(event)
+                self.samples.setdefault(f"span.{name}", []).append(end - start)
+            for hook in self.hooks:
+                hook(event)
+
+    def count(self, name: str, n: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.samples.setdefault(name, []).append(value)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            samples = {k: list(v) for k, v in self.samples.items()}
+        spans = {
+            name[len("span."):]: {
+                "count": len(vals),
+                "total_s": round(sum(vals), 3),
+                "p50_ms": round(percentile(vals, 50) * 1000, 1),
+                "p95_ms": round(percentile(vals, 95) * 1000, 1),
+            }
+            for name, vals in samples.items() if name.startswith("span.")
+        }
+        latency = samples.get("llm.latency", [])
+        lookups = counters.get("cache.hit", 0) + counters.get("cache.miss", 0)
+        functions = counters.get("functions", 0)
+        prompt_tokens = samples.get("prompt.tokens", [])
+        return {
+            "wall_s": round(time.perf_counter() - self._t0, 3),
+            "spans": spans,
+            "counters": counters,
+            "llm": {
+                "calls": len(latency),
+                "latency_p50_ms": round(percentile(latency, 50) * 1000, 1),
+                "latency_p95_ms": round(percentile(latency, 95) * 1000, 1),
+                "prompt_tokens": int(sum(samples.get("llm.prompt_tokens", []))),
+                "output_tokens": int(sum(samples.get("llm.output_tokens", []))),
+                "cache_hit_rate": round(counters.get("cache.hit", 0) / lookups, 3) if lookups else 0.0,
+                "fallback_rate": round(counters.get("fallback", 0) / functions, 3) if functions else 0.0,
+                "retries": int(counters.get("llm.retries", 0)),
+                "throttle_s": round(sum(samples.get("throttle_seconds", [])), 3),
+            },
+            "prompts": {
+                "count": len(prompt_tokens),
+                "tokens_total": int(sum(prompt_tokens)),
+                "tokens_p50": int(percentile(prompt_tokens, 50)),
+                "tokens_p95": int(percentile(prompt_tokens, 95)),
+                "tokens_max": int(max(prompt_tokens, default=0)),
+                # Share of prompt tokens in the static preamble, i.e. reusable by prefix caching
+                "preamble_share": round(sum(samples.get("prompt.preamble_tokens", [])) / sum(prompt_tokens), 3) if prompt_tokens else 0.0,
+                "trimmed": int(counters.get("prompt.trimmed", 0)),
+                "over_budget": int(counters.get("prompt.over_budget", 0)),
+            },
+        }
+
+    def write_trace(self, path: str):
+        with self._lock:
+            events = list(self.events)
+        payload = {"traceEvents": events, "displayTimeUnit": "ms", "summary": self.summary()}
+        Path(path).write_text(json.dumps(payload, indent=1), encoding="utf-8")
+
+_current: NullTelemetry = NullTelemetry()
+
+def get_telemetry() -> NullTelemetry:
+    return _current
+
+def set_telemetry(telemetry: Optional[NullTelemetry]) -> NullTelemetry:
+    """Install a telemetry sink (None restores the no-op default); returns the previous one."""
+    global _current
+    previous = _current
+    _current = telemetry or NullTelemetry()
+    return previous
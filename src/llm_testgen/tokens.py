@@ -0,0 +1,55 @@
+from __future__ import annotations
+from typing import Callable, Optional
+
+TokenEstimator = Callable[[str], int]
+
+def heuristic_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+def tiktoken_estimator(encoding: str = "cl100k_base") -> TokenEstimator:
+    """Exact counts for OpenAI-style BPE vocabularies; raises ImportError without tiktoken."""
+    import tiktoken
+    enc = tiktoken.get_encoding(encoding)
+    return lambda text: len(enc.encode(text, disallowed_special=()))
+
+_estimator: TokenEstimator = heuristic_tokens
+
+def estimate_tokens(text: str) -> int:
+    return _estimator(text)
+
+def set_token_estimator(estimator: Optional[TokenEstimator]) -> TokenEstimator:
+    """Install a token counter (None restores the heuristic); returns the previous one."""
+    global _estimator
+    previous = _estimator
+    _estimator = estimator or heuristic_tokens
+    return previous
+
+def token_estimator(name: str) -> TokenEstimator:
+    """Estimator by name: 'heuristic' or 'tiktoken' (falls back to the heuristic if not installed)."""
+    if name == "tiktoken":
+        try:
+            return tiktoken_estimator()
+        except ImportError:
+            print("Warning: 'tiktoken' is not installed (pip install tiktoken); using the heuristic token estimate.")
+    return heuristic_tokens
+
+def truncate_to_tokens(text: str, budget: int, marker: str = " ...[truncated]") -> str:
+    """Cut text (at a word boundary where possible) so it fits in about budget tokens."""
+    if budget <= 0:
+        return ""
+    if estimate_tokens(text) <= budget:
+        return text
+    lo, hi = 0, len(text)
+    # Largest prefix that fits, found by bisection so any estimator works
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid] + marker) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    space = cut.rfind(" ")
+    if space > lo // 2:
+        cut = cut[:space]
+    return cut.rstrip() + marker
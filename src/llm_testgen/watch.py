@@ -0,0 +1,310 @@
+from __future__ import annotations
+import json
+import os
+import queue
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from .ast_extract import ALL_FUNCTIONS, FunctionFilter, FunctionInfo, _iter_source_files, iter_python_functions, scan_file
+from .generator import write_tests
+from .llm_provider import LLMProvider
+from .prompts import PromptConfig
+from .requirements import requirement_index
+
+# Written to the output dir while a watcher runs; tells clients where to connect
+ENDPOINT_NAME = ".llm_testgen_watch.json"
+
+class Watcher:
+    """Long-running generator: keeps the function index, design doc and provider warm.
+
+    The source tree is polled for changed *.py files (stat only; unchanged files are
+    never reopened). A burst of saves is debounced into one regeneration that re-parses
+    just the changed files and rewrites just their modules' tests, reusing every other
+    function's output from the manifest. Clients talk to it over a local socket (see
+    request()); every regeneration records the latency from file save to written test.
+    """
+
+    def __init__(self, src_dir: str, out_dir: str, design_path: Optional[str] = None, framework: str = "pytest",
+                 provider: Optional[LLMProvider] = None, jobs: int = 4, select: Optional[FunctionFilter] = None,
+                 prompt_config: Optional[PromptConfig] = None, interval: float = 0.5, debounce: float = 0.2,
+                 workers: Optional[int] = None, parse_cache: Optional[str] = None):
+        self.src_dir = src_dir
+        self.out_dir = out_dir
+        self.design_path = design_path
+        self.framework = framework
+        self.provider = provider or LLMProvider()
+        self.jobs = jobs
+        self.select = select or FunctionFilter()
+        self.prompt_config = prompt_config
+        self.interval = interval
+        self.debounce = debounce
+        self.workers = workers
+        self.parse_cache = parse_cache
+        # rel path -> (mtime_ns, size) and its functions (unfiltered, as parsed)
+        self.stamps: Dict[str, Tuple[int, int]] = {}
+        self.index: Dict[str, List[FunctionInfo]] = {}
+        self.design_text: Optional[str] = None
+        self.design_stamp: Optional[Tuple[int, int]] = None
+        self.regenerations: List[Dict[str, Any]] = []
+        self._requests: "queue.Queue[Tuple[dict, queue.Queue]]" = queue.Queue()
+        self._stop = threading.Event()
+        self._server = None
+        self._socket_dir: Optional[str] = None
+
+    # -- state -----------------------------------------------------------------
+
+    def _stat_tree(self) -> Dict[str, Tuple[int, int]]:
+        stamps = {}
+        for path, rel in _iter_source_files(Path(self.src_dir)):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stamps[rel] = (st.st_mtime_ns, st.st_size)
+        return stamps
+
+    def _design_stamp(self) -> Optional[Tuple[int, int]]:
+        if not self.design_path:
+            return None
+        try:
+            st = os.stat(self.design_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load_design(self):
+        self.design_stamp = self._design_stamp()
+        self.design_text = None
+        if self.design_stamp is not None:
+            self.design_text = Path(self.design_path).read_text(encoding="utf-8")
+            requirement_index(self.design_text)  # built once, shared by every regeneration
+
+    def _snapshot(self) -> Tuple[Dict[str, Tuple[int, int]], Optional[Tuple[int, int]]]:
+        return self._stat_tree(), self._design_stamp()
+
+    def _diff(self, snapshot) -> Tuple[Set[str], bool]:
+        """Source files added, modified or deleted since the last regeneration; whether the design doc changed."""
+        stamps, design = snapshot
+        changed = {rel for rel in stamps.keys() | self.stamps.keys() if stamps.get(rel) != self.stamps.get(rel)}
+        return changed, design != self.design_stamp
+
+    @staticmethod
+    def _module(rel: str) -> str:
+        return rel.replace("/", ".").removesuffix(".py")
+
+    # -- regeneration ----------------------------------------------------------
+
+    def regenerate(self, changed: Optional[Iterable[str]] = None, design_changed: bool = False, measure: bool = False) -> Dict[str, Any]:
+        """Re-parse changed files (rescan everything if None) and rewrite the affected modules' tests.
+
+        With measure, the run records the latency from the earliest save among the changed files.
+        """
+        start = time.time()
+        full = changed is None
+        if full or design_changed:
+            self._load_design()
+        saved = []
+        if full:
+            # Stat first: a file saved during the scan is picked up again by the next poll
+            self.stamps = self._stat_tree()
+            self.index = {}
+            for fn in iter_python_functions(self.src_dir, workers=self.workers, cache_path=self.parse_cache, select=ALL_FUNCTIONS):
+                self.index.setdefault(fn.rel_path, []).append(fn)
+            changed = set(self.stamps)
+        else:
+            changed = set(changed)
+            for rel in sorted(changed):
+                try:
+                    st = os.stat(os.path.join(self.src_dir, rel))
+                except OSError:  # deleted: its tests are removed below
+                    self.stamps.pop(rel, None)
+                    self.index.pop(rel, None)
+                    continue
+                self.stamps[rel] = (st.st_mtime_ns, st.st_size)
+                self.index[rel] = scan_file(self.src_dir, rel) or []
+                saved.append(st.st_mtime_ns / 1e9)
+        # A new design doc can relink any function; the manifest still reuses unchanged ones
+        rels = sorted(set(self.stamps) | changed) if full or design_changed else sorted(changed)
+        funcs = [fn for rel in rels for fn in self.index.get(rel, ()) if self.select(fn)]
+        files = write_tests(funcs, self.out_dir, self.src_dir, self.design_text, framework=self.framework,
+                            jobs=self.jobs, provider=self.provider, incremental=True, prompt_config=self.prompt_config,
+                            scope=[self._module(rel) for rel in rels])
+        done = time.time()
+        run = {
+            "full": full,
+            "changed": sorted(changed),
+            "design_changed": full or design_changed,
+            "files": files,
+            "functions": len(funcs),
+            "duration_ms": round((done - start) * 1000, 1),
+            # From the earliest save in the burst to the last test file written
+            "save_to_test_ms": round((done - min(saved)) * 1000, 1) if measure and saved else None,
+        }
+        self.regenerations.append(run)
+        return run
+
+    def status(self) -> Dict[str, Any]:
+        latencies = sorted(r["save_to_test_ms"] for r in self.regenerations if r["save_to_test_ms"] is not None)
+        return {
+            "src": self.src_dir,
+            "out": self.out_dir,
+            "files": len(self.stamps),
+            "functions": sum(len(funcs) for funcs in self.index.values()),
+            "regenerations": len(self.regenerations),
+            "last": self.regenerations[-1] if self.regenerations else None,
+            "save_to_test_ms": {
+                "last": self.regenerations[-1]["save_to_test_ms"] if self.regenerations else None,
+                "p50": latencies[len(latencies) // 2] if latencies else None,
+                "max": latencies[-1] if latencies else None,
+            },
+        }
+
+    def _handle(self, message: dict) -> Dict[str, Any]:
+        cmd = message.get("cmd")
+        if cmd == "status":
+            return self.status()
+        if cmd == "functions":
+            module = message.get("module")
+            return {"functions": [f"{fn.module}:{fn.qualname}" for rel in sorted(self.index) for fn in self.index[rel]
+                                  if self.select(fn) and (module is None or fn.module == module)]}
+        if cmd == "regenerate":
+            paths = message.get("paths")
+            return self.regenerate(set(paths) if paths else None)
+        if cmd == "stop":
+            self._stop.set()
+            return {"stopping": True}
+        return {"error": f"unknown command {cmd!r}"}
+
+    # -- loop ------------------------------------------------------------------
+
+    def stop(self):
+        self._stop.set()
+
+    def serve(self, on_run=print):
+        """Initial full pass, then poll and serve requests until stopped."""
+        self._start_server()
+        try:
+            on_run(self._summary(self.regenerate()))
+            while not self._stop.is_set():
+                self._serve_requests(self.interval)
+                snapshot = self._snapshot()
+                if not any(self._diff(snapshot)):
+                    continue
+                # Debounce: wait until the tree has been quiet for self.debounce seconds
+                while not self._stop.is_set():
+                    self._serve_requests(self.debounce)
+                    latest = self._snapshot()
+                    if latest == snapshot:
+                        break
+                    snapshot = latest
+                changed, design_changed = self._diff(snapshot)
+                on_run(self._summary(self.regenerate(changed, design_changed, measure=True)))
+        finally:
+            self._stop_server()
+            while not self._requests.empty():
+                self._requests.get_nowait()[1].put({"error": "watcher stopped"})
+
+    def _serve_requests(self, timeout: float):
+        """Run client requests on the watcher's own thread, waiting up to timeout for one."""
+        deadline = time.monotonic() + timeout
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                message, reply = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                return
+            try:
+                reply.put(self._handle(message))
+            except Exception as e:
+                reply.put({"error": str(e)})
+
+    @staticmethod
+    def _summary(run: Dict[str, Any]) -> str:
+        latency = f", save to test {run['save_to_test_ms']:.0f} ms" if run["save_to_test_ms"] is not None else ""
+        what = f"full pass over {len(run['changed'])} file(s)" if run["full"] else f"{len(run['changed'])} file(s) changed"
+        return f"[watch] {what} -> {run['files']} test file(s) in {run['duration_ms']:.0f} ms{latency}"
+
+    # -- control socket --------------------------------------------------------
+
+    def _start_server(self):
+        watcher = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    response = {"error": "invalid request"}
+                else:
+                    reply: "queue.Queue[dict]" = queue.Queue()
+                    watcher._requests.put((message, reply))
+                    response = reply.get()
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+        Path(self.out_dir).mkdir(parents=True, exist_ok=True)
+        endpoint = Path(self.out_dir) / ENDPOINT_NAME
+        if hasattr(socket, "AF_UNIX"):
+            # mkdtemp makes a 0700 directory, so the socket is private to the owner from the
+            # moment it is bound; a short temp path also stays under the ~100 byte limit
+            self._socket_dir = tempfile.mkdtemp(prefix="llm-testgen-")
+            address = os.path.join(self._socket_dir, "watch.sock")
+            self._server = socketserver.ThreadingUnixStreamServer(address, Handler)
+            info = {"unix": address}
+        else:
+            self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+            info = {"tcp": list(self._server.server_address)}
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        endpoint.write_text(json.dumps(dict(info, pid=os.getpid())), encoding="utf-8")
+
+    def _stop_server(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        if self._socket_dir is not None:
+            Path(self._socket_dir, "watch.sock").unlink(missing_ok=True)
+            os.rmdir(self._socket_dir)
+            self._socket_dir = None
+        (Path(self.out_dir) / ENDPOINT_NAME).unlink(missing_ok=True)
+        self._server = None
+
+def _endpoint(out_dir: str) -> Optional[dict]:
+    try:
+        return json.loads((Path(out_dir) / ENDPOINT_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def request(out_dir: str, message: dict, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Send one command to the watcher serving out_dir and return its JSON reply.
+
+    Commands: status, functions (optional module), regenerate (optional src-relative
+    paths, all files if omitted), stop.
+    """
+    info = _endpoint(out_dir)
+    if info is None:
+        raise ConnectionError(f"no watcher is running for {out_dir}")
+    if "unix" in info:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address: Any = info["unix"]
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = tuple(info["tcp"])
+    with sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from .manifest import MANIFEST_NAME, Manifest, Skeleton, function_entry
+from .writer import CONFTEST_NAME, OutputWriter, conftest_source, join_tests
+
+RUN_DIR_NAME = ".llm_testgen_run"
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse 'i/N' (0-based shard index i of N shards)."""
+    try:
+        index, total = (int(part) for part in spec.split("/", 1))
+    except ValueError:
+        raise ValueError(f"invalid shard '{spec}', expected i/N")
+    if total < 1 or not 0 <= index < total:
+        raise ValueError(f"invalid shard '{spec}', need 0 <= i < N")
+    return index, total
+
+def task_id(module: str, qualname: str) -> str:
+    return hashlib.sha256(f"{module}:{qualname}".encode("utf-8")).hexdigest()[:20]
+
+class WorkQueue:
+    """Durable on-disk queue of (module, function) generation tasks.
+
+    Layout of the run directory:
+      run.json          run parameters (framework, source dir, shard)
+      tasks.jsonl       every task this shard owns in the current attempt, appended as
+                        the scan discovers it (rewritten on every start, resumed or not)
+      results/<id>.json checkpointed output of each finished task (written atomically)
+
+    A killed run keeps every finished result; ``resume=True`` reuses those whose
+    fingerprint still matches. merge() only takes results listed in tasks.jsonl, so
+    checkpoints of functions that changed or disappeared since are left out. Tasks
+    are assigned to shards by a hash of the task id, so every node computes the same
+    split without coordination. Only these files are ever deleted from the run dir.
+    """
+
+    def __init__(self, run_dir: str, shard: Tuple[int, int] = (0, 1)):
+        self.root = Path(run_dir)
+        self.results = self.root / "results"
+        self.shard = shard
+        self.enqueued = 0
+        self.resumed = 0
+        self._lock = threading.Lock()
+        self._tasks = None
+
+    @property
+    def sharded(self) -> bool:
+        return self.shard[1] > 1
+
+    def owns(self, module: str, qualname: str) -> bool:
+        index, total = self.shard
+        return int(task_id(module, qualname), 16) % total == index
+
+    def start(self, resume: bool, **meta):
+        if not resume:
+            # The run dir may be user-chosen: remove only what the queue writes
+            shutil.rmtree(self.results, ignore_errors=True)
+            (self.root / "run.json").unlink(missing_ok=True)
+        self.results.mkdir(parents=True, exist_ok=True)
+        (self.root / "run.json").write_text(json.dumps(dict(meta, shard=list(self.shard))), encoding="utf-8")
+        self._tasks = (self.root / "tasks.jsonl").open("w", encoding="utf-8")
+
+    def enqueue(self, module: str, qualname: str, index: int, fingerprint: str, file: str) -> dict:
+        task = {"id": task_id(module, qualname), "module": module, "qualname": qualname,
+                "index": index, "fingerprint": fingerprint, "file": file}
+        with self._lock:
+            self._tasks.write(json.dumps(task) + "\n")
+            self._tasks.flush()
+            self.enqueued += 1
+        return task
+
+    def completed(self, task: dict, fallback: bool = True) -> Optional[str]:
+        """Checkpointed output for task if it finished in an earlier attempt with the same fingerprint.
+
+        fallback=False skips checkpointed rule-based skeletons.
+        """
+        try:
+            result = json.loads((self.results / f"{task['id']}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if result.get("fingerprint") != task["fingerprint"] or (result.get("fallback") and not fallback):
+            return None
+        with self._lock:
+            self.resumed += 1
+        return Skeleton(result.get("output")) if result.get("fallback") else result.get("output")
+
+    def record(self, task: dict, output: str):
+        path = self.results / f"{task['id']}.json"
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(dict(task, **function_entry(task["fingerprint"], output))), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def close(self):
+        if self._tasks is not None:
+            self._tasks.close()
+            self._tasks = None
+
+def _load_tasks(run_dir: Path) -> Optional[Dict[str, str]]:
+    """Task id -> fingerprint from tasks.jsonl, or None if the run dir has none."""
+    try:
+        lines = (run_dir / "tasks.jsonl").read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+    tasks = {}
+    for line in lines:
+        try:
+            task = json.loads(line)
+        except ValueError:
+            continue  # torn final line of a killed run
+        tasks[task["id"]] = task["fingerprint"]
+    return tasks
+
+def load_results(run_dirs: Iterable[str]) -> Dict[str, List[dict]]:
+    """Checkpointed results of each run dir's current tasks, grouped by module in function order."""
+    by_module: Dict[str, Dict[str, dict]] = {}
+    for run_dir in run_dirs:
+        tasks = _load_tasks(Path(run_dir))
+        for path in sorted((Path(run_dir) / "results").glob("*.json")):
+            try:
+                result = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            if tasks is not None and tasks.get(result.get("id")) != result.get("fingerprint"):
+                continue  # left over from an earlier attempt
+            by_module.setdefault(result["module"], {})[result["qualname"]] = result
+    return {
+        module: sorted(results.values(), key=lambda r: r["index"])
+        for module, results in sorted(by_module.items())
+    }
+
+def merge(run_dirs: Iterable[str], out_dir: str) -> int:
+    """Assemble test files (and the incremental manifest) from shard checkpoints."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(out / MANIFEST_NAME)
+    writer = OutputWriter(out_dir)
+    run_dirs = list(run_dirs)
+    try:
+        meta = json.loads((Path(run_dirs[0]) / "run.json").read_text(encoding="utf-8"))
+    except (IndexError, OSError, ValueError):
+        meta = {}
+    framework = meta.get("framework", "pytest")
+    if framework == "pytest" and meta.get("src_dir"):
+        writer.write(CONFTEST_NAME, conftest_source(out_dir, meta["src_dir"]))
+    count = 0
+    for module, results in load_results(run_dirs).items():
+        file = results[0]["file"]
+        writer.write(file, join_tests((r["output"] for r in results), framework))
+        manifest.modules[module] = {
+            "file": file,
+            "functions": {r["qualname"]: {"fingerprint": r["fingerprint"], "output": r["output"],
+                                          "fallback": r.get("fallback", False)} for r in results},
+        }
+        count += 1
+    manifest.save()
+    return count
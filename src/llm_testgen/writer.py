@@ -0,0 +1,177 @@
+from __future__ import annotations
+import ast
+import hashlib
+import os
+import re
+import stat
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Set
+
+CONFTEST_NAME = "conftest.py"
+
+CONFTEST_PY = """# Generated by llm-testgen: makes the sources importable for every test file below.
+import os
+import sys
+
+SRC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), {src!r}))
+if SRC_PATH not in sys.path:
+    sys.path.insert(0, SRC_PATH)
+"""
+
+def conftest_source(out_dir: str, src_dir: str) -> str:
+    """conftest.py for the root of a generated pytest tree, adding src_dir to sys.path once."""
+    try:
+        src = os.path.relpath(Path(src_dir).resolve(), Path(out_dir).resolve())
+    except ValueError:  # different drives on Windows
+        src = str(Path(src_dir).resolve())
+    return CONFTEST_PY.format(src=src.replace(os.sep, "/"))
+
+def test_file_path(module: str, ext: str = "py") -> str:
+    """Output path of a module's tests, mirroring the package layout: a.b_c -> a/test_a__b_c.py.
+
+    The basename spells out the whole module, so files in different packages do not share
+    one (pytest's default import mode rejects duplicates). Parts are joined with '__',
+    which can be split again unless a part has a leading, trailing or double underscore
+    itself; those modules (a.__init__, a._impl) get a hash of the name after '___'.
+    """
+    parts = module.split(".")
+    stem = "__".join(parts)
+    if any(part.startswith("_") or part.endswith("_") or "__" in part for part in parts):
+        stem += "___" + hashlib.sha256(module.encode("utf-8")).hexdigest()[:8]
+    return "/".join(parts[:-1] + [f"test_{stem}.{ext}"])
+
+class OutputWriter:
+    """Writes generated files atomically (temp file + rename) and skips unchanged content.
+
+    Untouched files keep their mtime, so pytest caches, file watchers and build tools
+    only see files whose content actually changed.
+    """
+
+    def __init__(self, out_dir: str):
+        self.root = Path(out_dir)
+        self.written = 0
+        self.unchanged = 0
+        self.removed = 0
+        self._dirs: Set[Path] = set()
+        self._lock = threading.Lock()
+
+    def _ensure_dir(self, path: Path):
+        # Each directory is created once per run, however many files land in it
+        if path not in self._dirs:
+            path.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                self._dirs.add(path)
+
+    def write(self, rel: str, content: str) -> bool:
+        """Write content to rel under the output dir; returns False if it was already there."""
+        path = self.root / rel
+        data = content.encode("utf-8")
+        mode = None
+        try:
+            st = path.stat()
+            mode = stat.S_IMODE(st.st_mode)
+            if st.st_size == len(data) and _digest(path.read_bytes()) == _digest(data):
+                with self._lock:
+                    self.unchanged += 1
+                return False
+        except OSError:
+            pass
+        self._ensure_dir(path.parent)
+        # New files get the mode open() would give them (the kernel applies the umask);
+        # replaced files keep theirs
+        tmp = path.parent / f".{path.name}.{os.urandom(6).hex()}.tmp"
+        fd = os.open(tmp, os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0), 0o666)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            if mode is not None:
+                os.chmod(tmp, mode)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self.written += 1
+        return True
+
+    def remove(self, rel: str):
+        """Delete a stale file, then any directories it leaves empty."""
+        path = self.root / rel
+        if not path.exists():
+            return
+        path.unlink()
+        with self._lock:
+            self.removed += 1
+        parent = path.parent
+        root = self.root.resolve()
+        while parent.resolve() != root:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            self._dirs.discard(parent)
+            parent = parent.parent
+
+    def stats(self) -> Dict[str, int]:
+        return {"written": self.written, "unchanged": self.unchanged, "removed": self.removed}
+
+def join_tests(outputs: Iterable[str], framework: str) -> str:
+    """Content of one module's test file from its functions' outputs."""
+    if framework == "pytest":
+        return merge_python_tests(outputs)
+    return "\n\n".join(outputs)
+
+def merge_python_tests(chunks: Iterable[str]) -> str:
+    """Join per-function pytest code into one module with a single, de-duplicated import block.
+
+    Top-level imports are hoisted in first-seen order (__future__ first). Per-file sys.path
+    setup is dropped, conftest.py does it once for the tree. Chunks that do not parse are
+    kept verbatim.
+    """
+    futures: Dict[str, None] = {}
+    imports: Dict[str, None] = {}
+    bodies = []
+    for chunk in chunks:
+        try:
+            tree = ast.parse(chunk)
+        except SyntaxError:
+            bodies.append(chunk.strip("\n"))
+            continue
+        starts = [node.lineno for node in tree.body]
+        drop = set()
+        for node in tree.body:
+            hoist = isinstance(node, (ast.Import, ast.ImportFrom))
+            if not (hoist or _is_path_setup(node)):
+                continue
+            span = range(node.lineno, node.end_lineno + 1)
+            if starts.count(node.lineno) > 1 or any(line in span for line in starts if line != node.lineno):
+                continue  # shares a line with another statement
+            if hoist:
+                future = isinstance(node, ast.ImportFrom) and node.module == "__future__"
+                (futures if future else imports).setdefault(ast.unparse(node))
+            drop.update(span)
+        lines = chunk.splitlines()
+        body = "\n".join(line for i, line in enumerate(lines, 1)
+                         if i not in drop and line.strip() != _PATH_SETUP_COMMENT)
+        body = re.sub(r"\n{3,}", "\n\n", body).strip("\n")
+        if body:
+            bodies.append(body)
+    header = "\n".join([*futures, *imports])
+    return "\n\n\n".join(part for part in [header, *bodies] if part) + "\n"
+
+# Left behind by skeletons that carried their own sys.path setup
+_PATH_SETUP_COMMENT = "# Add source directory to sys.path so we can import the module"
+
+def _is_path_setup(node: ast.stmt) -> bool:
+    """sys.path.insert/append calls, 'if p not in sys.path:' guards around them, and src_path = ..."""
+    if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+        return re.fullmatch(r"sys\.path\.(insert|append)", ast.unparse(node.value.func)) is not None
+    if isinstance(node, ast.If):
+        return not node.orelse and "sys.path" in ast.unparse(node.test) and all(map(_is_path_setup, node.body))
+    if isinstance(node, ast.Assign):
+        return [ast.unparse(t) for t in node.targets] == ["src_path"]
+    return False
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
@@ -0,0 +1,19 @@
+from typing import Callable, List
+
+import pytest
+
+from llm_testgen.ast_extract import FunctionInfo
+
+
+def _make_funcs(n_modules: int, per_module: int) -> List[FunctionInfo]:
+    return [
+        FunctionInfo(module=f"mod{m}", qualname=f"f{m}_{i}", name=f"f{m}_{i}", args=[], annotations={},
+                     returns=None, docstring=None, rel_path=f"mod{m}.py")
+        for m in range(n_modules) for i in range(per_module)
+    ]
+
+
+@pytest.fixture
+def make_funcs() -> Callable[[int, int], List[FunctionInfo]]:
+    """Factory of synthetic argument-less functions f<m>_<i> in modules mod<m>."""
+    return _make_funcs
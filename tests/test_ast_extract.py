@@ -0,0 +1,133 @@
+from pathlib import Path
+import os
+
+from llm_testgen import ast_extract
+from llm_testgen.ast_extract import iter_python_functions, scan_python_functions
+
+
+def _write_tree(root: Path, n: int):
+    for i in range(n):
+        (root / f"m{i:02d}.py").write_text(f"def f{i}(x: int) -> int:\n    return x + {i}\n", encoding="utf-8")
+    (root / ".hidden").mkdir()
+    (root / ".hidden" / "skip.py").write_text("def nope(): pass\n", encoding="utf-8")
+
+
+def test_parallel_scan_matches_serial(tmp_path: Path, monkeypatch):
+    _write_tree(tmp_path, 12)
+    monkeypatch.setattr(ast_extract, "_PARALLEL_THRESHOLD", 1)
+    serial = scan_python_functions(str(tmp_path), workers=1)
+    parallel = scan_python_functions(str(tmp_path), workers=2)
+    assert serial == parallel
+    assert [f.name for f in serial] == [f"f{i}" for i in range(12)]
+
+
+def test_parse_cache_skips_unchanged_files(tmp_path: Path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    _write_tree(src, 3)
+    cache = str(tmp_path / "parse.sqlite")
+    first = scan_python_functions(str(src), workers=1, cache_path=cache)
+
+    parsed = []
+    real = ast_extract._parse_file
+    monkeypatch.setattr(ast_extract, "_parse_file", lambda task: parsed.append(task[1]) or real(task))
+
+    assert scan_python_functions(str(src), workers=1, cache_path=cache) == first
+    assert parsed == []
+
+    # Touched but identical content: read and hashed, cached functions reused
+    os.utime(src / "m00.py", (1, 1))
+    (src / "m01.py").write_text("def changed():\n    return 1\n", encoding="utf-8")
+    funcs = list(iter_python_functions(str(src), workers=1, cache_path=cache))
+    assert sorted(parsed) == ["m00.py", "m01.py"]
+    assert [f.name for f in funcs] == ["f0", "changed", "f2"]
+
+
+def test_parse_cache_is_written_as_the_scan_streams(tmp_path: Path):
+    src = tmp_path / "src"
+    src.mkdir()
+    _write_tree(src, 3)
+    cache = tmp_path / "parse.sqlite"
+    cache.write_bytes(b"an older pickle cache")
+
+    # A scan stopped after the first file keeps that file's entry
+    scan = iter_python_functions(str(src), workers=1, cache_path=str(cache))
+    assert next(scan).name == "f0"
+    scan.close()
+    entries = ast_extract.ParseCache(str(cache))
+    assert entries.stat("m00.py") is not None and entries.stat("m01.py") is None
+    assert [fn.name for fn in entries.get("m00.py")] == ["f0"]
+    entries.close()
+
+    assert len(scan_python_functions(str(src), workers=1, cache_path=str(cache))) == 3
+    (src / "m02.py").unlink()
+    assert [fn.name for fn in scan_python_functions(str(src), workers=1, cache_path=str(cache))] == ["f0", "f1"]
+    entries = ast_extract.ParseCache(str(cache))
+    assert entries.stat("m02.py") is None
+    entries.close()
+
+
+SIGNATURES = '''
+import functools
+
+
+@functools.lru_cache(maxsize=None)
+def plain(a, /, b: int, c=3, *rest, key: str, flag: bool = False, **extra) -> int:
+    def helper():
+        return 1
+    return helper()
+
+
+async def fetch(url: str, *, retries: int, timeout: float = 1.0) -> bytes:
+    return b""
+
+
+def _private():
+    pass
+
+
+class Client:
+    def __init__(self, host: str):
+        self.host = host
+
+    @classmethod
+    def create(cls, host: str) -> "Client":
+        return cls(host)
+
+    def _retry(self):
+        pass
+'''
+
+
+def test_single_pass_captures_signatures_and_filters(tmp_path: Path):
+    (tmp_path / "net.py").write_text(SIGNATURES, encoding="utf-8")
+    everything = {f.qualname: f for f in scan_python_functions(str(tmp_path), select=ast_extract.ALL_FUNCTIONS)}
+    assert list(everything) == ["plain", "plain.<locals>.helper", "fetch", "_private",
+                                "Client.__init__", "Client.create", "Client._retry"]
+
+    plain = everything["plain"]
+    assert plain.args == ["a", "b", "c"] and plain.kwonly == ("key", "flag")
+    assert (plain.vararg, plain.kwarg) == ("rest", "extra")
+    assert plain.defaults == {"c": "3", "flag": "False"}
+    assert plain.decorators == ("functools.lru_cache(maxsize=None)",)
+    assert (plain.lineno, plain.end_lineno) == (6, 9)
+    assert plain.signature() == "plain(a, b: int, c=3, *rest, key: str, flag: bool = False, **extra) -> int"
+    assert everything["plain.<locals>.helper"].nested
+    fetch = everything["fetch"]
+    assert fetch.is_async and fetch.signature() == "async fetch(url: str, *, retries: int, timeout: float = 1.0) -> bytes"
+    assert everything["Client.create"].call_args() == ["host"]
+
+    default = [f.qualname for f in scan_python_functions(str(tmp_path))]
+    assert default == ["plain", "fetch", "Client.create"]
+    narrowed = ast_extract.FunctionFilter(dunder=True, include=("net:Client.*",), exclude=("*.create",))
+    assert [f.qualname for f in scan_python_functions(str(tmp_path), select=narrowed)] == ["Client.__init__"]
+
+
+def test_skeleton_calls_async_and_keyword_only_targets(tmp_path: Path):
+    from llm_testgen.generator import rule_based_skeleton
+
+    (tmp_path / "net.py").write_text(SIGNATURES, encoding="utf-8")
+    fetch, create = [f for f in scan_python_functions(str(tmp_path)) if f.name in ("fetch", "create")]
+    code = rule_based_skeleton(fetch, ".", None, "pytest")
+    assert "import asyncio" in code and "result = asyncio.run(fetch('x', retries=1))" in code
+    assert "result = obj.create('x')" in rule_based_skeleton(create, ".", None, "pytest")
@@ -0,0 +1,48 @@
+from pathlib import Path
+import os
+import time
+
+from llm_testgen.cache import ResponseCache
+from llm_testgen.llm_provider import LLMProvider
+
+
+def test_cache_roundtrip_and_counters(tmp_path: Path):
+    cache = ResponseCache(str(tmp_path))
+    k1 = cache.key("openai", "gpt-4o", 0.2, "prompt")
+    assert k1 != cache.key("openai", "gpt-4o", 0.3, "prompt")
+    assert k1 != cache.key("google", "gpt-4o", 0.2, "prompt")
+
+    assert cache.get(k1) is None
+    cache.put(k1, "def test_x(): pass")
+    assert cache.get(k1) == "def test_x(): pass"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    assert (tmp_path / k1[:2] / f"{k1}.json").exists()
+
+
+def test_cache_eviction_by_age_and_size(tmp_path: Path):
+    cache = ResponseCache(str(tmp_path), max_bytes=None, max_age=60)
+    keys = [cache.key("p", "m", 0, str(i)) for i in range(4)]
+    for i, k in enumerate(keys):
+        cache.put(k, "x" * 100)
+        os.utime(cache._path(k), (time.time() - 10 * (4 - i),) * 2)
+    os.utime(cache._path(keys[0]), (time.time() - 120,) * 2)
+
+    assert cache.get(keys[0]) is None  # idle too long
+    cache.max_bytes = sum(cache._path(k).stat().st_size for k in keys[2:])
+    assert cache.evict() == 1
+    # keys[1] was the least recently used survivor
+    assert not cache._path(keys[1]).exists()
+    assert cache._path(keys[2]).exists() and cache._path(keys[3]).exists()
+
+
+def test_provider_uses_cache(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    calls = []
+    provider = LLMProvider(cache=ResponseCache(str(tmp_path)))
+    monkeypatch.setattr(provider, "_dispatch", lambda prompt: calls.append(prompt) or "code")
+
+    assert provider.generate("p1") == "code"
+    assert provider.generate("p1") == "code"
+    assert provider.generate("p2") == "code"
+    assert calls == ["p1", "p2"]
+    assert provider.cache.hits == 1
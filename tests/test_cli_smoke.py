@@ -13,3 +13,15 @@ def test_generate_and_evaluate(tmp_path: Path):
     r2 = subprocess.run([sys.executable, "-m", "llm_testgen.cli", "evaluate", "--tests", str(out), "--out", str(tmp_path / "metrics.json")])
     assert r2.returncode == 0
     assert (tmp_path / "metrics.json").exists()
+
+def test_parse_cache_is_per_source_tree(tmp_path: Path):
+    cache_dir = tmp_path / "cache"
+    for tree in ("a", "b"):
+        src = tmp_path / tree
+        src.mkdir()
+        (src / "util.py").write_text(f"def {tree}_one(x: int) -> int:\n    return x + 1\n", encoding="utf-8")
+        r = subprocess.run([sys.executable, "-m", "llm_testgen.cli", "generate", "--src", str(src),
+                            "--out", str(tmp_path / f"out_{tree}"), "--cache-dir", str(cache_dir)])
+        assert r.returncode == 0
+        assert f"{tree}_one" in (tmp_path / f"out_{tree}" / "test_util.py").read_text(encoding="utf-8")
+    assert len(list(cache_dir.glob("parse_cache_*.sqlite"))) == 2
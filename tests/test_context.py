@@ -0,0 +1,71 @@
+from llm_testgen.ast_extract import FunctionInfo
+from llm_testgen.context import DesignContext, chunk_design
+from llm_testgen.prompts import PromptConfig, build_prompt, static_preamble
+from llm_testgen.telemetry import Telemetry, set_telemetry
+from llm_testgen.tokens import estimate_tokens, set_token_estimator, truncate_to_tokens
+
+
+def _doc(n_sections: int) -> str:
+    parts = ["# Design\n\nIntro paragraph about the service."]
+    for i in range(n_sections):
+        parts.append(f"## Section {i}\nThe billing engine computes invoice totals for batch {i}.")
+    parts.append("## REQ-900: parse_timestamp(value: str)\nAccepts ISO-8601 timestamps and rejects naive datetimes.")
+    return "\n\n".join(parts)
+
+
+def test_chunking_splits_long_sections():
+    text = "## Big\n\n" + "\n\n".join("word " * 50 for _ in range(10))
+    chunks = chunk_design(text, max_chars=600)
+    assert len(chunks) > 1 and all(len(c) <= 600 for c in chunks)
+
+
+def test_relevant_chunk_is_selected_within_budget():
+    ctx = DesignContext(_doc(200))
+    selected = ctx.select("parse_timestamp value str timestamps", k=3, token_budget=100)
+    assert "REQ-900" in selected
+    assert "billing" not in selected
+    assert len(selected) // 4 <= 100
+
+
+def test_prompt_includes_late_requirement_not_doc_head():
+    fn = FunctionInfo(module="m", qualname="compute_invoice_totals", name="compute_invoice_totals", args=["batch"],
+                      annotations={}, returns=None, docstring="Invoice totals for the billing engine.", rel_path="m.py")
+    prompt = build_prompt(fn, _doc(200), config=PromptConfig(context_k=2, context_tokens=200))
+    design = prompt.split("Design context (Requirements):\n", 1)[1]
+    assert design.count("## Section") == 2
+    assert "Intro paragraph" not in design
+
+
+def test_prompt_budget_trims_context_and_keeps_static_prefix():
+    doc = _doc(200) + "\n\n## REQ-901, REQ-902: compute_invoice_totals\n" + "Totals are rounded half-even. " * 400
+    fn = FunctionInfo(module="m", qualname="compute_invoice_totals", name="compute_invoice_totals", args=["batch"],
+                      annotations={}, returns=None, docstring="Invoice totals\n\n    for the billing engine.", rel_path="m.py")
+    telemetry = Telemetry()
+    previous = set_telemetry(telemetry)
+    try:
+        prompt = build_prompt(fn, doc, config=PromptConfig(max_prompt_tokens=800))
+        other = build_prompt(FunctionInfo(module="n", qualname="g", name="g", args=[], annotations={}, returns=None,
+                                          docstring=None, rel_path="n.py"), doc)
+    finally:
+        set_telemetry(previous)
+
+    assert estimate_tokens(prompt) <= 800
+    assert prompt.count("Totals are rounded") < 400 and "[truncated]" in prompt
+    assert prompt.count("## REQ-901, REQ-902") == 1  # two IDs sharing one section are quoted once
+    assert "- docstring: Invoice totals for the billing engine." in prompt
+    assert "- returns:" not in other and "- docstring:" not in other
+    preamble = static_preamble("pytest")
+    assert prompt.startswith(preamble) and other.startswith(preamble)
+    prompts = telemetry.summary()["prompts"]
+    assert prompts["count"] == 2 and prompts["trimmed"] == 1 and prompts["over_budget"] == 0
+    assert prompts["tokens_max"] == estimate_tokens(prompt)
+
+
+def test_token_estimator_is_pluggable():
+    previous = set_token_estimator(lambda text: len(text.split()))
+    try:
+        assert estimate_tokens("one two three") == 3
+        assert truncate_to_tokens("a b c d e f", 3, marker=" ...") == "a b ..."
+    finally:
+        set_token_estimator(previous)
+    assert estimate_tokens("one two three") == len("one two three") // 4 + 1
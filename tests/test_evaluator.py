@@ -0,0 +1,87 @@
+from pathlib import Path
+import json
+
+from llm_testgen.ast_extract import scan_python_functions
+from llm_testgen.evaluator import evaluate_dir, run_tests, write_report
+from llm_testgen.generator import write_tests
+from llm_testgen.robot_parser import parse_robot
+
+REPO = Path(__file__).resolve().parents[1]
+
+
+def test_run_generated_example_tests(tmp_path: Path):
+    src = REPO / "examples" / "src_project"
+    out = tmp_path / "tests_gen"
+    design = (REPO / "examples" / "design" / "requirements.md").read_text(encoding="utf-8")
+    write_tests(scan_python_functions(str(src)), str(out), str(src), design)
+
+    metrics = write_report(str(out), str(tmp_path / "metrics.json"), run=True, jobs=2)
+    run = metrics["run"]
+    assert run["tests_total"] == 6 and run["passed"] == 6
+    assert run["files"]["test_example_module.py"]["status"] == "passed"
+    assert all(c["duration"] >= 0 for c in run["slowest"])
+    assert json.loads((tmp_path / "metrics.json").read_text())["run"]["passed"] == 6
+
+
+def test_run_reports_failures_and_timeouts(tmp_path: Path):
+    (tmp_path / "test_mixed.py").write_text(
+        "import pytest\n\ndef test_ok():\n    pass\n\ndef test_bad():\n    assert False\n\n"
+        "@pytest.mark.skip\ndef test_skip():\n    pass\n", encoding="utf-8")
+    (tmp_path / "test_hang.py").write_text("import time\n\ndef test_hang():\n    time.sleep(30)\n", encoding="utf-8")
+
+    run = run_tests(str(tmp_path), jobs=2, timeout=3)
+    assert (run["passed"], run["failed"], run["skipped"]) == (1, 1, 1)
+    assert run["files"]["test_hang.py"]["status"] == "timeout"
+    assert run["files"]["test_mixed.py"]["status"] == "failed"
+
+
+ROBOT = """*** Settings ***
+Test Tags    REQ-9
+
+*** Test Cases ***
+Test add Basic
+    [Tags]    REQ-101
+    ...       smoke
+    ${r}=    add    1    1
+
+Test add Empty
+    [Documentation]    no steps
+"""
+
+
+def test_evaluate_dir_streams_records_caches_and_builds_matrix(tmp_path: Path):
+    tests = tmp_path / "tests"
+    (tests / "pkg").mkdir(parents=True)
+    (tests / "pkg" / "test_a.py").write_text(
+        "# REQ-ID: REQ-101\ndef test_a():\n    assert True\n\nclass TestB:\n    def test_b(self):\n        pass\n", encoding="utf-8")
+    (tests / "test_broken.py").write_text("def test_x(:\n", encoding="utf-8")
+    (tests / "test_suite.robot").write_text(ROBOT, encoding="utf-8")
+    (tests / "test_ok.robot").write_text(ROBOT.replace("Test add Empty\n    [Documentation]    no steps\n", ""), encoding="utf-8")
+    design = "## REQ-101: add(a, b)\n## REQ-102: sub(a, b)\n"
+    cache, records = str(tmp_path / "eval.sqlite"), tmp_path / "records.jsonl"
+
+    metrics = evaluate_dir(str(tests), cache_path=cache, records_path=str(records), design_text=design)
+    assert (metrics["files_total"], metrics["files_python"], metrics["files_robot"]) == (4, 2, 2)
+    assert metrics["compile_success"] == 2  # test_broken.py and the robot suite with an empty test fail
+    assert metrics["test_functions"] == 2 and metrics["robot_test_cases"] == 3
+    assert sorted(e["file"] for e in metrics["compile_errors"]) == ["test_broken.py", "test_suite.robot"]
+    assert "'Test add Empty' has no steps" in next(e for e in metrics["compile_errors"] if e["file"] == "test_suite.robot")["errors"][0]
+    assert metrics["req_ids"] == ["REQ-101", "REQ-9"]
+    assert metrics["requirements"]["matrix"] == {"REQ-101": ["pkg/test_a.py", "test_ok.robot", "test_suite.robot"], "REQ-102": []}
+    assert metrics["requirements"]["uncovered"] == ["REQ-102"] and metrics["requirements"]["unknown"] == ["REQ-9"]
+
+    lines = [json.loads(line) for line in records.read_text(encoding="utf-8").splitlines()]
+    assert [line["type"] for line in lines] == ["file"] * 4 + ["summary"]
+    assert [line["file"] for line in lines[:4]] == ["test_broken.py", "test_ok.robot", "test_suite.robot", "pkg/test_a.py"]
+    assert lines[-1]["compile_success"] == 2
+
+    # Second run: nothing is rescanned; a rewrite with identical content is only re-hashed
+    assert evaluate_dir(str(tests), cache_path=cache)["scan"]["cached"] == 4
+    (tests / "test_ok.robot").write_text((tests / "test_ok.robot").read_text(encoding="utf-8"), encoding="utf-8")
+    (tests / "test_broken.py").write_text("def test_x():\n    pass\n", encoding="utf-8")
+    again = evaluate_dir(str(tests), cache_path=cache)
+    assert (again["scan"]["scanned"], again["scan"]["cached"]) == (1, 3) and again["compile_success"] == 3
+
+def test_robot_empty_test_before_another_section_is_reported():
+    suite = parse_robot(ROBOT.replace("    [Documentation]    no steps\n", "") + "*** Keywords ***\nHelper\n    No Operation\n")
+    assert suite.errors == ["line 10: test 'Test add Empty' has no steps"] and not suite.valid
@@ -0,0 +1,371 @@
+from pathlib import Path
+import os
+import re
+import stat
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import pytest
+
+from llm_testgen.ast_extract import scan_python_functions
+from llm_testgen.evaluator import run_tests
+from llm_testgen.generator import write_tests
+from llm_testgen.manifest import Manifest
+from llm_testgen.prompts import PromptConfig, describe_target
+from llm_testgen.tokens import estimate_tokens
+from llm_testgen.workqueue import RUN_DIR_NAME, WorkQueue, merge
+from llm_testgen.writer import OutputWriter, merge_python_tests
+from llm_testgen.writer import test_file_path as output_path
+
+
+def _target(prompt: str) -> Tuple[str, str]:
+    """(module, function) of a single-target prompt."""
+    field = lambda key: prompt.split(f"- {key}: ", 1)[1].split("\n", 1)[0]
+    return field("module"), field("function")
+
+
+def passing_test(prompt: str) -> str:
+    return f"def test_{_target(prompt)[1]}():\n    assert True\n"
+
+
+class FakeProvider:
+    """Fake LLM provider: records prompts, answers with respond(prompt), tracks peak concurrency."""
+
+    provider = "fake"
+
+    def __init__(self, respond: Callable[[str], Optional[str]] = passing_test, delay: float = 0.0):
+        self.respond = respond
+        self.delay = delay
+        self.prompts = []
+        self.inflight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str):
+        with self._lock:
+            self.prompts.append(prompt)
+            self.inflight += 1
+            self.peak = max(self.peak, self.inflight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.inflight -= 1
+        return self.respond(prompt)
+
+
+def test_write_tests_concurrent_speedup_and_order(tmp_path: Path, make_funcs):
+    funcs = make_funcs(2, 6)
+
+    serial = FakeProvider(delay=0.05)
+    t0 = time.perf_counter()
+    write_tests(funcs, str(tmp_path / "serial"), str(tmp_path), jobs=1, provider=serial)
+    serial_time = time.perf_counter() - t0
+
+    parallel = FakeProvider(delay=0.05)
+    t0 = time.perf_counter()
+    write_tests(funcs, str(tmp_path / "parallel"), str(tmp_path), jobs=6, provider=parallel)
+    parallel_time = time.perf_counter() - t0
+
+    assert serial.peak == 1
+    assert 1 < parallel.peak <= 6
+    assert parallel_time < serial_time / 2
+
+    # Output is identical regardless of completion order
+    for name in ("test_mod0.py", "test_mod1.py"):
+        a = (tmp_path / "serial" / name).read_text(encoding="utf-8")
+        b = (tmp_path / "parallel" / name).read_text(encoding="utf-8")
+        assert a == b
+    text = (tmp_path / "parallel" / "test_mod0.py").read_text(encoding="utf-8")
+    positions = [text.index(f"def test_f0_{i}()") for i in range(6)]
+    assert positions == sorted(positions)
+
+
+def test_incremental_regenerates_only_changed(tmp_path: Path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.py").write_text("def f(x):\n    return x\n\ndef g(x):\n    return 2 * x\n", encoding="utf-8")
+    (src / "b.py").write_text("def h():\n    return 1\n", encoding="utf-8")
+    out = tmp_path / "out"
+
+    write_tests(scan_python_functions(str(src)), str(out), str(src), provider=FakeProvider(), incremental=True)
+    assert sorted(p.name for p in out.glob("test_*.py")) == ["test_a.py", "test_b.py"]
+
+    # Change one function body and delete a module
+    (src / "a.py").write_text("def f(x):\n    return x\n\ndef g(x):\n    return 3 * x\n", encoding="utf-8")
+    (src / "b.py").unlink()
+    provider = FakeProvider()
+    write_tests(scan_python_functions(str(src)), str(out), str(src), provider=provider, incremental=True)
+
+    assert len(provider.prompts) == 1 and "- function: g" in provider.prompts[0]
+    assert sorted(p.name for p in out.glob("test_*.py")) == ["test_a.py"]
+    text = (out / "test_a.py").read_text(encoding="utf-8")
+    assert "def test_f()" in text and "def test_g()" in text
+
+
+def test_incremental_regenerates_fallback_skeletons_and_prompt_changes(tmp_path: Path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.py").write_text("def f(x):\n    return x\n\ndef g(x):\n    return 2 * x\n", encoding="utf-8")
+    out = tmp_path / "out"
+
+    def run(fail=(), prompt_config=None):
+        provider = FakeProvider(lambda prompt: None if _target(prompt)[1] in fail else passing_test(prompt))
+        write_tests(scan_python_functions(str(src)), str(out), str(src), provider=provider, incremental=True,
+                    prompt_config=prompt_config)
+        return provider.prompts
+
+    # f's call fails, so it gets the rule-based skeleton; only that one is asked again
+    assert len(run(fail=["f"])) == 2
+    functions = Manifest.load(str(out)).modules["a"]["functions"]
+    assert functions["f"]["fallback"] and not functions["g"]["fallback"]
+    prompts = run()
+    assert len(prompts) == 1 and "- function: f" in prompts[0]
+    assert run() == []
+    assert len(run(prompt_config=PromptConfig(context_k=1))) == 2
+
+
+def batch_response(prompt: str) -> str:
+    """One section per target of a batched prompt; f0_1's section is broken."""
+    names = re.findall(r"^- function: (\w+)$", prompt, re.MULTILINE)
+    if len(names) == 1:
+        return f"def test_{names[0]}_single():\n    assert True\n"
+    return "\n".join(
+        f"### TEST {n}\n" + ("def broken(:\n" if n == "f0_1" else f"def test_{n}():\n    assert True\n")
+        for n in names
+    )
+
+
+def test_batched_generation_retries_bad_sections(tmp_path: Path, make_funcs):
+    provider = FakeProvider(batch_response)
+    budget = 3 * estimate_tokens(describe_target(make_funcs(1, 1)[0]))
+    write_tests(make_funcs(2, 4), str(tmp_path), str(tmp_path), provider=provider, batch_tokens=budget)
+
+    batched = [p for p in provider.prompts if "### TEST" in p]
+    # Two modules of four functions with a three-target budget -> 3 + 1 per module
+    assert [p.count("\n### TEST ") for p in batched] == [3, 3]
+    assert len(provider.prompts) == 2 + 2 + 1  # 2 batches, 2 single leftovers, 1 retry
+    text = (tmp_path / "test_mod0.py").read_text(encoding="utf-8")
+    assert "def test_f0_0()" in text and "def test_f0_1_single()" in text
+    assert "broken" not in text
+
+
+def test_resume_skips_checkpointed_functions(tmp_path: Path, make_funcs):
+    funcs = make_funcs(2, 3)
+    out = tmp_path / "out"
+    write_tests(funcs, str(out), str(tmp_path), provider=FakeProvider())
+    expected = {p.name: p.read_text(encoding="utf-8") for p in out.glob("test_*.py")}
+
+    # Simulate a run killed after four of six functions finished
+    results = sorted((out / RUN_DIR_NAME / "results").glob("*.json"))
+    assert len(results) == 6
+    for path in results[:2]:
+        path.unlink()
+    for p in out.glob("test_*.py"):
+        p.unlink()
+
+    provider = FakeProvider()
+    write_tests(funcs, str(out), str(tmp_path), provider=provider, resume=True)
+    assert len(provider.prompts) == 2
+    assert {p.name: p.read_text(encoding="utf-8") for p in out.glob("test_*.py")} == expected
+
+
+def test_shards_merge_to_unsharded_output(tmp_path: Path, make_funcs):
+    funcs = make_funcs(3, 5)
+    write_tests(funcs, str(tmp_path / "full"), str(tmp_path), provider=FakeProvider())
+
+    run_dirs = []
+    for i in range(3):
+        queue = WorkQueue(str(tmp_path / f"run{i}"), shard=(i, 3))
+        write_tests(funcs, str(tmp_path / "unused"), str(tmp_path), provider=FakeProvider(), queue=queue)
+        run_dirs.append(str(queue.root))
+    assert not list((tmp_path / "unused").glob("test_*.py"))
+
+    assert merge(run_dirs, str(tmp_path / "merged")) == 3
+    for name in ("test_mod0.py", "test_mod1.py", "test_mod2.py"):
+        assert (tmp_path / "merged" / name).read_text(encoding="utf-8") == (tmp_path / "full" / name).read_text(encoding="utf-8")
+    assert Manifest.load(str(tmp_path / "merged")).modules == Manifest.load(str(tmp_path / "full")).modules
+
+
+def test_run_dir_keeps_foreign_files_and_merge_drops_stale_results(tmp_path: Path, make_funcs):
+    run_dir = tmp_path / "run"
+    run_dir.mkdir()
+    (run_dir / "notes.txt").write_text("mine", encoding="utf-8")
+    funcs = make_funcs(1, 3)
+    for _ in range(2):
+        write_tests(funcs, str(tmp_path / "unused"), str(tmp_path), provider=FakeProvider(),
+                    queue=WorkQueue(str(run_dir)))
+    assert (run_dir / "notes.txt").read_text(encoding="utf-8") == "mine"
+
+    # Resumed after f0_0 was deleted: its checkpoint stays on disk but out of the merge
+    write_tests(funcs[1:], str(tmp_path / "unused"), str(tmp_path), provider=FakeProvider(),
+                queue=WorkQueue(str(run_dir)), resume=True)
+    assert len(list((run_dir / "results").glob("*.json"))) == 3
+    assert merge([str(run_dir)], str(tmp_path / "merged")) == 1
+    text = (tmp_path / "merged" / "test_mod0.py").read_text(encoding="utf-8")
+    assert "f0_1" in text and "f0_0" not in text
+
+
+def test_output_mirrors_packages_and_skips_unchanged(tmp_path: Path, capsys):
+    src = tmp_path / "src"
+    (src / "pkg" / "sub").mkdir(parents=True)
+    (src / "pkg" / "__init__.py").write_text("", encoding="utf-8")
+    (src / "pkg" / "sub" / "__init__.py").write_text("", encoding="utf-8")
+    (src / "pkg" / "sub" / "calc.py").write_text("def double(x: int) -> int:\n    return 2 * x\n", encoding="utf-8")
+    (src / "top.py").write_text("def one():\n    return 1\n", encoding="utf-8")
+    out = tmp_path / "out"
+
+    write_tests(scan_python_functions(str(src)), str(out), str(src), incremental=True)
+    assert "3 file(s) written, 0 unchanged, 0 removed" in capsys.readouterr().out  # + conftest.py
+    nested = out / "pkg" / "sub" / "test_pkg__sub__calc.py"
+    assert sorted(str(p.relative_to(out)) for p in out.rglob("test_*.py")) == ["pkg/sub/test_pkg__sub__calc.py", "test_top.py"]
+    # The root conftest.py makes the source tree importable from the nested directory
+    assert run_tests(str(out), jobs=1)["files"]["pkg/sub/test_pkg__sub__calc.py"]["status"] == "passed"
+
+    mtime = nested.stat().st_mtime_ns
+    write_tests(scan_python_functions(str(src)), str(out), str(src), incremental=True)
+    assert "0 file(s) written, 3 unchanged, 0 removed" in capsys.readouterr().out
+    assert nested.stat().st_mtime_ns == mtime
+
+    (src / "pkg" / "sub" / "calc.py").unlink()
+    write_tests(scan_python_functions(str(src)), str(out), str(src), incremental=True)
+    assert "0 file(s) written, 2 unchanged, 1 removed" in capsys.readouterr().out
+    assert not (out / "pkg").exists()
+    assert not list(out.rglob("*.tmp"))
+
+
+def importing_test(prompt: str) -> str:
+    """A real test that imports its target."""
+    module, name = _target(prompt)
+    return f"from {module} import {name}\n\n# REQ-ID: N/A\ndef test_{name}_doubles():\n    assert {name}(2) == 4\n"
+
+
+def test_structural_duplicates_share_one_llm_call(tmp_path: Path, capsys):
+    src = tmp_path / "src"
+    (src / "vendored").mkdir(parents=True)
+    (src / "vendored" / "__init__.py").write_text("", encoding="utf-8")
+    (src / "core.py").write_text('def double(x):\n    """Twice x."""\n    return x * 2\n', encoding="utf-8")
+    (src / "vendored" / "dup.py").write_text(
+        'def twice(x):\n    return x * 2\n\ndef triple(x):\n    return x * 3\n', encoding="utf-8")
+    out = tmp_path / "out"
+
+    provider = FakeProvider(importing_test)
+    write_tests(scan_python_functions(str(src)), str(out), str(src), provider=provider, jobs=2)
+    assert len(provider.prompts) == 2  # double and triple; twice reuses double's tests
+    assert "Dedup: 1 function(s)" in capsys.readouterr().out
+    text = (out / "vendored" / "test_vendored__dup.py").read_text(encoding="utf-8")
+    assert "from vendored.dup import twice" in text and "def test_twice_doubles():" in text
+    # Keep only the rewritten test (triple's doubling test is meant to fail) and run both files
+    (out / "vendored" / "test_vendored__dup.py").write_text(text.split("# REQ-ID: N/A\ndef test_triple", 1)[0], encoding="utf-8")
+    run = run_tests(str(out), jobs=1)
+    assert run["passed"] == 2 and run["failed"] == 0
+
+    provider = FakeProvider(importing_test)
+    write_tests(scan_python_functions(str(src)), str(tmp_path / "plain"), str(src), provider=provider, dedup=False)
+    assert len(provider.prompts) == 3
+
+
+def test_module_files_share_one_import_block_and_conftest(tmp_path: Path):
+    src = tmp_path / "src"
+    (src / "pkg").mkdir(parents=True)
+    (src / "pkg" / "__init__.py").write_text("", encoding="utf-8")
+    (src / "pkg" / "calc.py").write_text(
+        "def add(a: int, b: int) -> int:\n    return a + b\n\n"
+        "def neg(a: int) -> int:\n    return -a\n\n"
+        "def half(a: float) -> float:\n    return a / 2\n", encoding="utf-8")
+    out = tmp_path / "out"
+    write_tests(scan_python_functions(str(src)), str(out), str(src))
+
+    text = (out / "pkg" / "test_pkg__calc.py").read_text(encoding="utf-8")
+    assert text.startswith("import pytest\nfrom pkg.calc import add\nfrom pkg.calc import neg\nfrom pkg.calc import half\n\n\n")
+    assert text.count("import pytest") == 1 and "sys.path" not in text
+    assert "sys.path.insert" in (out / "conftest.py").read_text(encoding="utf-8")
+    assert run_tests(str(out), jobs=1)["files"]["pkg/test_pkg__calc.py"]["status"] == "passed"
+
+
+def test_merge_drops_per_file_path_setup():
+    legacy = (
+        "import sys\nimport os\nimport pytest\n\n"
+        "# Add source directory to sys.path so we can import the module\n"
+        'src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))\n'
+        "if src_path not in sys.path:\n    sys.path.insert(0, src_path)\n\n"
+        "from m import {0}\n\n# REQ-ID: REQ-1\ndef test_{0}():\n    assert {0}()\n"
+    )
+    merged = merge_python_tests([legacy.format("f"), legacy.format("g"), "from __future__ import annotations\nx = 1; import json\n"])
+    assert merged.startswith("from __future__ import annotations\nimport sys\nimport os\nimport pytest\nfrom m import f\nfrom m import g\n\n\n")
+    assert "src_path" not in merged and merged.count("# REQ-ID: REQ-1") == 2
+    assert "x = 1; import json" in merged  # shares a line with other code, left in place
+
+
+def test_test_file_names_are_unique_per_module(tmp_path: Path):
+    src = tmp_path / "src"
+    for rel, name in (("foo/__init__.py", "init_fn"), ("foo/foo.py", "foo_fn"), ("a/b/c.py", "nested_fn"), ("a_b/c.py", "flat_fn")):
+        (src / rel).parent.mkdir(parents=True, exist_ok=True)
+        (src / rel).write_text(f"def {name}(x):\n    return x\n", encoding="utf-8")
+    out = tmp_path / "out"
+    write_tests(scan_python_functions(str(src)), str(out), str(src), incremental=True)
+    files = {str(p.relative_to(out)) for p in out.rglob("test_*.py")}
+    assert len(files) == len({p.name for p in out.rglob("test_*.py")}) == 4
+    assert {"foo/test_foo__foo.py", "a/b/test_a__b__c.py"} <= files
+    assert "def test_nested_fn_basic" in (out / "a" / "b" / "test_a__b__c.py").read_text(encoding="utf-8")
+    assert "def test_flat_fn_basic" in (out / output_path("a_b.c")).read_text(encoding="utf-8")
+    assert "def test_init_fn_basic" in (out / output_path("foo.__init__")).read_text(encoding="utf-8")
+
+
+def test_writer_keeps_regular_file_permissions(tmp_path: Path, monkeypatch):
+    umask = os.umask(0o022)
+    try:
+        # The process umask is never changed, not even briefly: other threads may be creating files
+        with monkeypatch.context() as patch:
+            patch.setattr(os, "umask", lambda mask: pytest.fail("umask changed"))
+            writer = OutputWriter(str(tmp_path))
+            writer.write("test_new.py", "x = 1\n")
+        assert stat.S_IMODE((tmp_path / "test_new.py").stat().st_mode) == 0o644
+        (tmp_path / "test_new.py").chmod(0o664)
+        writer.write("test_new.py", "x = 2\n")
+        assert stat.S_IMODE((tmp_path / "test_new.py").stat().st_mode) == 0o664
+    finally:
+        os.umask(umask)
+
+
+def test_same_module_name_in_two_packages_collects_in_one_session(tmp_path: Path):
+    src = tmp_path / "src"
+    for pkg in ("alpha", "beta"):
+        (src / pkg).mkdir(parents=True)
+        (src / pkg / "__init__.py").write_text("", encoding="utf-8")
+        (src / pkg / "util.py").write_text(f"def {pkg}_one(x: int) -> int:\n    return x + 1\n", encoding="utf-8")
+    out = tmp_path / "out"
+    write_tests(scan_python_functions(str(src)), str(out), str(src))
+    assert (out / "alpha" / "test_alpha__util.py").exists() and (out / "beta" / "test_beta__util.py").exists()
+    proc = subprocess.run([sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", str(out)],
+                          cwd=tmp_path, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stdout
+    assert "4 passed" in proc.stdout
+
+
+def dict_tests(prompt: str) -> str:
+    """Tests that also call dict.get / os.environ.get and mention the name in strings."""
+    module, name = _target(prompt)
+    return (f"import os\nimport {module}\nfrom {module} import {name}\n\n\n# REQ-ID: N/A\n"
+            f"def test_{name}_reads_key():\n    d = {{\"a\": 1}}\n    assert {name}(d, \"a\") == d.get(\"a\")\n"
+            f"    assert {module}.{name}(d, \"b\") is None\n"
+            f"    assert os.environ.get(\"HOME\", \"x\") == os.environ.get(\"HOME\", \"x\")\n"
+            f"    assert \"{name}\" == \"{name}\"\n")
+
+
+def test_dedup_rewrite_leaves_attributes_and_strings(tmp_path: Path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "store_a.py").write_text("def get(d, key):\n    return d[key] if key in d else None\n", encoding="utf-8")
+    (src / "store_b.py").write_text("def lookup(d, key):\n    return d[key] if key in d else None\n", encoding="utf-8")
+    out = tmp_path / "out"
+    provider = FakeProvider(dict_tests)
+    write_tests(scan_python_functions(str(src)), str(out), str(src), provider=provider)
+    assert len(provider.prompts) == 1
+
+    text = (out / output_path("store_b")).read_text(encoding="utf-8")
+    assert "import store_b\nfrom store_b import lookup\n" in text and "def test_lookup_reads_key():" in text
+    assert 'lookup(d, "a") == d.get("a")' in text and 'store_b.lookup(d, "b")' in text
+    assert 'os.environ.get("HOME", "x")' in text and 'assert "get" == "get"' in text
+    assert run_tests(str(out), jobs=1)["passed"] == 2
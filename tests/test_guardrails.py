@@ -0,0 +1,27 @@
+from llm_testgen.guardrails import check, compiles, safe_content
+
+
+def test_check_reports_patterns_and_aliases():
+    report = check("import subprocess as sp\n\ndef test_x():\n    sp.run(['ls'])\n")
+    assert report.compiles and not report.safe
+    assert {(v.rule, v.line) for v in report.violations} == {("banned-import", 1), ("banned-call", 4)}
+
+    report = check("from pathlib import Path as P\nimport os as o\nP('x')\no.system('ls')\n")
+    assert [v.detail for v in report.violations] == ["P()", "o.system()"]
+
+    report = check("x = open('f')\n")
+    assert [v.rule for v in report.violations] == ["banned-pattern", "banned-call"]
+
+
+def test_check_shares_tree_and_matches_legacy_helpers():
+    ok = check("import os\nimport pytest\n\ndef test_path():\n    assert os.path.join('a', 'b')\n")
+    assert ok.ok and ok.tree is not None
+    bad = check("def test_(:\n")
+    assert not bad.compiles and bad.tree is None
+    assert compiles("x = 1") and not compiles("x = (")
+    assert safe_content("x = 1") and not safe_content("requests.get(url)")
+
+
+def test_robot_sources_get_textual_scan_only():
+    assert check("*** Test Cases ***\nT\n    Log    hi\n", python=False).ok
+    assert not check("Run Process    subprocess.call", python=False).ok
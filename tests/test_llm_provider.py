@@ -0,0 +1,206 @@
+from pathlib import Path
+from types import SimpleNamespace
+import sys
+import time
+import types
+
+import pytest
+
+from llm_testgen.cache import ResponseCache
+from llm_testgen.generator import _generate_streaming
+from llm_testgen.guardrails import StreamGuard, StreamLimits
+from llm_testgen.llm_provider import LLMProvider
+from llm_testgen.ratelimit import RateLimiter, RetryPolicy, TokenBucket
+from llm_testgen.tokens import set_token_estimator
+
+
+class FakeStream:
+    """Stand-in for an SDK streaming response; records how far it was consumed."""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.sent = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.sent += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    def close(self):
+        self.closed = True
+
+
+def _fake_openai(monkeypatch):
+    clients = []
+
+    class OpenAI:
+        def __init__(self, api_key=None):
+            self.closed = False
+            self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+            clients.append(self)
+
+        def _create(self, model, messages, temperature, stream=False):
+            if stream:
+                return FakeStream(["import os\n", "os.sys", "tem('x')\n", "def test_x(): pass\n"])
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"{model}:{messages[0]['content']}"))])
+
+        def close(self):
+            self.closed = True
+
+    monkeypatch.setitem(sys.modules, "openai", types.SimpleNamespace(OpenAI=OpenAI))
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    monkeypatch.setenv("OPENAI_API_KEY", "k")
+    return clients
+
+
+def test_client_is_built_once_and_closed(monkeypatch):
+    clients = _fake_openai(monkeypatch)
+    with LLMProvider() as provider:
+        assert provider.generate("a") == "gpt-4o:a"
+        assert provider.generate("b") == "gpt-4o:b"
+        assert len(clients) == 1
+    assert clients[0].closed
+    assert provider.backend._client is None
+
+
+def _fake_genai(monkeypatch, calls):
+    class Models:
+        def generate_content(self, model, contents, config=None):
+            calls.append(model)
+            if model != "gemini-2.0-flash":
+                raise RuntimeError("404 model not found")
+            return SimpleNamespace(text="ok")
+
+        def list(self):
+            calls.append("list")
+            return [SimpleNamespace(name="models/embedding-001"), SimpleNamespace(name="models/gemini-2.0-flash")]
+
+    genai = types.SimpleNamespace(Client=lambda api_key=None: SimpleNamespace(models=Models()))
+    google = types.ModuleType("google")
+    google.genai = genai
+    monkeypatch.setitem(sys.modules, "google", google)
+    monkeypatch.setitem(sys.modules, "google.genai", genai)
+    monkeypatch.setenv("LLM_PROVIDER", "gemini")
+    monkeypatch.setenv("GEMINI_API_KEY", "k")
+
+
+def test_discovered_model_is_remembered_across_runs(tmp_path: Path, monkeypatch):
+    calls = []
+    _fake_genai(monkeypatch, calls)
+    first = LLMProvider(cache=ResponseCache(str(tmp_path)))
+    assert first.generate("p") == "ok"
+    assert calls == ["gemini-1.5-flash", "list", "gemini-2.0-flash"]
+
+    calls.clear()
+    second = LLMProvider(cache=ResponseCache(str(tmp_path)))
+    assert second.model == "gemini-2.0-flash"
+    assert second.generate("q") == "ok"
+    assert calls == ["gemini-2.0-flash"]
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers={"retry-after": retry_after} if retry_after else {})
+
+
+def _scripted(provider, script):
+    """Replace the network call with a fake endpoint that replays a script of errors/responses."""
+    calls = []
+    def dispatch(prompt):
+        calls.append(prompt)
+        item = script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+    provider._dispatch = dispatch
+    return calls
+
+
+def test_retries_throttling_with_backoff_and_aimd(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    limiter = RateLimiter(max_concurrency=8)
+    provider = LLMProvider(limiter=limiter, retry=RetryPolicy(max_retries=3, base=0.001))
+    calls = _scripted(provider, [HTTPError(429, retry_after="0.05"), HTTPError(503), "ok"])
+
+    assert provider.generate("p") == "ok"
+    assert len(calls) == 3
+    stats = limiter.stats()
+    assert stats["retries"] == 2 and stats["throttled"] == 2
+    assert stats["throttle_seconds"] >= 0.05
+    # Two multiplicative decreases (8 -> 4 -> 2), then one additive step
+    assert stats["concurrency_limit"] == 2
+
+
+def test_non_retryable_and_exhausted_errors_fall_back(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    provider = LLMProvider(retry=RetryPolicy(max_retries=2, base=0.001))
+    calls = _scripted(provider, [HTTPError(400)])
+    assert provider.generate("p") is None
+    assert len(calls) == 1
+
+    calls = _scripted(provider, [HTTPError(500)] * 3)
+    assert provider.generate("p") is None
+    assert len(calls) == 3
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate_per_minute=1200, capacity=1)  # one request per 50ms
+    start = time.monotonic()
+    waited = sum(bucket.acquire() for _ in range(3))
+    assert time.monotonic() - start >= 0.09
+    assert waited >= 0.09
+
+
+def test_stream_aborts_on_banned_pattern_across_chunks(monkeypatch, tmp_path: Path):
+    clients = _fake_openai(monkeypatch)
+    provider = LLMProvider(cache=ResponseCache(str(tmp_path)))
+    streams = []
+    monkeypatch.setattr(FakeStream, "close", lambda self: setattr(self, "closed", True) or streams.append(self))
+
+    assert _generate_streaming(provider, "p", StreamLimits()) is None
+    assert streams[0].closed and streams[0].sent == 3  # the fourth chunk was never requested
+    assert provider.cache.hits == 0 and not list(tmp_path.glob("*/*.json"))
+
+    text = _generate_streaming(provider, "p", StreamLimits(max_tokens=2))
+    assert text is None  # 'import os\n' alone is within budget, the next chunk is not
+    assert len(clients) == 1
+
+
+def test_stream_guard_budgets():
+    guard = StreamGuard(StreamLimits(max_tokens=5))
+    assert guard.feed("x" * 16)
+    assert not guard.feed("x" * 8) and "output tokens" in guard.violation
+    # The configured estimator counts the tokens (here: words)
+    previous = set_token_estimator(lambda text: len(text.split()))
+    try:
+        guard = StreamGuard(StreamLimits(max_tokens=3))
+        assert guard.feed("x" * 100 + " a") and guard.feed(" b")
+        assert not guard.feed(" c d")
+    finally:
+        set_token_estimator(previous)
+    guard = StreamGuard()
+    assert guard.feed("result = sh") and not guard.feed("util.rmtree('/')")
+
+
+def test_stream_failing_midway_is_not_cached(monkeypatch, tmp_path: Path):
+    _fake_openai(monkeypatch)
+
+    def broken_stream(prompt):
+        yield "def test_x():\n"
+        yield "    assert "
+        raise ConnectionResetError("connection reset by peer")
+
+    provider = LLMProvider(cache=ResponseCache(str(tmp_path)), retry=RetryPolicy(max_retries=0))
+    monkeypatch.setattr(provider, "_open_stream", broken_stream)
+    chunks = []
+    with pytest.raises(ConnectionResetError):
+        for chunk in provider.stream("P"):
+            chunks.append(chunk)
+    assert chunks == ["def test_x():\n", "    assert "] and not list(tmp_path.glob("*/*.json"))
+    assert _generate_streaming(provider, "P", StreamLimits()) is None
+
+    # Later calls reach the backend again instead of replaying the truncated response
+    assert provider.generate("P") == "gpt-4o:P"
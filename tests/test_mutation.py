@@ -0,0 +1,99 @@
+from pathlib import Path
+import ast
+
+from llm_testgen.mutation import mutation_report, mutation_sites
+
+SOURCE = '''def add(a, b):
+    """Sum of a and b."""
+    return a + b
+
+
+def is_adult(age):
+    return age >= 18
+
+
+def spin(n):
+    while n != 0:
+        n -= 1
+    return n
+
+
+def untested(x):
+    return x * 2
+
+
+class Cart:
+    def total(self, prices):
+        return sum(prices) + 1
+'''
+
+TESTS = '''from shop.calc import add, is_adult, spin, Cart
+
+
+def test_add_basic():
+    assert add(2, 3) == 5
+
+
+def test_is_adult_llm():
+    assert is_adult(30)
+
+
+def test_spin_basic():
+    assert spin(3) == 0
+
+
+def test_broken_on_original():
+    assert add(1, 1) == 3
+
+
+class TestCart:
+    def test_cart_total(self):
+        assert Cart().total([1, 2]) == 4
+'''
+
+
+def test_mutation_score_per_module(tmp_path: Path):
+    src, tests = tmp_path / "src", tmp_path / "tests"
+    (src / "shop").mkdir(parents=True)
+    (src / "shop" / "calc.py").write_text(SOURCE, encoding="utf-8")
+    (tests / "shop").mkdir(parents=True)
+    (tests / "shop" / "test_calc.py").write_text(TESTS, encoding="utf-8")
+
+    report = mutation_report(str(tests), str(src), jobs=2, timeout=5)
+    stats = report["modules"]["shop.calc"]
+    # add: + -> -, return -> None; is_adult: >= -> <, 18 -> 19, return -> None;
+    # spin: != -> ==, 0 -> 1, -= -> +=, 1 -> 2, return -> None; untested: 3; Cart.total: 3
+    assert stats["mutants"] == report["mutants"] == 16
+    assert stats["no_coverage"] == 3
+    # The boundary tweak 18 -> 19 is not caught by age=30; -= -> += never terminates
+    assert stats["survived"] == 1
+    assert stats["timeout"] >= 1
+    assert stats["killed"] + stats["timeout"] == 12
+    assert report["surviving"] == [{"module": "shop.calc", "function": "is_adult", "line": 7, "mutation": "constant 18 -> 19"}]
+    assert stats["score"] == round(12 / 16, 3) and stats["covered_score"] == round(12 / 13, 3)
+    # The original module is untouched on disk
+    assert (src / "shop" / "calc.py").read_text(encoding="utf-8") == SOURCE
+
+
+def test_sites_skip_docstring_and_revert():
+    tree = ast.parse(SOURCE)
+    fn = tree.body[0]
+    sites = mutation_sites(fn)
+    assert [s.description for s in sites] == ["return value -> None", "+ -> -"]
+    before = ast.dump(tree)
+    with sites[1].applied():
+        assert "Sub()" in ast.dump(tree)
+    assert ast.dump(tree) == before
+
+
+def test_mutants_reach_tests_that_import_the_package_path(tmp_path: Path):
+    src, tests = tmp_path / "src", tmp_path / "tests"
+    (src / "shop").mkdir(parents=True)
+    (src / "shop" / "calc.py").write_text("def add(a, b):\n    return a + b\n", encoding="utf-8")
+    (tests / "shop").mkdir(parents=True)
+    # Both forms look the module up as an attribute of the shop package
+    for header, call in (("import shop.calc", "shop.calc.add"), ("from shop import calc", "calc.add")):
+        (tests / "shop" / "test_calc.py").write_text(
+            f"{header}\n\n\ndef test_add():\n    assert {call}(2, 3) == 5\n", encoding="utf-8")
+        stats = mutation_report(str(tests), str(src), jobs=1, timeout=5)["modules"]["shop.calc"]
+        assert (stats["killed"], stats["survived"]) == (2, 0), header
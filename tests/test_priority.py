@@ -0,0 +1,125 @@
+from pathlib import Path
+import json
+import sqlite3
+import time
+
+from llm_testgen.ast_extract import scan_python_functions
+from llm_testgen.generator import write_tests
+from llm_testgen.llm_provider import LLMProvider
+from llm_testgen.priority import CoverageData, prioritize
+from llm_testgen.providers import Backend, register_provider
+from llm_testgen.ratelimit import Budget
+
+SOURCE = '''def covered(x):
+    y = x + 1
+    return y
+
+
+def branchy(x):
+    if x > 1:
+        return "big"
+    for i in range(x):
+        if i % 2 or i > 5:
+            return "odd"
+    return "small"
+
+
+def plain(x):
+    a = x
+    b = a
+    return b
+
+
+def parse_order(text):
+    text = text.strip()
+    return text
+'''
+
+DESIGN = "## REQ-7: parse_order(text)\nOrders are parsed from trimmed text."
+
+
+def _numbits(lines):
+    data = bytearray(max(lines) // 8 + 1)
+    for line in lines:
+        data[line // 8] |= 1 << (line % 8)
+    return bytes(data)
+
+
+def _project(tmp_path: Path) -> Path:
+    src = tmp_path / "src"
+    (src / "shop").mkdir(parents=True)
+    (src / "shop" / "orders.py").write_text(SOURCE, encoding="utf-8")
+    return src
+
+
+def test_coverage_json_and_sqlite_rank_alike(tmp_path: Path):
+    src = _project(tmp_path)
+    executed = [1, 2, 3, 6, 15, 16]  # covered() fully, plain() partly
+    report = tmp_path / "coverage.json"
+    # Recorded in another checkout: matched by path suffix
+    report.write_text(json.dumps({"files": {"/ci/build/src/shop/orders.py": {"executed_lines": executed}}}), encoding="utf-8")
+    db = tmp_path / ".coverage"
+    con = sqlite3.connect(db)
+    con.executescript("CREATE TABLE file (id INTEGER PRIMARY KEY, path TEXT);"
+                      "CREATE TABLE line_bits (file_id INTEGER, context_id INTEGER, numbits BLOB);")
+    con.execute("INSERT INTO file VALUES (1, ?)", (str((src / "shop" / "orders.py").resolve()),))
+    con.execute("INSERT INTO line_bits VALUES (1, 1, ?)", (_numbits(executed),))
+    con.commit()
+    con.close()
+
+    funcs = scan_python_functions(str(src))
+    orders = []
+    for path in (report, db):
+        ordered, positions = prioritize(funcs, str(src), CoverageData.load(str(path)), DESIGN)
+        orders.append([fn.name for fn in ordered])
+    assert orders[0] == orders[1] == ["branchy", "parse_order", "plain", "covered"]
+    assert positions[("shop.orders", "covered")] == 0 and positions[("shop.orders", "parse_order")] == 3
+
+    # Without coverage data every statement counts as uncovered; without the REQ link plain() wins
+    assert [fn.name for fn in prioritize(funcs, str(src), None, DESIGN)[0]] == ["branchy", "parse_order", "plain", "covered"]
+    assert [fn.name for fn in prioritize(funcs, str(src))[0]] == ["branchy", "plain", "covered", "parse_order"]
+
+
+class Scripted(Backend):
+    name = "scripted"
+    default_model = "scripted-1"
+
+    def complete(self, prompt):
+        name = prompt.split("- function: ", 1)[1].split("\n", 1)[0]
+        return f"# REQ-ID: N/A\ndef test_{name}_llm():\n    assert True\n"
+
+
+def test_budget_spends_llm_calls_on_top_targets(tmp_path: Path):
+    src = _project(tmp_path)
+    funcs, positions = prioritize(scan_python_functions(str(src)), str(src), None, DESIGN)
+    register_provider("scripted", Scripted)
+    budget = Budget(max_calls=2)
+    provider = LLMProvider(provider="scripted", budget=budget)
+    write_tests(funcs, str(tmp_path / "out"), str(src), DESIGN, jobs=1, provider=provider, positions=positions)
+
+    text = (tmp_path / "out" / "shop" / "test_shop__orders.py").read_text(encoding="utf-8")
+    assert "def test_branchy_llm" in text and "def test_parse_order_llm" in text
+    assert "def test_covered_basic" in text and "def test_plain_basic" in text  # skeleton fallback
+    # Files keep source order even though branchy and parse_order were generated first
+    assert text.index("test_covered") < text.index("test_branchy") < text.index("test_plain") < text.index("test_parse_order")
+    assert budget.stats()["calls"] == 2 and budget.stats()["refused"] == 2
+
+    assert not Budget(max_tokens=10).acquire(11)
+    assert not Budget(max_seconds=0).acquire(1)
+    # The clock starts with the first request, not when the budget is created
+    budget = Budget(max_seconds=0.05)
+    time.sleep(0.1)
+    assert budget.acquire(1)
+
+
+def test_budget_refused_skeletons_are_regenerated_incrementally(tmp_path: Path):
+    src = _project(tmp_path)
+    register_provider("scripted", Scripted)
+    out = str(tmp_path / "out")
+    for _ in range(2):
+        provider = LLMProvider(provider="scripted", budget=Budget(max_calls=2))
+        write_tests(scan_python_functions(str(src)), out, str(src), DESIGN, provider=provider, incremental=True)
+
+    # Both runs spent their two calls on different functions: nothing is left as a skeleton
+    text = (tmp_path / "out" / "shop" / "test_shop__orders.py").read_text(encoding="utf-8")
+    assert text.count("_llm():") == 4 and "_basic" not in text
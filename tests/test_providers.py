@@ -0,0 +1,140 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import json
+import threading
+
+import pytest
+
+from llm_testgen.generator import write_tests
+from llm_testgen.llm_provider import LLMProvider
+from llm_testgen.providers import Backend, available_providers, register_provider
+from llm_testgen.ratelimit import RateLimiter, RetryPolicy
+
+
+class FakeServer(ThreadingHTTPServer):
+    """Minimal OpenAI-compatible endpoint; throttles the first `throttle` requests."""
+
+    def __init__(self, throttle=0):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.throttle = throttle
+        self.requests = []
+        self.peers = set()
+        self.truncate = 0  # cut this many responses off halfway through the body
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json", headers=()):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.requests.append((self.path, payload["model"]))
+        server.peers.add(self.client_address)
+        if server.throttle:
+            server.throttle -= 1
+            self._send(429, '{"error": "slow down"}', headers=[("Retry-After", "0.01")])
+            return
+        if server.truncate:
+            server.truncate -= 1
+            self.send_response(200)
+            self.send_header("Content-Length", "100")
+            self.end_headers()
+            self.wfile.write(b'{"choices": [')
+            self.close_connection = True
+            return
+        prompt = payload["messages"][0]["content"]
+        name = prompt.split("- function: ", 1)[1].split("\n", 1)[0] if "- function: " in prompt else "x"
+        text = f"def test_{name}():\n    assert True\n"
+        if payload.get("stream"):
+            events = "".join(f"data: {json.dumps({'choices': [{'delta': {'content': piece}}]})}\n\n" for piece in text.splitlines(keepends=True))
+            self._send(200, events + "data: [DONE]\n\n", content_type="text/event-stream")
+        else:
+            self._send(200, json.dumps({"choices": [{"message": {"content": text}}]}))
+
+
+@pytest.fixture
+def server(monkeypatch):
+    srv = FakeServer()
+    monkeypatch.setenv("LLM_BASE_URL", srv.url)
+    monkeypatch.setenv("LLM_MODEL", "tiny-local")
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_openai_compatible_reuses_connection_and_retries_429(server):
+    server.throttle = 1
+    limiter = RateLimiter(max_concurrency=2)
+    with LLMProvider(provider="local", limiter=limiter, retry=RetryPolicy(max_retries=2, base=0.001)) as provider:
+        assert provider.provider == "openai-compatible" and provider.model == "tiny-local"
+        for i in range(5):
+            assert provider.generate(f"- function: f{i}\n") == f"def test_f{i}():\n    assert True\n"
+        assert "".join(provider.stream("- function: g\n")) == "def test_g():\n    assert True\n"
+        assert provider.backend.connections_opened == 1
+    assert len(server.requests) == 7 and server.requests[0] == ("/v1/chat/completions", "tiny-local")
+    assert len(server.peers) == 1  # one keep-alive socket for every request
+    assert limiter.stats()["retries"] == 1
+
+
+def test_unreadable_response_closes_its_connection(server, monkeypatch, capsys):
+    server.truncate = 1
+    with LLMProvider(provider="local") as provider:
+        backend = provider.backend
+        opened = []
+        connect = backend._connect
+        monkeypatch.setattr(backend, "_connect", lambda: opened.append(connect()) or opened[-1])
+        assert provider.generate("- function: f\n") is None
+        assert opened[0].sock is None and not backend._idle
+        assert provider.generate("- function: g\n") == "def test_g():\n    assert True\n"
+    assert "API Error" in capsys.readouterr().out
+
+
+def test_record_then_replay_offline(server, tmp_path: Path, make_funcs):
+    cassette = tmp_path / "run.jsonl"
+    funcs = make_funcs(2, 3)
+    with LLMProvider(provider="openai-compatible", cassette=str(cassette)) as live:
+        write_tests(funcs, str(tmp_path / "live"), str(tmp_path), provider=live, jobs=3)
+    assert len(server.requests) == 6 and len(cassette.read_text().splitlines()) == 6
+    server.shutdown()
+
+    for run in ("replay1", "replay2"):
+        with LLMProvider(provider="replay", cassette=str(cassette)) as replay:
+            write_tests(funcs, str(tmp_path / run), str(tmp_path), provider=replay, jobs=3)
+        assert replay.backend.cassette.misses == 0
+        for name in ("test_mod0.py", "test_mod1.py"):
+            assert (tmp_path / run / name).read_text() == (tmp_path / "live" / name).read_text()
+
+
+def test_registry_plugins_and_unknown_providers(monkeypatch):
+    class Echo(Backend):
+        name = "echo"
+        default_model = "echo-1"
+
+        def complete(self, prompt):
+            return prompt.upper()
+
+    register_provider("echo", Echo)
+    assert {"echo", "google", "openai", "openai-compatible", "replay"} <= set(available_providers())
+    monkeypatch.setenv("LLM_PROVIDER", "echo")
+    provider = LLMProvider()
+    assert provider.model == "echo-1" and provider.generate("hi") == "HI"
+
+    assert LLMProvider(provider="nope").generate("hi") is None
@@ -0,0 +1,31 @@
+from llm_testgen.generator import rule_based_skeleton
+from llm_testgen.ast_extract import FunctionInfo
+from llm_testgen.requirements import RequirementIndex
+
+DOC = """# Requirements
+
+## REQ-1: add_user(name) -> User
+- Creates a user.
+
+## REQ-2: add(a, b) -> int
+- Sum of two ints.
+
+## REQ-3: Math.square(n) and add must agree for small n
+- square(2) == add(2, 2)
+"""
+
+
+def test_word_boundary_and_multiple_ids():
+    index = RequirementIndex(DOC)
+    assert index.lookup("add") == ["REQ-2", "REQ-3"]
+    assert index.lookup("add_user") == ["REQ-1"]
+    assert index.lookup("Math.square") == ["REQ-3"]
+    assert index.lookup("missing") == [] and index.primary("missing") == "N/A"
+    assert index.requirements["REQ-2"].text == "## REQ-2: add(a, b) -> int\n- Sum of two ints."
+
+
+def test_skeleton_links_all_requirements():
+    fn = FunctionInfo(module="m", qualname="add", name="add", args=["a", "b"], annotations={},
+                      returns=None, docstring=None, rel_path="m.py")
+    assert "# REQ-ID: REQ-2, REQ-3" in rule_based_skeleton(fn, ".", DOC, "pytest")
+    assert "[Tags]    REQ-2    REQ-3" in rule_based_skeleton(fn, ".", DOC, "robot")
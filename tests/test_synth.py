@@ -0,0 +1,91 @@
+from pathlib import Path
+
+from llm_testgen.ast_extract import scan_python_functions
+from llm_testgen.evaluator import run_tests
+from llm_testgen.generator import write_tests
+from llm_testgen.synth import TypeIndex
+
+GEO = '''
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, List, Optional, Tuple, Union
+
+
+class Color(Enum):
+    RED = "red"
+    BLUE = "blue"
+
+
+@dataclass
+class Point:
+    x: int
+    y: int = 0
+    tags: List[str] = field(default_factory=list)
+
+
+class Canvas:
+    def __init__(self, width: int, height: int, background: Color, title: str = "untitled"):
+        self.width, self.height, self.background = width, height, background
+
+    def area(self) -> int:
+        return self.width * self.height
+
+    def paint(self, at: Point, color: Optional[Color] = None) -> str:
+        return f"{at.x},{at.y}:{(color or self.background).value}"
+'''
+
+OPS = '''
+from decimal import Decimal
+from typing import Dict, Optional, Tuple, Union
+
+from .geo import Point, Color
+
+
+def norm(p: Point) -> int:
+    return abs(p.x) + abs(p.y)
+
+
+def shade(c: "Color", weights: Dict[str, float], scale: Optional[Decimal]) -> str:
+    assert isinstance(scale, Decimal) and weights
+    return c.value
+
+
+def pick(v: Union[None, Tuple[int, ...], str], items: list[Point]) -> int:
+    return len(v) + len(items)
+'''
+
+
+def _tree(tmp_path: Path) -> Path:
+    src = tmp_path / "src"
+    (src / "shapes").mkdir(parents=True)
+    (src / "shapes" / "__init__.py").write_text("", encoding="utf-8")
+    (src / "shapes" / "geo.py").write_text(GEO, encoding="utf-8")
+    (src / "shapes" / "ops.py").write_text(OPS, encoding="utf-8")
+    return src
+
+
+def test_values_resolve_through_the_ast(tmp_path: Path):
+    types = TypeIndex(str(_tree(tmp_path)))
+    point = types.value("shapes.ops", "Point")
+    assert point.expr == "Point(x=1)"  # "int" in "Point" no longer matches
+    assert point.imports == {"from shapes.geo import Point"}
+    assert types.value("shapes.ops", "'Color'").expr == "Color.RED"
+    assert types.value("shapes.ops", "Optional[Decimal]").expr == "Decimal('1.5')"
+    assert types.value("shapes.ops", "Union[None, Tuple[int, ...], str]").expr == "(1,)"
+    assert types.value("shapes.ops", "Dict[str, list[Point]]").expr == "{'x': [Point(x=1)]}"
+    assert types.value("shapes.ops", "int | None").expr == "1"
+    assert types.value("shapes.ops", "Unknown").expr == "None"
+    assert types.instance("shapes.geo", "Canvas").expr == "Canvas(width=1, height=1, background=Color.RED)"
+    assert types.value("shapes.ops", "Point") is point  # memoized
+
+
+def test_fallback_skeletons_pass(tmp_path: Path):
+    src = _tree(tmp_path)
+    out = tmp_path / "out"
+    write_tests(scan_python_functions(str(src)), str(out), str(src))
+    text = (out / "shapes" / "test_shapes__geo.py").read_text(encoding="utf-8")
+    assert "obj = Canvas(width=1, height=1, background=Color.RED)" in text
+
+    result = run_tests(str(out), jobs=1)
+    basic = [t for t in result["tests"] if t["test"].endswith("_basic") and "__init__" not in t["test"]]
+    assert len(basic) == 5 and all(t["outcome"] == "passed" for t in basic)
@@ -0,0 +1,47 @@
+from pathlib import Path
+import json
+
+from llm_testgen.ast_extract import FunctionInfo
+from llm_testgen.cache import ResponseCache
+from llm_testgen.generator import write_tests
+from llm_testgen.llm_provider import LLMProvider
+from llm_testgen.telemetry import NullTelemetry, Telemetry, get_telemetry, set_telemetry
+
+
+def _fn(name: str) -> FunctionInfo:
+    return FunctionInfo(module="m", qualname=name, name=name, args=[], annotations={},
+                        returns=None, docstring=None, rel_path="m.py")
+
+
+def test_generate_run_is_profiled(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    provider = LLMProvider(cache=ResponseCache(str(tmp_path / "cache")))
+    # "bad" gets a response that fails the guardrails and falls back to the skeleton
+    monkeypatch.setattr(provider, "_dispatch",
+                        lambda prompt: "import subprocess\n" if "function: bad" in prompt else "def test_ok():\n    pass\n")
+
+    telemetry = Telemetry()
+    previous = set_telemetry(telemetry)
+    try:
+        write_tests([_fn("good"), _fn("bad")], str(tmp_path / "out"), str(tmp_path), provider=provider)
+        write_tests([_fn("good")], str(tmp_path / "out2"), str(tmp_path), provider=provider)
+    finally:
+        set_telemetry(previous)
+
+    summary = telemetry.summary()
+    assert summary["llm"]["calls"] == 2
+    assert summary["llm"]["cache_hit_rate"] == round(1 / 3, 3)
+    assert summary["llm"]["fallback_rate"] == round(1 / 3, 3)
+    assert summary["counters"]["guardrail.rejected"] == 1
+    assert {"generate_for_function", "prompt.build", "llm.request", "write_file"} <= set(summary["spans"])
+
+    trace = tmp_path / "trace.json"
+    telemetry.write_trace(str(trace))
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+
+
+def test_default_sink_is_noop():
+    assert isinstance(get_telemetry(), NullTelemetry) and not get_telemetry().enabled
+    with get_telemetry().span("anything"):
+        get_telemetry().count("x")
@@ -0,0 +1,52 @@
+from pathlib import Path
+import os
+import stat
+import threading
+import time
+
+from llm_testgen.llm_provider import LLMProvider
+from llm_testgen.watch import Watcher, request
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_watch_regenerates_only_changed_modules(tmp_path: Path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    (src / "alpha.py").write_text("def one(x: int) -> int:\n    return x\n", encoding="utf-8")
+    (src / "beta.py").write_text("def two(x: int) -> int:\n    return 2 * x\n", encoding="utf-8")
+    watcher = Watcher(str(src), str(out), provider=LLMProvider(provider=""), interval=0.05, debounce=0.05, workers=1)
+    runs = []
+    thread = threading.Thread(target=watcher.serve, kwargs={"on_run": runs.append})
+    thread.start()
+    try:
+        _wait_for(lambda: (out / "test_beta.py").exists() and (out / "test_alpha.py").exists())
+        beta_mtime = (out / "test_beta.py").stat().st_mtime_ns
+
+        (src / "alpha.py").write_text("def one(x: int) -> int:\n    return x\n\ndef three(x: int) -> int:\n    return 3 * x\n",
+                                      encoding="utf-8")
+        _wait_for(lambda: "test_three_basic" in (out / "test_alpha.py").read_text(encoding="utf-8"))
+        assert (out / "test_beta.py").stat().st_mtime_ns == beta_mtime
+
+        status = request(str(out), {"cmd": "status"}, timeout=10)
+        assert status["functions"] == 3 and status["last"]["changed"] == ["alpha.py"]
+        assert status["save_to_test_ms"]["last"] > 0
+        socket_dir = watcher._socket_dir  # None where the control socket is TCP
+        assert socket_dir is None or stat.S_IMODE(os.stat(socket_dir).st_mode) == 0o700
+        assert request(str(out), {"cmd": "functions", "module": "alpha"}, timeout=10)["functions"] == ["alpha:one", "alpha:three"]
+
+        (src / "beta.py").unlink()
+        _wait_for(lambda: not (out / "test_beta.py").exists())
+        assert (out / "test_alpha.py").exists()
+        assert request(str(out), {"cmd": "regenerate", "paths": ["alpha.py"]}, timeout=10)["files"] == 1
+    finally:
+        request(str(out), {"cmd": "stop"}, timeout=10)
+        thread.join(10)
+    assert not thread.is_alive()
+    assert socket_dir is None or not os.path.exists(socket_dir)
+    assert any("save to test" in line for line in runs)
@@ -0,0 +1,7 @@
+# Generated by llm-testgen: makes the sources importable for every test file below.
+import os
+import sys
+
+SRC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../examples/src_project'))
+if SRC_PATH not in sys.path:
+    sys.path.insert(0, SRC_PATH)